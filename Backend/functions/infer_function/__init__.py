@@ -1,13 +1,66 @@
 import azure.functions as func
 import logging
-from shared.model_utils import load_model
-import pandas as pd
+from shared.batcher import ModelLoadError, get_batcher
+from shared.feature_schema import InvalidFeatures
+from shared.prediction_cache import prediction_cache
+from shared.inference import parse_samples, predict_samples_async
+from shared.executor import run_blocking
+from shared.metrics import count, span
 import json
 
-def main(req: func.HttpRequest) -> func.HttpResponse:
+BATCH_CONTENT_TYPES = ("text/csv", "application/csv", "application/x-ndjson",
+                       "application/jsonl", "application/ndjson")
+
+def is_batch_request(req: func.HttpRequest) -> bool:
+    # Batch mode is selected explicitly, by a CSV/NDJSON body or by a JSON array body
+    if req.params.get("batch", "").lower() in ("1", "true"):
+        return True
+    content_type = req.headers.get("Content-Type", "").split(";")[0].strip().lower()
+    if content_type in BATCH_CONTENT_TYPES:
+        return True
+    body = req.get_body().lstrip()
+    return body.startswith(b"[")
+
+async def handle_batch(req: func.HttpRequest) -> func.HttpResponse:
+    try:
+        with span("infer_phase", phase="parse"):
+            rows = await run_blocking(parse_samples, req.get_body(), req.headers.get("Content-Type", ""))
+    except Exception as e:
+        return func.HttpResponse(
+            f"Invalid batch body: {str(e)}",
+            status_code=400
+        )
+
+    default_type = req.params.get("type") or req.params.get("wine_type")
+    logging.info(f'Batch prediction request with {len(rows)} rows')
+
+    results = await predict_samples_async(rows, default_type=default_type)
+    errors = sum(1 for r in results if "error" in r)
+    logging.info(f'Batch prediction completed: {len(results) - errors} predicted, {errors} errors, '
+                 f'prediction cache {prediction_cache.stats()}')
+
+    return func.HttpResponse(
+        json.dumps({"predictions": results, "count": len(results), "errors": errors}),
+        mimetype="application/json"
+    )
+
+async def main(req: func.HttpRequest) -> func.HttpResponse:
     logging.info('Inference request received')
-    
+
+    # End-to-end latency, labelled with the mode and the response status
+    with span("infer_request") as request_span:
+        response = await handle_request(req, request_span)
+        request_span.label(status=response.status_code)
+    return response
+
+async def handle_request(req: func.HttpRequest, request_span) -> func.HttpResponse:
     try:
+        count("infer_request_bytes", len(req.get_body()))
+        if is_batch_request(req):
+            request_span.label(mode="batch")
+            return await handle_batch(req)
+        request_span.label(mode="single")
+
         # Get and validate input data
         try:
             data = req.get_json()
@@ -27,28 +80,28 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
         
         logging.info(f'Prediction request for {wine_type} wine')
         
-        # Load the model
+        # Queue the row on the micro-batcher, which predicts concurrent requests together
         try:
-            model, scaler = load_model(wine_type)
-            logging.info('Model loaded successfully')
-        except Exception as e:
-            logging.error(f'Error loading model: {str(e)}')
+            prediction = await get_batcher().submit(wine_type, data)
+            logging.info('Prediction completed successfully')
+
             return func.HttpResponse(
-                f"Model loading error: {str(e)}",
-                status_code=500
+                json.dumps({"prediction": prediction}),
+                mimetype="application/json"
             )
-
-        # Prepare data and make prediction
-        try:
-            df = pd.DataFrame([data])
-            X_scaled = scaler.transform(df)
-            prediction = model.predict(X_scaled)
-            logging.info('Prediction completed successfully')
-            
+        except InvalidFeatures as e:
+            # Structured details of every missing or out-of-range field
             return func.HttpResponse(
-                json.dumps({"prediction": int(prediction[0])}),
+                json.dumps({"error": str(e), "fields": e.errors}),
+                status_code=400,
                 mimetype="application/json"
             )
+        except ModelLoadError as e:
+            logging.error(f'Error loading model: {str(e)}')
+            return func.HttpResponse(
+                f"Model loading error: {str(e)}",
+                status_code=500
+            )
         except Exception as e:
             logging.error(f'Error during prediction: {str(e)}')
             return func.HttpResponse(
@@ -0,0 +1,13 @@
+import json
+import azure.functions as func
+from shared.metrics import registry
+
+async def main(req: func.HttpRequest) -> func.HttpResponse:
+    # Metrics are per worker process: each scrape reports the worker that served it
+    if not registry.enabled:
+        return func.HttpResponse("Metrics are disabled, set METRICS_ENABLED=1", status_code=404)
+
+    if req.params.get("format") == "json":
+        return func.HttpResponse(json.dumps(registry.snapshot()), mimetype="application/json")
+
+    return func.HttpResponse(registry.render_prometheus(), mimetype="text/plain; version=0.0.4")
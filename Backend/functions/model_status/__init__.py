@@ -1,24 +1,53 @@
 import logging
+import math
 import os
 import json
+import time
 import azure.functions as func
-from azure.storage.blob import BlobServiceClient
+from shared.metrics import count, span
+from shared.model_store import MODELS_CONTAINER, read_pointer
+from shared.status import read_status
+from shared.storage import get_blob_service
+from shared.status_watch import get_watcher, status_version
+
+# Seconds a status is served from memory before blob storage is read again
+STATUS_CACHE_TTL = float(os.getenv("STATUS_CACHE_TTL", "2"))
+# Upper bound for long-poll waits, well below the HTTP trigger timeout
+MAX_WAIT = float(os.getenv("STATUS_MAX_WAIT", "55"))
+
+_status_cache = {}
+
+def status_result(document: dict, wine_type: str) -> dict:
+    return {
+        "status": document["status"],
+        "wine_type": wine_type,
+        "updated_at": document.get("updated_at"),
+        "metrics": document.get("metrics"),
+        "error": document.get("error")
+    }
 
 async def check_model_status(wine_type: str) -> dict:
-    # Retrieve the connection string for Azure Blob Storage from environment variables
-    connection_string = os.getenv("AzureWebJobsStorage")
-    blob_service = BlobServiceClient.from_connection_string(connection_string)
-    
-    # Get a client to access the 'models' container where trained models are stored
-    container = blob_service.get_container_client("models")
-
-    # List all blob names currently present in the 'models' container
-    existing_blobs = [b.name for b in container.list_blobs()]
-    
-    # Determine model status based on whether the model file exists in the container
-    status = "ready" if f"model_{wine_type}.pkl" in existing_blobs else "training"
-    
-    return {"status": status, "wine_type": wine_type}
+    # Serve repeated polls from memory for a short time
+    cached = _status_cache.get(wine_type)
+    if cached and cached[0] > time.monotonic():
+        count("status_cache_lookups", result="hit")
+        return cached[1]
+    count("status_cache_lookups", result="miss")
+
+    blob_service = get_blob_service()
+
+    # Read the status document written by the training pipeline
+    document = await read_status(blob_service, wine_type)
+    if document:
+        result = status_result(document, wine_type)
+    else:
+        # No pipeline reported yet: fall back to a single read of the production pointer
+        current = await read_pointer(blob_service.get_container_client(MODELS_CONTAINER), wine_type)
+        status = "ready" if current is not None else "training"
+        result = {"status": status, "wine_type": wine_type}
+
+    _status_cache[wine_type] = (time.monotonic() + STATUS_CACHE_TTL, result)
+    return result
 
 async def main(req: func.HttpRequest) -> func.HttpResponse:
     logging.info("Initiating model status check...")
@@ -28,13 +57,41 @@ async def main(req: func.HttpRequest) -> func.HttpResponse:
     if wine_type not in ["red", "white"]:
         return func.HttpResponse(json.dumps({"error": "Invalid or missing wine_type"}), status_code=400, mimetype="application/json")
 
+    # Server-sent events clients reconnect with the last version they received
+    event_stream = "text/event-stream" in req.headers.get("Accept", "")
+    since = req.params.get("since") or req.headers.get("Last-Event-ID")
+    wait = req.params.get("wait")
+
+    # Long poll: hold the request until the status changes from 'since' or the wait expires
+    timeout = MAX_WAIT
+    if wait:
+        try:
+            timeout = float(wait)
+        except ValueError:
+            timeout = math.nan
+        if not math.isfinite(timeout):
+            return func.HttpResponse(json.dumps({"error": "wait must be a number of seconds"}), status_code=400, mimetype="application/json")
+        timeout = min(max(timeout, 0.0), MAX_WAIT)
+
     # Try to retrieve and return the model status for the requested wine type
     try:
-        result = await check_model_status(wine_type)
+        mode = "sse" if event_stream else "wait" if wait is not None else "poll"
+        with span("status_request", mode=mode):
+            if wait is not None or event_stream:
+                document = await get_watcher().wait_for_change(wine_type, since, timeout)
+                result = status_result(document, wine_type) if document else await check_model_status(wine_type)
+            else:
+                result = await check_model_status(wine_type)
 
         logging.info(f"Model status retrieved for {wine_type}: {result}")
-        
+
+        if event_stream:
+            # One event per response; EventSource reconnects and sends its id back as Last-Event-ID
+            event_id = status_version(result) or ""
+            body = f"retry: 1000\nid: {event_id}\nevent: status\ndata: {json.dumps(result)}\n\n"
+            return func.HttpResponse(body, mimetype="text/event-stream", headers={"Cache-Control": "no-cache"})
+
         return func.HttpResponse(json.dumps(result), mimetype="application/json")
     except Exception as e:
         logging.error(f"Failed to retrieve model status: {str(e)}")
-        return func.HttpResponse(json.dumps({"error": str(e)}), status_code=500, mimetype="application/json")
\ No newline at end of file
+        return func.HttpResponse(json.dumps({"error": str(e)}), status_code=500, mimetype="application/json")
@@ -1,17 +1,53 @@
-import joblib
+import argparse
+import asyncio
 import os
-import io
-from azure.storage.blob import BlobServiceClient
+
+from azure.storage.blob.aio import BlobServiceClient
 from dotenv import load_dotenv
 
+from shared.artifacts import artifact_name
+from shared.model_store import CANDIDATE, MODELS_CONTAINER, promote, put_version, read_pointer, rollback
+
+# Run from Backend/functions: python -m promote.save_model {show,promote,rollback,adopt} <wine_type>
 load_dotenv()
 connection_string = os.getenv("AZURE_STORAGE_CONNECTION_STRING")
 
-blob_service = BlobServiceClient.from_connection_string(connection_string)
-testing_blob = blob_service.get_blob_client(container="models", blob="model_testing.pkl")
-testing_model_bytes = testing_blob.download_blob().readall()
 
-prod_blob = blob_service.get_blob_client(container="models", blob="model_production.pkl")
-prod_blob.upload_blob(testing_model_bytes, overwrite=True)
+async def main(args: argparse.Namespace) -> None:
+    async with BlobServiceClient.from_connection_string(connection_string) as blob_service:
+        container = blob_service.get_container_client(MODELS_CONTAINER)
+        current = await read_pointer(container, args.wine_type)
+
+        if args.command == "show":
+            candidate = await read_pointer(container, args.wine_type, CANDIDATE)
+            print(f"current:   {current.digest if current else None}")
+            print(f"previous:  {current.previous if current else None}")
+            print(f"candidate: {candidate.digest if candidate else None}")
+            return
+
+        if args.command == "promote":
+            # Defaults to the candidate of the last training run
+            digest = args.digest
+            if digest is None:
+                candidate = await read_pointer(container, args.wine_type, CANDIDATE)
+                if candidate is None:
+                    raise SystemExit(f"No candidate {args.wine_type} model")
+                digest = candidate.digest
+            pointer = await promote(container, args.wine_type, digest, expected=current)
+        elif args.command == "rollback":
+            pointer = await rollback(container, args.wine_type)
+        else:
+            # One-time migration of a model stored under its legacy fixed name
+            stream = await container.get_blob_client(artifact_name(args.wine_type)).download_blob()
+            digest = await put_version(container, args.wine_type, await stream.readall())
+            pointer = await promote(container, args.wine_type, digest, expected=current)
+
+        print(f"{args.wine_type} model {pointer.digest} promoted to production")
+
 
-print("Model promoted to production")
\ No newline at end of file
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move the production pointer of a wine type")
+    parser.add_argument("command", choices=["show", "promote", "rollback", "adopt"])
+    parser.add_argument("wine_type", choices=["red", "white"])
+    parser.add_argument("digest", nargs="?", help="Version to promote, defaults to the candidate")
+    asyncio.run(main(parser.parse_args()))
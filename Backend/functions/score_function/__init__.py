@@ -0,0 +1,81 @@
+import azure.functions as func
+import logging
+import json
+from urllib.parse import urlencode
+from shared.scoring_jobs import (DEFAULT_DEST_CONTAINER, DEST_CONTAINERS, QUEUED, default_output_name, job_error,
+                                 output_name_error, read_job_status, write_job_status)
+from shared.storage import get_sync_blob_service
+
+def job_status(req: func.HttpRequest) -> func.HttpResponse:
+    # The output blob identifies a job: the one named in the Location header of the POST response
+    dest_container = req.params.get("dest_container", DEFAULT_DEST_CONTAINER)
+    dest_blob = req.params.get("dest_blob")
+    if not dest_blob and req.params.get("blob"):
+        dest_blob = default_output_name(req.params["blob"])
+    if not dest_blob:
+        return func.HttpResponse("Missing 'dest_blob' or 'blob' parameter", status_code=400)
+    error = output_name_error(dest_blob) if dest_container in DEST_CONTAINERS else "Invalid 'dest_container'"
+    if error:
+        return func.HttpResponse(error, status_code=400)
+
+    document = read_job_status(get_sync_blob_service(), dest_container, dest_blob)
+    if document is None:
+        return func.HttpResponse(f"No scoring job for {dest_container}/{dest_blob}", status_code=404)
+    return func.HttpResponse(json.dumps(document), mimetype="application/json")
+
+def main(req: func.HttpRequest, scoreQueue: func.Out[str]) -> func.HttpResponse:
+    if req.method == "GET":
+        return job_status(req)
+
+    logging.info('Bulk scoring request received')
+
+    # Validate wine type and source blob
+    wine_type = (req.params.get("wine_type") or "").lower()
+    if wine_type not in ['red', 'white']:
+        return func.HttpResponse(
+            "Please specify 'wine_type' as 'red' or 'white'",
+            status_code=400
+        )
+
+    blob_name = req.params.get("blob")
+    if not blob_name:
+        return func.HttpResponse("Missing 'blob' parameter", status_code=400)
+
+    job = {
+        "wine_type": wine_type,
+        "container": req.params.get("container", "raw"),
+        "blob": blob_name,
+        "dest_container": req.params.get("dest_container", DEFAULT_DEST_CONTAINER),
+        "dest_blob": req.params.get("dest_blob") or default_output_name(blob_name)
+    }
+
+    # The endpoint is anonymous: only the dataset and prediction containers are reachable
+    error = job_error(job)
+    if error:
+        return func.HttpResponse(error, status_code=400)
+
+    # Large files take longer than the HTTP timeout: score_queue_function streams the CSV
+    # through the production model, and the job status is polled with GET
+    try:
+        blob_service = get_sync_blob_service()
+        if not blob_service.get_blob_client(container=job["container"], blob=blob_name).exists():
+            return func.HttpResponse(f"Blob {job['container']}/{blob_name} not found", status_code=404)
+
+        document = write_job_status(blob_service, job, QUEUED)
+        scoreQueue.set(json.dumps(job))
+    except Exception as e:
+        logging.error(f'Bulk scoring request failed: {str(e)}')
+        return func.HttpResponse(
+            f"Scoring error: {str(e)}",
+            status_code=500
+        )
+
+    location = req.url.split("?", 1)[0] + "?" + urlencode(
+        {"dest_container": job["dest_container"], "dest_blob": job["dest_blob"]}
+    )
+    return func.HttpResponse(
+        json.dumps({**document, "status_url": location, "output": f"{job['dest_container']}/{job['dest_blob']}"}),
+        status_code=202,
+        mimetype="application/json",
+        headers={"Location": location}
+    )
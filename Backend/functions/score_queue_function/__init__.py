@@ -0,0 +1,16 @@
+import azure.functions as func
+import logging
+import json
+from shared.scoring import run_scoring_job
+from shared.scoring_jobs import job_error
+
+def main(msg: func.QueueMessage) -> None:
+    # Scoring job enqueued by score_function; runs on a worker thread, outside the HTTP timeout
+    job = json.loads(msg.get_body().decode("utf-8"))
+    if job.get("wine_type") not in ["red", "white"] or job_error(job):
+        logging.error(f"Invalid scoring job: {job}")
+        return
+
+    logging.info(f"Scoring {job['container']}/{job['blob']} with the {job['wine_type']} model "
+                 f"(attempt {msg.dequeue_count})")
+    run_scoring_job(job)
@@ -0,0 +1,256 @@
+import hashlib
+import io
+import json
+import logging
+import shutil
+import zipfile
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple, Union
+
+from shared.disk_cache import DiskCache, artifact_cache
+
+# joblib, NumPy and sklearn are imported by the functions that need them, so that
+# looking up artifact names (model_status) stays cheap on a cold start
+if TYPE_CHECKING:
+    from shared.compiled_forest import CompiledForest
+    from shared.feature_schema import FeatureSchema
+
+# Bump when the layout of the archive changes
+ARTIFACT_FORMAT = 1
+ARTIFACT_EXTENSION = "wpk"
+
+MANIFEST_MEMBER = "manifest.json"
+BUNDLE_MEMBER = "bundle.joblib"
+FOREST_MEMBER = "forest.npz"
+
+# Timestamp of every archive member, so that identical members pack into identical bytes
+MEMBER_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+# Manifest fields describing the training run rather than the model, left out of the content digest
+RUN_FIELDS = ("created_at", "search")
+
+
+def artifact_name(wine_type: str, testing: bool = False) -> str:
+    """
+    Blob name of the model artifact of a wine type.
+
+    Args:
+        wine_type (str): Type of wine ('red' or 'white')
+        testing (bool): Name used in 'models-testing' instead of 'models'
+
+    Returns:
+        str: Blob name
+    """
+    suffix = "-testing" if testing else ""
+    return f"model_{wine_type}{suffix}.{ARTIFACT_EXTENSION}"
+
+
+def build_manifest(model: Any, scaler: Any, wine_type: str,
+                   data_hash: Optional[str] = None,
+                   metrics: Optional[Dict[str, float]] = None,
+                   schema: Optional["FeatureSchema"] = None,
+                   training: Optional[Dict[str, Any]] = None,
+                   search: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """
+    Describe a trained model so it can be inspected without unpickling it.
+
+    Args:
+        model: Fitted classifier
+        scaler: Fitted scaler
+        wine_type (str): Type of wine ('red' or 'white')
+        data_hash (Optional[str]): SHA-256 of the raw dataset the model was trained on
+        metrics (Optional[Dict[str, float]]): Evaluation metrics
+        schema (Optional[FeatureSchema]): Feature schema used to decode requests
+        training (Optional[Dict[str, Any]]): Data the model was trained on, see shared.incremental
+        search (Optional[List[Dict[str, Any]]]): Candidates of the model search, best first
+
+    Returns:
+        Dict[str, Any]: Manifest
+    """
+    return {
+        "format": ARTIFACT_FORMAT,
+        "wine_type": wine_type,
+        "model_class": type(model).__name__,
+        "features": [str(f) for f in getattr(scaler, "feature_names_in_", [])],
+        "classes": [int(c) for c in getattr(model, "classes_", [])],
+        "data_hash": data_hash,
+        "metrics": {k: float(v) for k, v in (metrics or {}).items()},
+        "schema": schema.to_dict() if schema is not None else None,
+        "training": training,
+        "search": search,
+        "created_at": datetime.now(timezone.utc).isoformat()
+    }
+
+
+def pack_artifact(model: Any, scaler: Any, manifest: Dict[str, Any]) -> bytes:
+    """
+    Pack a model, its scaler and their manifest into a single artifact.
+
+    The archive holds the manifest as JSON and an uncompressed joblib bundle
+    compressed as a zip member, so the transfer is small while the unpacked
+    bundle can be memory-mapped. Tree ensembles are also compiled into a
+    flat-array forest used by the inference path.
+
+    Args:
+        model: Fitted classifier
+        scaler: Fitted scaler
+        manifest (Dict[str, Any]): Manifest from build_manifest
+
+    Returns:
+        bytes: Artifact content
+    """
+    import joblib
+    from shared.compiled_forest import compile_forest
+
+    bundle = io.BytesIO()
+    joblib.dump({"model": model, "scaler": scaler}, bundle)
+
+    forest = None
+    if hasattr(model, "estimators_"):
+        forest = compile_forest(model, scaler).to_bytes()
+        manifest = dict(manifest, compiled=True)
+
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr(_member(MANIFEST_MEMBER, zipfile.ZIP_STORED), json.dumps(manifest, indent=2))
+        zf.writestr(_member(BUNDLE_MEMBER, zipfile.ZIP_DEFLATED), bundle.getvalue(), compresslevel=6)
+        if forest is not None:
+            # npz members are already compressed
+            zf.writestr(_member(FOREST_MEMBER, zipfile.ZIP_STORED), forest)
+    return archive.getvalue()
+
+
+def _member(name: str, compress_type: int) -> zipfile.ZipInfo:
+    info = zipfile.ZipInfo(name, date_time=MEMBER_DATE_TIME)
+    info.compress_type = compress_type
+    info.external_attr = 0o644 << 16
+    return info
+
+
+def content_digest(source: Union[bytes, str]) -> str:
+    """
+    SHA-256 of the model an artifact holds: its bundle and its manifest without RUN_FIELDS.
+
+    The artifact bytes also carry the creation time, search timings and the
+    compiled forest, an npz archive stamped with the time it was written and
+    derived from the bundle; none of them is digested, so retraining the same
+    model on the same data gives the same digest.
+
+    Args:
+        source (Union[bytes, str]): Artifact content or file path
+
+    Returns:
+        str: Hex digest
+    """
+    with zipfile.ZipFile(io.BytesIO(source) if isinstance(source, bytes) else source) as zf:
+        manifest = {k: v for k, v in json.loads(zf.read(MANIFEST_MEMBER)).items() if k not in RUN_FIELDS}
+        digest = hashlib.sha256(json.dumps(manifest, sort_keys=True).encode())
+        digest.update(b"\0")
+        digest.update(zf.read(BUNDLE_MEMBER))
+    return digest.hexdigest()
+
+
+def read_manifest(source: Union[bytes, str]) -> Dict[str, Any]:
+    """Return the manifest of an artifact (content or file path) without unpacking the model."""
+    with zipfile.ZipFile(io.BytesIO(source) if isinstance(source, bytes) else source) as zf:
+        return json.loads(zf.read(MANIFEST_MEMBER))
+
+
+def unpack_to_cache(source: Union[bytes, str], cache: Optional[DiskCache] = None) -> Tuple[str, Dict[str, Any]]:
+    """
+    Unpack the bundle of an artifact into the local disk cache.
+
+    Bundles of in-memory artifacts are keyed by the SHA-256 of their content,
+    those of cached artifact files by the file name, which is already content
+    addressed; workers on the same host unpack an artifact once and share it.
+
+    Args:
+        source (Union[bytes, str]): Artifact content, or path of a cached artifact file
+        cache (Optional[DiskCache]): Cache to use, defaults to the artifact cache
+
+    Returns:
+        Tuple[str, Dict[str, Any]]: (path of the unpacked bundle, manifest)
+    """
+    cache = cache or artifact_cache
+    if isinstance(source, bytes):
+        key = f"bundle:{hashlib.sha256(source).hexdigest()}"
+        archive = io.BytesIO(source)
+    else:
+        key = f"bundle:{source}"
+        archive = source
+
+    with zipfile.ZipFile(archive) as zf:
+        manifest = json.loads(zf.read(MANIFEST_MEMBER))
+
+        def extract(tmp_path: str) -> None:
+            with open(tmp_path, "wb") as out, zf.open(BUNDLE_MEMBER) as bundle:
+                shutil.copyfileobj(bundle, out, 1024 * 1024)
+
+        path = cache.get_or_create(key, extract)
+
+    return path, manifest
+
+
+def load_artifact(source: Union[bytes, str], cache: Optional[DiskCache] = None) -> Tuple[Any, Any, Dict[str, Any]]:
+    """
+    Load a model, its scaler and manifest from an artifact.
+
+    The bundle is unpacked to the local cache and loaded with mmap_mode='r',
+    so numpy arrays are mapped read-only from the page cache rather than
+    copied into each worker. sklearn trees copy their node arrays when they
+    are unpickled, so the shared pages cover the remaining arrays.
+
+    Args:
+        source (Union[bytes, str]): Artifact content, or path of a cached artifact file
+        cache (Optional[DiskCache]): Cache to use, defaults to the artifact cache
+
+    Returns:
+        Tuple[Any, Any, Dict[str, Any]]: (model, scaler, manifest)
+    """
+    import joblib
+
+    path, manifest = unpack_to_cache(source, cache)
+    bundle = joblib.load(path, mmap_mode="r")
+    logging.info(f"Loaded {manifest.get('wine_type')} artifact created at {manifest.get('created_at')}")
+    return bundle["model"], bundle["scaler"], manifest
+
+
+def load_compiled(source: Union[bytes, str]) -> Optional["CompiledForest"]:
+    """
+    Load the compiled forest of an artifact.
+
+    Args:
+        source (Union[bytes, str]): Artifact content, or path of a cached artifact file
+
+    Returns:
+        Optional[CompiledForest]: Compiled forest, or None for artifacts without one
+    """
+    from shared.compiled_forest import CompiledForest
+
+    with zipfile.ZipFile(io.BytesIO(source) if isinstance(source, bytes) else source) as zf:
+        if FOREST_MEMBER not in zf.namelist():
+            return None
+        return CompiledForest.from_bytes(zf.read(FOREST_MEMBER))
+
+
+def load_for_inference(source: Union[bytes, str],
+                       cache: Optional[DiskCache] = None) -> Tuple[Any, Any, Dict[str, Any], Optional["CompiledForest"]]:
+    """
+    Load what the inference path needs from an artifact.
+
+    When the artifact has a compiled forest, only the forest and manifest
+    are read: the joblib bundle is neither unpacked nor unpickled, so
+    serving a model does not import scikit-learn.
+
+    Args:
+        source (Union[bytes, str]): Artifact content, or path of a cached artifact file
+        cache (Optional[DiskCache]): Cache to use for bundles, defaults to the artifact cache
+
+    Returns:
+        Tuple[Any, Any, Dict[str, Any], Optional[CompiledForest]]: (model, scaler, manifest, compiled),
+        model and scaler being None when the compiled forest is returned
+    """
+    compiled = load_compiled(source)
+    if compiled is not None:
+        return None, None, read_manifest(source), compiled
+    model, scaler, manifest = load_artifact(source, cache)
+    return model, scaler, manifest, None
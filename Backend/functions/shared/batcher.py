@@ -0,0 +1,142 @@
+import asyncio
+import logging
+import os
+from typing import Any, Dict, List, Set, Tuple
+
+from shared.executor import run_blocking
+from shared.feature_schema import InvalidFeatures
+from shared.inference import predict_samples
+from shared.metrics import span
+from shared.model_cache import get_model_entry_async
+
+# Maximum time a request waits for others to join its batch
+BATCH_WINDOW_MS = float(os.getenv("BATCH_WINDOW_MS", "2"))
+# A batch is flushed as soon as it reaches this many rows
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "64"))
+
+# Upper bounds of the batch size histogram buckets
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+class ModelLoadError(Exception):
+    """The model of a batch could not be loaded."""
+
+
+class MicroBatcher:
+    """
+    Gathers concurrent single-row predictions into vectorized batches.
+
+    The first request for a wine type opens a batch and schedules its flush
+    after the window; requests arriving meanwhile join it, and a full batch
+    is flushed immediately. A flush runs one vectorized prediction
+    on the inference executor and resolves each request's future with its
+    own row's result, so an invalid row only fails its own request.
+    """
+
+    def __init__(self, window_ms: float = BATCH_WINDOW_MS, max_size: int = BATCH_MAX_SIZE, loader=get_model_entry_async):
+        self.window = window_ms / 1000.0
+        self.max_size = max_size
+        self.loader = loader
+        self._pending: Dict[str, List[Tuple[Dict[str, Any], asyncio.Future]]] = {}
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+        # The event loop only keeps weak references to tasks: running batches are held here until done
+        self._tasks: Set[asyncio.Task] = set()
+        self._histogram = {bucket: 0 for bucket in BATCH_SIZE_BUCKETS}
+        self._histogram["+Inf"] = 0
+        self._max_queue_depth = 0
+        self._batches = 0
+        self._rows = 0
+
+    async def submit(self, wine_type: str, features: Dict[str, Any]) -> int:
+        """
+        Queue one row for prediction and wait for its batch.
+
+        Args:
+            wine_type (str): Type of wine ('red' or 'white')
+            features (Dict[str, Any]): Feature values of the row
+
+        Returns:
+            int: Predicted quality
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        queue = self._pending.setdefault(wine_type, [])
+        queue.append((features, future))
+        self._max_queue_depth = max(self._max_queue_depth, len(queue))
+
+        if len(queue) >= self.max_size:
+            self._flush(wine_type)
+        elif wine_type not in self._timers:
+            self._timers[wine_type] = loop.call_later(self.window, self._flush, wine_type)
+
+        return await future
+
+    def _flush(self, wine_type: str) -> None:
+        timer = self._timers.pop(wine_type, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(wine_type, [])
+        if batch:
+            task = asyncio.ensure_future(self._run(wine_type, batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    def _observe(self, size: int) -> None:
+        self._batches += 1
+        self._rows += size
+        for bucket in BATCH_SIZE_BUCKETS:
+            if size <= bucket:
+                self._histogram[bucket] += 1
+                return
+        self._histogram["+Inf"] += 1
+
+    async def _run(self, wine_type: str, batch: List[Tuple[Dict[str, Any], asyncio.Future]]) -> None:
+        self._observe(len(batch))
+        try:
+            try:
+                entry = await self.loader(wine_type)
+            except Exception as e:
+                raise ModelLoadError(str(e)) from e
+
+            rows = [features for features, _ in batch]
+            # Includes the wait for an inference executor thread
+            with span("infer_phase", phase="batch", wine_type=wine_type):
+                results = await run_blocking(predict_samples, rows, wine_type, lambda _: entry)
+        except Exception as e:
+            logging.error(f"Batch of {len(batch)} {wine_type} rows failed: {str(e)}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if "fields" in result:
+                future.set_exception(InvalidFeatures(result["fields"]))
+            elif "error" in result:
+                future.set_exception(ValueError(result["error"]))
+            else:
+                future.set_result(result["prediction"])
+
+    def stats(self) -> Dict[str, Any]:
+        """Return queue depth, batch counts and the batch size histogram."""
+        return {
+            "queue_depth": {wine_type: len(queue) for wine_type, queue in self._pending.items()},
+            "max_queue_depth": self._max_queue_depth,
+            "batches": self._batches,
+            "rows": self._rows,
+            "batch_size_histogram": {str(bucket): count for bucket, count in self._histogram.items()}
+        }
+
+
+# One batcher per event loop: pending futures belong to the loop that created them
+_batchers: Dict[int, MicroBatcher] = {}
+
+
+def get_batcher() -> MicroBatcher:
+    loop_id = id(asyncio.get_running_loop())
+    batcher = _batchers.get(loop_id)
+    if batcher is None:
+        batcher = _batchers[loop_id] = MicroBatcher()
+    return batcher
@@ -0,0 +1,218 @@
+import io
+from typing import Any, Dict
+
+import numpy as np
+
+# sklearn trees compare float32 features against float64 thresholds
+TREE_DTYPE = np.float32
+_SIGN = np.uint64(1 << 63)
+
+
+class CompiledForest:
+    """
+    Random forest flattened into NumPy arrays, with the scaler folded in.
+
+    Node arrays of all trees are concatenated; children hold global node
+    indices and leaves point to themselves, so a batch walks every tree at
+    once with one gather per depth level. Thresholds are in raw feature
+    units, which removes the scaling step, and are chosen so each split
+    sends a value the same way as sklearn does after scaler.transform and
+    the float32 cast of tree inputs. Leaf values are the per-tree class
+    fractions, summed in estimator order like predict_proba, so
+    predictions match the sklearn model exactly.
+    """
+
+    def __init__(self, feature: np.ndarray, threshold: np.ndarray, left: np.ndarray, right: np.ndarray,
+                 value: np.ndarray, roots: np.ndarray, classes: np.ndarray, max_depth: int):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.classes = classes
+        self.max_depth = int(max_depth)
+        # Column 0 is taken when the split test holds, column 1 otherwise
+        self.children = np.stack([left, right], axis=1)
+
+    @property
+    def n_estimators(self) -> int:
+        return len(self.roots)
+
+    def apply(self, X: np.ndarray) -> np.ndarray:
+        """Return the leaf reached in every tree, shape (n_samples, n_estimators)."""
+        X = np.ascontiguousarray(X, dtype=np.float64)
+        rows = np.arange(len(X))[:, None]
+        node = np.broadcast_to(self.roots, (len(X), self.n_estimators))
+        for _ in range(self.max_depth):
+            goes_right = X[rows, self.feature[node]] > self.threshold[node]
+            step = self.children[node, goes_right.astype(np.intp)]
+            if np.array_equal(step, node):
+                break
+            node = step
+        return node
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        """
+        Class probabilities for raw (unscaled) feature rows.
+
+        Args:
+            X (np.ndarray): Features in scaler.feature_names_in_ order
+
+        Returns:
+            np.ndarray: Probabilities, shape (n_samples, n_classes)
+        """
+        leaves = self.apply(X)
+        # Reducing over the outer axis adds the trees one at a time, in order, like sklearn
+        proba = np.add.reduce(self.value[leaves.T], axis=0)
+        proba /= self.n_estimators
+        return proba
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        """Predicted classes for raw (unscaled) feature rows."""
+        return self.classes.take(np.argmax(self.predict_proba(X), axis=1))
+
+    def to_bytes(self) -> bytes:
+        """Serialize the arrays as a compressed npz archive."""
+        buffer = io.BytesIO()
+        np.savez_compressed(buffer, **self._arrays())
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "CompiledForest":
+        """Load a forest written by to_bytes."""
+        with np.load(io.BytesIO(data)) as arrays:
+            fields = {name: arrays[name] for name in arrays.files}
+        fields["max_depth"] = int(fields["max_depth"])
+        return cls(**fields)
+
+    def _arrays(self) -> Dict[str, np.ndarray]:
+        return {
+            "feature": self.feature, "threshold": self.threshold, "left": self.left, "right": self.right,
+            "value": self.value, "roots": self.roots, "classes": self.classes,
+            "max_depth": np.array(self.max_depth)
+        }
+
+
+def _ordered(x: np.ndarray) -> np.ndarray:
+    # Map float64 values to uint64 keys with the same order
+    bits = x.view(np.uint64)
+    return np.where(bits & _SIGN, ~bits, bits | _SIGN)
+
+
+def _unordered(key: np.ndarray) -> np.ndarray:
+    bits = np.where(key & _SIGN, key ^ _SIGN, ~key)
+    return bits.view(np.float64)
+
+
+def fold_thresholds(threshold: np.ndarray, mean: np.ndarray, scale: np.ndarray) -> np.ndarray:
+    """
+    Move split thresholds from scaled to raw feature units.
+
+    sklearn goes left when float32((x - mean) / scale) <= threshold. That
+    test is monotonic in x, so the split is exactly x <= t for t the largest
+    float64 passing it, found by bisection over the ordered float64 bit
+    patterns of all thresholds at once.
+
+    Args:
+        threshold (np.ndarray): Thresholds in scaled units
+        mean (np.ndarray): Scaler mean of each threshold's feature
+        scale (np.ndarray): Scaler scale of each threshold's feature
+
+    Returns:
+        np.ndarray: Thresholds in raw units
+    """
+    def goes_left(x: np.ndarray) -> np.ndarray:
+        with np.errstate(over="ignore", invalid="ignore"):
+            return ((x - mean) / scale).astype(TREE_DTYPE) <= threshold
+
+    lo = _ordered(np.full(threshold.shape, -np.finfo(np.float64).max))
+    hi = _ordered(np.full(threshold.shape, np.finfo(np.float64).max))
+    # Invariant: lo goes left and hi goes right (clamped at the float64 range)
+    hi_left = goes_left(_unordered(hi))
+    lo_left = goes_left(_unordered(lo))
+    for _ in range(64):
+        mid = lo + (hi - lo) // np.uint64(2)
+        left = goes_left(_unordered(mid))
+        lo = np.where(left, mid, lo)
+        hi = np.where(left, hi, mid)
+
+    folded = _unordered(lo).copy()
+    folded[hi_left] = np.inf
+    folded[~lo_left] = -np.inf
+    return folded
+
+
+def compile_forest(model: Any, scaler: Any) -> CompiledForest:
+    """
+    Compile a fitted forest classifier and its StandardScaler.
+
+    Args:
+        model: Fitted RandomForestClassifier (or another forest of decision trees)
+        scaler: Fitted StandardScaler whose output the model was trained on
+
+    Returns:
+        CompiledForest: Flat-array predictor taking unscaled features
+    """
+    n_features = model.n_features_in_
+    mean = getattr(scaler, "mean_", None)
+    scale = getattr(scaler, "scale_", None)
+    mean = np.zeros(n_features) if mean is None else np.asarray(mean, dtype=np.float64)
+    scale = np.ones(n_features) if scale is None else np.asarray(scale, dtype=np.float64)
+
+    features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+    offset = max_depth = 0
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        is_leaf = tree.children_left == -1
+        index = np.arange(tree.node_count)
+
+        # Leaves loop onto themselves, so finished walks stay put while deeper trees continue
+        feature = np.where(is_leaf, 0, tree.feature)
+        threshold = np.where(is_leaf, np.inf, fold_thresholds(tree.threshold, mean[feature], scale[feature]))
+        features.append(feature.astype(np.int32))
+        thresholds.append(threshold)
+        lefts.append((np.where(is_leaf, index, tree.children_left) + offset).astype(np.int32))
+        rights.append((np.where(is_leaf, index, tree.children_right) + offset).astype(np.int32))
+
+        # Same normalization as DecisionTreeClassifier.predict_proba
+        value = tree.value[:, 0, :model.n_classes_].astype(np.float64)
+        normalizer = value.sum(axis=1)[:, None]
+        normalizer[normalizer == 0.0] = 1.0
+        values.append(value / normalizer)
+
+        roots.append(offset)
+        offset += tree.node_count
+        max_depth = max(max_depth, tree.max_depth)
+
+    return CompiledForest(
+        feature=np.concatenate(features),
+        threshold=np.concatenate(thresholds),
+        left=np.concatenate(lefts),
+        right=np.concatenate(rights),
+        value=np.concatenate(values),
+        roots=np.array(roots, dtype=np.int32),
+        classes=np.asarray(model.classes_),
+        max_depth=max_depth
+    )
+
+
+def predict_features(model: Any, scaler: Any, X: Any) -> np.ndarray:
+    """
+    Predict rows of raw features with a compiled forest or a (model, scaler) pair.
+
+    Args:
+        model: CompiledForest, or a fitted classifier
+        scaler: Fitted scaler, unused by a compiled forest
+        X: Features in scaler.feature_names_in_ order (DataFrame or array)
+
+    Returns:
+        np.ndarray: Predicted classes
+    """
+    if isinstance(model, CompiledForest):
+        return model.predict(np.asarray(X, dtype=np.float64))
+    if isinstance(X, np.ndarray) and hasattr(scaler, "feature_names_in_"):
+        # The scaler was fitted on named columns and warns on bare arrays
+        import pandas as pd
+        X = pd.DataFrame(X, columns=scaler.feature_names_in_)
+    return model.predict(scaler.transform(X))
@@ -0,0 +1,77 @@
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import List
+
+from azure.core.exceptions import ResourceNotFoundError
+
+from shared.dataset_stats import stats_blob_name
+
+RAW_CONTAINER = "raw"
+# Appended uploads are stored as partitions/{wine_type}/{timestamp}-{id}.csv in the raw container
+PARTITIONS_PREFIX = "partitions"
+
+
+@dataclass(frozen=True)
+class Partition:
+    """One appended chunk of a raw dataset."""
+    name: str
+    etag: str
+    size: int
+
+
+def raw_blob_name(wine_type: str) -> str:
+    """Base dataset of a wine type, replaced by every non-append upload."""
+    return f"uploaded_{wine_type}.csv"
+
+
+def partition_prefix(wine_type: str) -> str:
+    return f"{PARTITIONS_PREFIX}/{wine_type}/"
+
+
+def new_partition_name(wine_type: str) -> str:
+    """
+    Name of a new partition blob.
+
+    Names start with a UTC timestamp so that listing order is append order.
+    """
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+    return f"{partition_prefix(wine_type)}{stamp}-{uuid.uuid4().hex[:8]}.csv"
+
+
+async def list_partitions(blob_service, wine_type: str) -> List[Partition]:
+    """
+    List the appended partitions of a wine type, in append order.
+
+    Args:
+        blob_service: Async client to access blob storage
+        wine_type (str): Type of wine ('red' or 'white')
+
+    Returns:
+        List[Partition]: Partitions, statistics documents excluded
+    """
+    container = blob_service.get_container_client(RAW_CONTAINER)
+    partitions = [
+        Partition(b.name, b.etag, b.size)
+        async for b in container.list_blobs(name_starts_with=partition_prefix(wine_type))
+        if b.name.endswith(".csv")
+    ]
+    return sorted(partitions, key=lambda p: p.name)
+
+
+async def delete_partitions(blob_service, wine_type: str) -> int:
+    """
+    Delete the partitions of a wine type and their statistics, when its base dataset is replaced.
+
+    Returns:
+        int: Number of partitions deleted
+    """
+    container = blob_service.get_container_client(RAW_CONTAINER)
+    partitions = await list_partitions(blob_service, wine_type)
+    for partition in partitions:
+        await container.delete_blob(partition.name)
+        try:
+            await container.delete_blob(stats_blob_name(partition.name))
+        except ResourceNotFoundError:
+            pass
+    return len(partitions)
@@ -0,0 +1,197 @@
+import json
+import math
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence
+
+# Column holding the class label; it gets a histogram instead of a scaler entry
+TARGET_COLUMN = "quality"
+
+
+def stats_blob_name(raw_blob: str) -> str:
+    """Name of the statistics document stored next to a raw blob."""
+    return f"{raw_blob.rsplit('.', 1)[0]}.stats.json"
+
+
+@dataclass
+class ColumnStats:
+    """
+    Running count, mean, sum of squared deviations (M2), min and max of a column.
+
+    Values are added with Welford's update and partial results are combined
+    with Chan's parallel formula, so statistics of separate uploads merge
+    into those of the concatenated data.
+    """
+    count: int = 0
+    mean: float = 0.0
+    m2: float = 0.0
+    minimum: float = math.inf
+    maximum: float = -math.inf
+    nulls: int = 0
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.minimum = min(self.minimum, value)
+        self.maximum = max(self.maximum, value)
+
+    @classmethod
+    def from_values(cls, values: Any) -> "ColumnStats":
+        """Statistics of a NumPy array of values without missing ones, computed in float64."""
+        import numpy as np
+
+        values = np.asarray(values, dtype=np.float64)
+        if values.size == 0:
+            return cls()
+        mean = float(values.mean())
+        return cls(
+            count=int(values.size),
+            mean=mean,
+            m2=float(((values - mean) ** 2).sum()),
+            minimum=float(values.min()),
+            maximum=float(values.max())
+        )
+
+    def merge(self, other: "ColumnStats") -> "ColumnStats":
+        count = self.count + other.count
+        if count == 0:
+            return ColumnStats(nulls=self.nulls + other.nulls)
+        delta = other.mean - self.mean
+        return ColumnStats(
+            count=count,
+            mean=self.mean + delta * other.count / count,
+            m2=self.m2 + other.m2 + delta * delta * self.count * other.count / count,
+            minimum=min(self.minimum, other.minimum),
+            maximum=max(self.maximum, other.maximum),
+            nulls=self.nulls + other.nulls
+        )
+
+    @property
+    def variance(self) -> float:
+        """Population variance, as used by StandardScaler."""
+        return self.m2 / self.count if self.count else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "m2": self.m2,
+            "min": self.minimum if self.count else None,
+            "max": self.maximum if self.count else None,
+            "nulls": self.nulls
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ColumnStats":
+        return cls(
+            count=data["count"],
+            mean=data["mean"],
+            m2=data["m2"],
+            minimum=math.inf if data.get("min") is None else data["min"],
+            maximum=-math.inf if data.get("max") is None else data["max"],
+            nulls=data.get("nulls", 0)
+        )
+
+
+@dataclass
+class DatasetStats:
+    """
+    Mergeable per-column statistics of a raw wine dataset, computed in one pass.
+
+    Like preprocess_data, which drops incomplete rows before fitting the
+    scaler, moments are accumulated over complete rows only; null counts and
+    the number of dropped rows are kept separately. The statistics are
+    therefore enough to build the exact scaler training would fit.
+    """
+    columns: Dict[str, ColumnStats] = field(default_factory=dict)
+    rows: int = 0
+    dropped_rows: int = 0
+    classes: Dict[str, int] = field(default_factory=dict)
+
+    def add_row(self, names: Sequence[str], values: Sequence[Optional[float]]) -> None:
+        """
+        Add one parsed row.
+
+        Args:
+            names (Sequence[str]): Column names, in row order
+            values (Sequence[Optional[float]]): Values, None for missing ones
+        """
+        complete = True
+        for name, value in zip(names, values):
+            if value is None:
+                self.columns.setdefault(name, ColumnStats()).nulls += 1
+                complete = False
+        if not complete:
+            self.dropped_rows += 1
+            return
+
+        self.rows += 1
+        for name, value in zip(names, values):
+            self.columns.setdefault(name, ColumnStats()).add(value)
+            if name == TARGET_COLUMN:
+                label = str(int(value)) if float(value).is_integer() else str(value)
+                self.classes[label] = self.classes.get(label, 0) + 1
+
+    def merge(self, other: "DatasetStats") -> "DatasetStats":
+        """Statistics of the concatenation of both datasets."""
+        names = list(self.columns) + [n for n in other.columns if n not in self.columns]
+        classes = dict(self.classes)
+        for label, count in other.classes.items():
+            classes[label] = classes.get(label, 0) + count
+        return DatasetStats(
+            columns={n: self.columns.get(n, ColumnStats()).merge(other.columns.get(n, ColumnStats())) for n in names},
+            rows=self.rows + other.rows,
+            dropped_rows=self.dropped_rows + other.dropped_rows,
+            classes=classes
+        )
+
+    @property
+    def features(self) -> List[str]:
+        return [name for name in self.columns if name != TARGET_COLUMN]
+
+    def to_scaler(self, features: Optional[Sequence[str]] = None) -> Any:
+        """
+        Build a fitted StandardScaler from the statistics, without the data.
+
+        Args:
+            features (Optional[Sequence[str]]): Feature columns in model order, defaults to upload order
+
+        Returns:
+            StandardScaler: Scaler equivalent to one fitted on the complete rows
+        """
+        import numpy as np
+        from sklearn.preprocessing import StandardScaler
+
+        features = list(features or self.features)
+        var = np.array([self.columns[f].variance for f in features], dtype=np.float64)
+        scaler = StandardScaler()
+        scaler.mean_ = np.array([self.columns[f].mean for f in features], dtype=np.float64)
+        scaler.var_ = var
+        # Constant columns are left unscaled, as StandardScaler does
+        scaler.scale_ = np.where(var > 0, np.sqrt(var), 1.0)
+        scaler.n_samples_seen_ = self.rows
+        scaler.n_features_in_ = len(features)
+        scaler.feature_names_in_ = np.array(features, dtype=object)
+        return scaler
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "rows": self.rows,
+            "dropped_rows": self.dropped_rows,
+            "columns": {name: stats.to_dict() for name, stats in self.columns.items()},
+            "classes": self.classes
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "DatasetStats":
+        return cls(
+            columns={name: ColumnStats.from_dict(s) for name, s in data.get("columns", {}).items()},
+            rows=data.get("rows", 0),
+            dropped_rows=data.get("dropped_rows", 0),
+            classes=dict(data.get("classes", {}))
+        )
+
+    def to_json(self, **extra: Any) -> bytes:
+        """Serialized document, with extra fields such as the ETag of the raw blob."""
+        return json.dumps({**extra, **self.to_dict()}).encode()
@@ -0,0 +1,238 @@
+import asyncio
+import fcntl
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Optional
+
+from azure.core import MatchConditions
+
+from shared.metrics import register_collector
+
+# Local directory shared by all worker processes of the host
+DEFAULT_CACHE_DIR = os.getenv("MODEL_CACHE_DIR", os.path.join(tempfile.gettempdir(), "winalyze-models"))
+# Total size of cached files above which the least recently used ones are evicted
+DEFAULT_MAX_BYTES = int(os.getenv("MODEL_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+LOCK_SUFFIX = ".lock"
+TMP_SUFFIX = ".tmp"
+
+
+class DiskCache:
+    """
+    Content-addressed file cache shared by the worker processes of one host.
+
+    Entries are files named after the SHA-256 of their key. Creating an entry
+    holds an exclusive flock on a sidecar lock file, so when several workers
+    miss on the same key only the first one produces it and the others reuse
+    the result. File mtimes track recency for LRU eviction by total size.
+    Lock files are empty and never removed: another worker may hold or wait
+    on one, and a new lock file would let two workers create the same entry.
+    """
+
+    def __init__(self, root: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0}
+        self._counters_lock = threading.Lock()
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.root, hashlib.sha256(key.encode()).hexdigest())
+
+    def _count(self, name: str, n: int = 1) -> None:
+        with self._counters_lock:
+            self._counters[name] += n
+
+    @contextmanager
+    def _locked(self, path: str) -> Iterator[None]:
+        os.makedirs(self.root, exist_ok=True)
+        with open(path + LOCK_SUFFIX, "a") as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _hit(self, path: str) -> bool:
+        if not os.path.exists(path):
+            return False
+        # Refresh recency for LRU eviction
+        os.utime(path)
+        self._count("hits")
+        return True
+
+    def _commit(self, tmp_path: str, path: str) -> None:
+        os.replace(tmp_path, path)
+        self._count("misses")
+        self.evict(keep=path)
+
+    def get_or_create(self, key: str, create: Callable[[str], None]) -> str:
+        """
+        Return the path of a cached entry, creating it on a miss.
+
+        Args:
+            key (str): Cache key, e.g. 'container/blob@etag'
+            create: Function writing the entry content to the temporary path it is given
+
+        Returns:
+            str: Path of the cached file
+        """
+        path = self.path_for(key)
+        if self._hit(path):
+            return path
+
+        with self._locked(path):
+            # Another worker may have created it while we waited for the lock
+            if self._hit(path):
+                return path
+            tmp_path = path + TMP_SUFFIX
+            try:
+                create(tmp_path)
+                self._commit(tmp_path, path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+        return path
+
+    async def get_or_create_async(self, key: str, create) -> str:
+        """
+        Async variant of get_or_create for coroutine producers.
+
+        Args:
+            key (str): Cache key
+            create: Coroutine function writing the entry content to the temporary path it is given
+
+        Returns:
+            str: Path of the cached file
+        """
+        path = self.path_for(key)
+        if self._hit(path):
+            return path
+
+        os.makedirs(self.root, exist_ok=True)
+        lock_file = open(path + LOCK_SUFFIX, "a")
+        try:
+            # Wait for the lock without blocking the event loop
+            await asyncio.to_thread(fcntl.flock, lock_file.fileno(), fcntl.LOCK_EX)
+            if self._hit(path):
+                return path
+            tmp_path = path + TMP_SUFFIX
+            try:
+                await create(tmp_path)
+                # Eviction scans the cache directory
+                await asyncio.to_thread(self._commit, tmp_path, path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            return path
+        finally:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+            lock_file.close()
+
+    def evict(self, keep: Optional[str] = None) -> int:
+        """
+        Remove least recently used entries until the cache fits in max_bytes.
+
+        Args:
+            keep (Optional[str]): Path that must not be evicted (the entry just created)
+
+        Returns:
+            int: Number of evicted entries
+        """
+        entries = []
+        total = 0
+        for name in os.listdir(self.root):
+            if name.endswith(LOCK_SUFFIX) or name.endswith(TMP_SUFFIX):
+                continue
+            path = os.path.join(self.root, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        evicted = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                # Processes that still have the file open or mapped keep their copy; the lock file stays
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            evicted += 1
+
+        if evicted:
+            self._count("evictions", evicted)
+            logging.info(f"Artifact cache evicted {evicted} entries, {total} bytes in use")
+        return evicted
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit, miss and eviction counters of this process."""
+        with self._counters_lock:
+            return dict(self._counters)
+
+
+artifact_cache = DiskCache()
+register_collector("artifact_cache", artifact_cache.stats)
+
+
+def blob_cache_key(container: str, blob: str, etag: str) -> str:
+    return f"{container}/{blob}@{etag}"
+
+
+def cached_blob_path(blob_client, etag: Optional[str] = None, cache: Optional[DiskCache] = None) -> str:
+    """
+    Return a local copy of a blob, downloading it only if this version is not cached.
+
+    Args:
+        blob_client: Sync blob client
+        etag (Optional[str]): Known ETag of the blob, looked up if not given
+        cache (Optional[DiskCache]): Cache to use, defaults to the artifact cache
+
+    Returns:
+        str: Path of the local copy
+    """
+    cache = cache or artifact_cache
+    etag = etag or blob_client.get_blob_properties().etag
+
+    def download(tmp_path: str) -> None:
+        with open(tmp_path, "wb") as out:
+            blob_client.download_blob(etag=etag, match_condition=MatchConditions.IfNotModified).readinto(out)
+
+    key = blob_cache_key(blob_client.container_name, blob_client.blob_name, etag)
+    return cache.get_or_create(key, download)
+
+
+async def cached_blob_path_async(blob_client, etag: Optional[str] = None, cache: Optional[DiskCache] = None) -> str:
+    """
+    Async variant of cached_blob_path for aio blob clients.
+
+    Args:
+        blob_client: Async blob client
+        etag (Optional[str]): Known ETag of the blob, looked up if not given
+        cache (Optional[DiskCache]): Cache to use, defaults to the artifact cache
+
+    Returns:
+        str: Path of the local copy
+    """
+    cache = cache or artifact_cache
+    if etag is None:
+        properties = await blob_client.get_blob_properties()
+        etag = properties.etag
+
+    async def download(tmp_path: str) -> None:
+        stream = await blob_client.download_blob(etag=etag, match_condition=MatchConditions.IfNotModified)
+        with open(tmp_path, "wb") as out:
+            async for chunk in stream.chunks():
+                out.write(chunk)
+
+    key = blob_cache_key(blob_client.container_name, blob_client.blob_name, etag)
+    return await cache.get_or_create_async(key, download)
@@ -0,0 +1,36 @@
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+# Threads available to CPU-bound inference work (artifact loading, transform, predict)
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def get_inference_executor() -> ThreadPoolExecutor:
+    """Return the bounded executor for inference work, creating it on first use."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=INFERENCE_WORKERS, thread_name_prefix="inference")
+    return _executor
+
+
+async def run_blocking(fn: Callable, *args: Any, **kwargs: Any) -> Any:
+    """
+    Run a blocking or CPU-bound call on the inference executor without blocking the event loop.
+
+    Concurrency is bounded by INFERENCE_WORKERS; extra calls queue in the executor.
+
+    Args:
+        fn: Function to call
+        *args: Positional arguments
+        **kwargs: Keyword arguments
+
+    Returns:
+        Any: Return value of fn
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_inference_executor(), functools.partial(fn, *args, **kwargs))
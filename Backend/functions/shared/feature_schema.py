@@ -0,0 +1,178 @@
+import math
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Accepted values extend this fraction of the training range beyond each side of it
+RANGE_MARGIN = float(os.getenv("FEATURE_RANGE_MARGIN", "0.5"))
+
+# A field error is a JSON-ready dict: {"field", "code", and "min"/"max" for range errors}
+FieldError = Dict[str, Any]
+
+
+class InvalidFeatures(ValueError):
+    """A row does not satisfy the feature schema of the model."""
+
+    def __init__(self, errors: List[FieldError]):
+        super().__init__(describe_errors(errors))
+        self.errors = errors
+
+
+def describe_errors(errors: List[FieldError]) -> str:
+    return f"Missing or invalid features: {', '.join(e['field'] for e in errors)}"
+
+
+@dataclass(frozen=True)
+class FeatureSchema:
+    """
+    Names, order, dtypes and valid ranges of the features a model takes.
+
+    The schema is stored in the artifact manifest at training time. Request
+    rows are decoded against it straight into a preallocated NumPy buffer,
+    in the order the scaler was fitted on, whatever the key order of the
+    payload, with one validation pass that reports every bad field.
+    """
+    names: Tuple[str, ...]
+    dtypes: Tuple[str, ...]
+    minimum: Tuple[float, ...]
+    maximum: Tuple[float, ...]
+
+    @classmethod
+    def from_training(cls, X_scaled: Any, scaler: Any, margin: float = RANGE_MARGIN) -> "FeatureSchema":
+        """
+        Build the schema of a model from its scaled training features.
+
+        Args:
+            X_scaled: Scaled training features (DataFrame or array)
+            scaler: Fitted StandardScaler
+            margin (float): Fraction of the observed range accepted beyond each side of it
+
+        Returns:
+            FeatureSchema: Schema with the observed raw ranges, widened by the margin
+        """
+        raw = np.asarray(X_scaled, dtype=np.float64) * scaler.scale_ + scaler.mean_
+        return cls.from_ranges(scaler.feature_names_in_, raw.min(axis=0), raw.max(axis=0), margin)
+
+    @classmethod
+    def from_ranges(cls, names: Sequence[str], low: Sequence[float], high: Sequence[float],
+                    margin: float = RANGE_MARGIN) -> "FeatureSchema":
+        """
+        Build the schema of a model from the observed raw range of each feature.
+
+        Args:
+            names (Sequence[str]): Feature names in model order
+            low (Sequence[float]): Observed minimum of each feature
+            high (Sequence[float]): Observed maximum of each feature
+            margin (float): Fraction of the observed range accepted beyond each side of it
+
+        Returns:
+            FeatureSchema: Schema with the observed ranges, widened by the margin
+        """
+        names = tuple(str(f) for f in names)
+        low, high = np.asarray(low, dtype=np.float64), np.asarray(high, dtype=np.float64)
+        span = high - low
+        # Quantities never negative in the training data (concentrations, pH...) stay non-negative
+        minimum = np.where(low >= 0, np.maximum(low - margin * span, 0.0), low - margin * span)
+        return cls(
+            names=names,
+            dtypes=("float64",) * len(names),
+            minimum=tuple(float(v) for v in minimum),
+            maximum=tuple(float(v) for v in high + margin * span)
+        )
+
+    @classmethod
+    def from_names(cls, names: Sequence[str]) -> "FeatureSchema":
+        """Schema without range checks, for models trained before schemas were stored."""
+        return cls(tuple(names), ("float64",) * len(names), (-math.inf,) * len(names), (math.inf,) * len(names))
+
+    @classmethod
+    def from_manifest(cls, manifest: Dict[str, Any], scaler: Any = None) -> "FeatureSchema":
+        """
+        Read the schema of an artifact manifest.
+
+        Args:
+            manifest (Dict[str, Any]): Artifact manifest
+            scaler: Scaler of the artifact, used when the manifest has no schema
+
+        Returns:
+            FeatureSchema: Stored schema, or one derived from the feature names
+        """
+        if manifest.get("schema"):
+            return cls.from_dict(manifest["schema"])
+        return cls.from_names(manifest.get("features") or [str(f) for f in getattr(scaler, "feature_names_in_", [])])
+
+    def union(self, other: "FeatureSchema") -> "FeatureSchema":
+        """Schema accepting the values valid in either schema, over the features of this one."""
+        ranges = dict(zip(other.names, zip(other.minimum, other.maximum)))
+        low = [min(lo, ranges.get(n, (lo, hi))[0]) for n, lo, hi in zip(self.names, self.minimum, self.maximum)]
+        high = [max(hi, ranges.get(n, (lo, hi))[1]) for n, lo, hi in zip(self.names, self.minimum, self.maximum)]
+        return FeatureSchema(self.names, self.dtypes, tuple(low), tuple(high))
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-ready form, with unbounded ranges as null."""
+        return {
+            "fields": [
+                {
+                    "name": name,
+                    "dtype": dtype,
+                    "min": low if math.isfinite(low) else None,
+                    "max": high if math.isfinite(high) else None
+                }
+                for name, dtype, low, high in zip(self.names, self.dtypes, self.minimum, self.maximum)
+            ]
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "FeatureSchema":
+        fields = data["fields"]
+        return cls(
+            names=tuple(f["name"] for f in fields),
+            dtypes=tuple(f.get("dtype", "float64") for f in fields),
+            minimum=tuple(-math.inf if f.get("min") is None else float(f["min"]) for f in fields),
+            maximum=tuple(math.inf if f.get("max") is None else float(f["max"]) for f in fields)
+        )
+
+    def decode(self, rows: Sequence[Mapping[str, Any]],
+               out: Optional[np.ndarray] = None) -> Tuple[np.ndarray, List[List[FieldError]]]:
+        """
+        Decode rows into a feature buffer, validating every field once.
+
+        Args:
+            rows (Sequence[Mapping[str, Any]]): Parsed rows; extra keys are ignored
+            out (Optional[np.ndarray]): Buffer of shape (len(rows), len(names)) to fill
+
+        Returns:
+            Tuple[np.ndarray, List[List[FieldError]]]: (buffer, field errors of each row, empty when valid)
+        """
+        if out is None:
+            out = np.empty((len(rows), len(self.names)), dtype=np.float64)
+        fields = list(zip(range(len(self.names)), self.names, self.minimum, self.maximum))
+        errors: List[List[FieldError]] = []
+
+        for i, row in enumerate(rows):
+            row_errors: List[FieldError] = []
+            target = out[i]
+            for j, name, low, high in fields:
+                value = row.get(name)
+                if value is None or value == "":
+                    row_errors.append({"field": name, "code": "missing"})
+                    continue
+                try:
+                    if isinstance(value, bool):
+                        raise TypeError(name)
+                    number = float(value)
+                except (TypeError, ValueError):
+                    row_errors.append({"field": name, "code": "not_a_number"})
+                    continue
+                if not math.isfinite(number):
+                    row_errors.append({"field": name, "code": "not_a_number"})
+                    continue
+                if not low <= number <= high:
+                    row_errors.append({"field": name, "code": "out_of_range", "min": low, "max": high})
+                    continue
+                target[j] = number
+            errors.append(row_errors)
+
+        return out, errors
@@ -0,0 +1,120 @@
+import os
+import subprocess
+import sys
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+# Function packages loaded by the host, profiled by the startup report
+ENTRY_POINTS = (
+    "infer_function",
+    "metrics_function",
+    "model_status",
+    "score_function",
+    "score_queue_function",
+    "train_function",
+    "train_queue_function",
+    "upload_function",
+    "validate_function",
+)
+
+# Directory the host imports function packages from
+FUNCTIONS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_TIME_PREFIX = "import time:"
+
+
+@dataclass(frozen=True)
+class ImportCost:
+    """Import time of one module, as reported by python -X importtime."""
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def parse_importtime(output: str) -> List[ImportCost]:
+    """
+    Parse the stderr of python -X importtime.
+
+    Args:
+        output (str): Captured stderr
+
+    Returns:
+        List[ImportCost]: One entry per imported module, in report order
+    """
+    costs = []
+    for line in output.splitlines():
+        if not line.startswith(IMPORT_TIME_PREFIX):
+            continue
+        fields = line[len(IMPORT_TIME_PREFIX):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            # Header line
+            continue
+        name = fields[2].rstrip()
+        module = name.lstrip()
+        # Nested imports are indented by two spaces per level
+        depth = (len(name) - len(module) - 1) // 2
+        costs.append(ImportCost(module, int(fields[0]), int(fields[1]), depth))
+    return costs
+
+
+def profile_imports(module: str, python: Optional[str] = None, cwd: str = FUNCTIONS_DIR) -> List[ImportCost]:
+    """
+    Import a module in a fresh interpreter and measure the cost of every module it pulls in.
+
+    Args:
+        module (str): Module to import, e.g. an entry point package
+        python (Optional[str]): Interpreter to run, defaults to the current one
+        cwd (str): Directory to import from, defaults to the function app root
+
+    Returns:
+        List[ImportCost]: Cost of each imported module
+
+    Raises:
+        RuntimeError: If the module cannot be imported
+    """
+    result = subprocess.run(
+        [python or sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=cwd, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed: {result.stderr.strip().splitlines()[-1:]}")
+    return parse_importtime(result.stderr)
+
+
+def total_import_ms(costs: List[ImportCost]) -> float:
+    """Wall time of the top-level imports, in milliseconds."""
+    return sum(c.cumulative_us for c in costs if c.depth == 0) / 1000
+
+
+def top_level_packages(costs: List[ImportCost]) -> Dict[str, int]:
+    """Cumulative import time per top-level package, in microseconds, most expensive first."""
+    packages: Dict[str, int] = {}
+    for cost in costs:
+        package = cost.module.split(".")[0]
+        packages[package] = packages.get(package, 0) + cost.self_us
+    return dict(sorted(packages.items(), key=lambda item: item[1], reverse=True))
+
+
+def import_report(module: str, top: int = 10) -> str:
+    """
+    Startup report of an entry point: total import time and its most expensive packages.
+
+    Args:
+        module (str): Module to profile
+        top (int): Number of packages listed
+
+    Returns:
+        str: Human readable report
+    """
+    costs = profile_imports(module)
+    lines = [f"{module}: {total_import_ms(costs):.1f} ms, {len(costs)} modules"]
+    for package, us in list(top_level_packages(costs).items())[:top]:
+        lines.append(f"  {us / 1000:8.1f} ms  {package}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    # python -m shared.import_profile [module ...]
+    for entry_point in sys.argv[1:] or ENTRY_POINTS:
+        print(import_report(entry_point))
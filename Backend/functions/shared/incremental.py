@@ -0,0 +1,160 @@
+import math
+import os
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence
+
+FULL = "full"
+INCREMENTAL = "incremental"
+
+# New rows, as a fraction of all rows, above which the forest is retrained from scratch
+MAX_NEW_FRACTION = float(os.getenv("INCREMENTAL_MAX_NEW_FRACTION", "0.25"))
+# Incremental rounds allowed between two full retrains
+MAX_ROUNDS = int(os.getenv("INCREMENTAL_MAX_ROUNDS", "5"))
+# Trees added per incremental round, at least
+MIN_NEW_TREES = int(os.getenv("INCREMENTAL_MIN_TREES", "10"))
+# Validation accuracy an incremental model may lose against the production model
+MAX_ACCURACY_LOSS = float(os.getenv("INCREMENTAL_MAX_ACCURACY_LOSS", "0.01"))
+
+
+class FullRetrainRequired(Exception):
+    """Raised when new data cannot be added to the existing forest."""
+
+
+@dataclass(frozen=True)
+class TrainingPlan:
+    """How the next model of a wine type is trained, and why."""
+    mode: str
+    reason: str
+    new_partitions: List[str] = field(default_factory=list)
+
+
+def training_record(base_etag: str, partitions: Sequence[str], rows: int,
+                    mode: str = FULL, rounds: int = 0, full_trees: Optional[int] = None,
+                    class_counts: Optional[Dict[str, int]] = None) -> Dict[str, Any]:
+    """
+    Describe the data a model was trained on, for the 'training' field of its manifest.
+
+    Args:
+        base_etag (str): ETag of the base raw blob
+        partitions (Sequence[str]): Partitions included, in append order
+        rows (int): Training rows after cleaning
+        mode (str): FULL or INCREMENTAL
+        rounds (int): Incremental rounds since the last full retrain
+        full_trees (Optional[int]): Trees of the last full retrain
+        class_counts (Optional[Dict[str, int]]): Rows per class, see count_classes
+
+    Returns:
+        Dict[str, Any]: JSON-ready record
+    """
+    return {
+        "mode": mode,
+        "base_etag": base_etag,
+        "partitions": list(partitions),
+        "rows": rows,
+        "rounds": rounds,
+        "full_trees": full_trees,
+        "class_counts": class_counts
+    }
+
+
+def plan_training(base_etag: str,
+                  partitions: Sequence[str],
+                  production: Optional[Dict[str, Any]],
+                  force_full: bool = False) -> TrainingPlan:
+    """
+    Decide between a full retrain and adding trees for new partitions.
+
+    A model can only be extended when it was trained on the same base
+    dataset and on a prefix of the current partitions; otherwise, or after
+    MAX_ROUNDS incremental rounds, the forest is retrained from scratch.
+    The share of new rows is checked once they are parsed, see
+    needs_full_retrain.
+
+    Args:
+        base_etag (str): ETag of the base raw blob
+        partitions (Sequence[str]): Current partitions, in append order
+        production (Optional[Dict[str, Any]]): Manifest of the production model
+        force_full (bool): Retrain from scratch regardless of the model
+
+    Returns:
+        TrainingPlan: Mode, reason and the partitions to add
+    """
+    trained = (production or {}).get("training")
+    if force_full:
+        return TrainingPlan(FULL, "full retrain requested")
+    if not trained:
+        return TrainingPlan(FULL, "no production model trained on the partitioned layout")
+    if trained.get("base_etag") != base_etag:
+        return TrainingPlan(FULL, "base dataset replaced")
+
+    done = list(trained.get("partitions", []))
+    if list(partitions[:len(done)]) != done:
+        return TrainingPlan(FULL, "trained partitions no longer match the dataset")
+    new = list(partitions[len(done):])
+    if not new:
+        return TrainingPlan(FULL, "no new partitions since the production model")
+    if trained.get("rounds", 0) >= MAX_ROUNDS:
+        return TrainingPlan(FULL, f"{MAX_ROUNDS} incremental rounds since the last full retrain")
+    return TrainingPlan(INCREMENTAL, f"{len(new)} new partitions", new)
+
+
+def needs_full_retrain(new_rows: int, trained_rows: int,
+                       new_classes: Sequence[Any], model_classes: Sequence[Any]) -> Optional[str]:
+    """
+    Check parsed new data against the incremental limits.
+
+    Args:
+        new_rows (int): Clean rows in the new partitions
+        trained_rows (int): Rows the production model was trained on
+        new_classes (Sequence[Any]): Labels present in the new rows
+        model_classes (Sequence[Any]): Classes of the production model
+
+    Returns:
+        Optional[str]: Why a full retrain is needed, None if trees can be added
+    """
+    if new_rows == 0:
+        return "new partitions have no complete rows"
+    fraction = new_rows / (new_rows + trained_rows)
+    if fraction > MAX_NEW_FRACTION:
+        return f"new rows are {fraction:.0%} of the data, above {MAX_NEW_FRACTION:.0%}"
+    # Trees fitted on the new rows must predict over the same classes as the existing ones
+    if sorted(int(c) for c in new_classes) != sorted(int(c) for c in model_classes):
+        return "new rows do not cover exactly the classes of the model"
+    return None
+
+
+def trees_to_add(full_trees: int, new_rows: int, total_rows: int) -> int:
+    """Trees fitted on the new rows, so their share of votes follows their share of the data."""
+    return max(MIN_NEW_TREES, math.ceil(full_trees * new_rows / max(total_rows - new_rows, 1)))
+
+
+def count_classes(labels: Any, counts: Optional[Dict[str, int]] = None) -> Dict[str, int]:
+    """Rows per class of a label array, added to `counts`; keys are strings so the record stays JSON-ready."""
+    import numpy as np
+
+    merged = dict(counts or {})
+    values, occurrences = np.unique(np.asarray(labels), return_counts=True)
+    for value, n in zip(values, occurrences):
+        merged[str(int(value))] = merged.get(str(int(value)), 0) + int(n)
+    return merged
+
+
+def class_weights(counts: Optional[Dict[str, int]], classes: Sequence[Any]) -> Optional[Dict[int, float]]:
+    """
+    Balanced class weights over all the rows a model covers, for the trees of an incremental round.
+
+    'balanced' would weigh classes by their frequency in the new rows alone,
+    and is not meant for warm_start; these weights use the same formula,
+    rows / (classes * rows of the class), on the counts of the training record.
+
+    Args:
+        counts (Optional[Dict[str, int]]): Rows per class of the whole training data
+        classes (Sequence[Any]): Classes of the model
+
+    Returns:
+        Optional[Dict[int, float]]: Weight per class, None when the counts are not recorded
+    """
+    if not counts or any(counts.get(str(int(c)), 0) == 0 for c in classes):
+        return None
+    total = sum(counts[str(int(c))] for c in classes)
+    return {int(c): total / (len(classes) * counts[str(int(c))]) for c in classes}
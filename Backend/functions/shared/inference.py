@@ -0,0 +1,209 @@
+import csv
+import io
+import json
+import logging
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from shared.compiled_forest import predict_features
+from shared.executor import run_blocking
+from shared.feature_schema import describe_errors
+from shared.metrics import count, span
+from shared.model_cache import ModelEntry, get_model_entry, get_model_entry_async
+from shared.prediction_cache import PredictionCache, prediction_cache
+
+WINE_TYPES = ('red', 'white')
+
+# A parsed row is either a feature dict or the error message explaining why it could not be parsed
+Row = Union[Dict[str, Any], str]
+
+
+def parse_samples(body: bytes, content_type: str = "") -> List[Row]:
+    """
+    Parse a batch request body into rows.
+
+    Supports a JSON array (or an object with a "samples" array), NDJSON
+    (one JSON object per line) and ';' separated CSV with a header row.
+
+    Args:
+        body (bytes): Raw request body
+        content_type (str): Value of the Content-Type header
+
+    Returns:
+        List[Row]: One feature dict per row, or an error message for rows that could not be parsed
+    """
+    content_type = (content_type or "").split(";")[0].strip().lower()
+
+    if content_type in ("text/csv", "application/csv"):
+        reader = csv.DictReader(io.StringIO(body.decode("utf-8")), delimiter=";")
+        return [{k: _csv_value(v) for k, v in row.items()} for row in reader]
+
+    if content_type in ("application/x-ndjson", "application/jsonl", "application/ndjson"):
+        return _parse_ndjson(body)
+
+    text = body.decode("utf-8").strip()
+    try:
+        data = json.loads(text)
+    except ValueError:
+        # Fall back to NDJSON when the body is not a single JSON document
+        return _parse_ndjson(body)
+
+    if isinstance(data, dict) and isinstance(data.get("samples"), list):
+        data = data["samples"]
+    if isinstance(data, dict):
+        data = [data]
+    if not isinstance(data, list):
+        raise ValueError("Request body must be a JSON object or array")
+
+    return [row if isinstance(row, dict) else "Row must be a JSON object" for row in data]
+
+
+def _parse_ndjson(body: bytes) -> List[Row]:
+    rows: List[Row] = []
+    for line in body.decode("utf-8").splitlines():
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+            rows.append(row if isinstance(row, dict) else "Row must be a JSON object")
+        except ValueError as e:
+            rows.append(f"Invalid JSON: {str(e)}")
+    return rows
+
+
+def _csv_value(value: Optional[str]) -> Any:
+    # Numbers are converted here so CSV rows look like JSON rows; the schema validates them
+    if value is None or value == "":
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
+
+def predict_samples(rows: List[Row],
+                    default_type: Optional[str] = None,
+                    loader: Callable[[str], ModelEntry] = get_model_entry,
+                    cache: Optional[PredictionCache] = prediction_cache) -> List[Dict[str, Any]]:
+    """
+    Predict a batch of rows, grouping them by wine type.
+
+    Each group is decoded against the model's feature schema into one float
+    buffer; rows already predicted by the same model version are answered
+    from the cache and the others are predicted with a single vectorized
+    call. Rows that cannot be predicted get an "error" entry, and "fields"
+    details for schema errors, instead of failing the batch.
+
+    Args:
+        rows (List[Row]): Parsed rows, as returned by parse_samples
+        default_type (Optional[str]): Wine type used for rows without a "type" field
+        loader: Function returning the model entry of a wine type
+        cache (Optional[PredictionCache]): Prediction cache, None to disable it
+
+    Returns:
+        List[Dict[str, Any]]: One result per input row, in input order
+    """
+    results: List[Dict[str, Any]] = [{} for _ in rows]
+    groups: Dict[str, List[Tuple[int, Dict[str, Any]]]] = {}
+
+    # Assign each row to its wine type group
+    for i, row in enumerate(rows):
+        if isinstance(row, str):
+            results[i] = {"error": row}
+            continue
+        wine_type = row_wine_type(row, default_type)
+        if wine_type not in WINE_TYPES:
+            results[i] = {"error": "Please specify 'type' as 'red' or 'white'"}
+            continue
+        groups.setdefault(wine_type, []).append((i, row))
+
+    for wine_type, members in groups.items():
+        try:
+            entry = loader(wine_type)
+        except Exception as e:
+            logging.error(f'Error loading model: {str(e)}')
+            for i, _ in members:
+                results[i] = {"error": f"Model loading error: {str(e)}"}
+            continue
+
+        # Decode the group into one buffer in the feature order of the model, rejecting invalid rows
+        with span("infer_phase", phase="decode", wine_type=wine_type):
+            X, errors = entry.schema.decode([row for _, row in members])
+        for (i, _), row_errors in zip(members, errors):
+            if row_errors:
+                results[i] = {"type": wine_type, "error": describe_errors(row_errors), "fields": row_errors}
+
+        valid_positions = [p for p, row_errors in enumerate(errors) if not row_errors]
+
+        # Serve rows already predicted by this model version; adding 0.0 folds -0.0 into 0.0
+        keys: Dict[int, Tuple[str, str, bytes]] = {}
+        if cache is not None and cache.enabled:
+            X += 0.0
+            pending = []
+            for pos in valid_positions:
+                keys[pos] = (wine_type, entry.version, X[pos].tobytes())
+                cached = cache.get(keys[pos])
+                if cached is None:
+                    pending.append(pos)
+                else:
+                    results[members[pos][0]] = {"type": wine_type, "prediction": cached}
+            valid_positions = pending
+
+        if not valid_positions:
+            continue
+
+        try:
+            with span("infer_phase", phase="predict", wine_type=wine_type):
+                predictions = predict_features(entry.predictor, entry.scaler, X[valid_positions])
+            count("predicted_rows", len(valid_positions), wine_type=wine_type)
+        except Exception as e:
+            logging.error(f'Error during prediction: {str(e)}')
+            for pos in valid_positions:
+                results[members[pos][0]] = {"type": wine_type, "error": f"Prediction error: {str(e)}"}
+            continue
+
+        for pos, prediction in zip(valid_positions, predictions):
+            results[members[pos][0]] = {"type": wine_type, "prediction": int(prediction)}
+            if pos in keys:
+                cache.put(keys[pos], int(prediction))
+
+    return results
+
+
+def row_wine_type(row: Row, default_type: Optional[str] = None) -> Optional[str]:
+    """Return the lower-cased wine type a parsed row will be predicted with."""
+    if isinstance(row, str):
+        return None
+    wine_type = row.get("type")
+    if not isinstance(wine_type, str) or not wine_type:
+        wine_type = default_type or ""
+    return wine_type.lower()
+
+
+async def predict_samples_async(rows: List[Row], default_type: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Predict a batch of rows without blocking the event loop.
+
+    Models are fetched from the registry on the event loop, then grouping,
+    decoding and prediction run on the bounded inference executor.
+
+    Args:
+        rows (List[Row]): Parsed rows, as returned by parse_samples
+        default_type (Optional[str]): Wine type used for rows without a "type" field
+
+    Returns:
+        List[Dict[str, Any]]: One result per input row, in input order
+    """
+    models: Dict[str, Any] = {}
+    for wine_type in {row_wine_type(row, default_type) for row in rows} & set(WINE_TYPES):
+        try:
+            models[wine_type] = await get_model_entry_async(wine_type)
+        except Exception as e:
+            models[wine_type] = e
+
+    def loader(wine_type: str) -> ModelEntry:
+        model = models[wine_type]
+        if isinstance(model, Exception):
+            raise model
+        return model
+
+    return await run_blocking(predict_samples, rows, default_type, loader)
@@ -0,0 +1,220 @@
+import asyncio
+import csv
+import logging
+import math
+import os
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from azure.storage.blob import BlobBlock, ContentSettings
+
+from shared.dataset_stats import DatasetStats
+
+# Bytes read from the request and staged per block
+UPLOAD_BLOCK_SIZE = int(os.getenv("UPLOAD_BLOCK_SIZE", str(4 * 1024 * 1024)))
+# Blocks staged at the same time per upload
+UPLOAD_CONCURRENCY = int(os.getenv("UPLOAD_CONCURRENCY", "4"))
+
+# Columns every wine dataset must have, in any order
+REQUIRED_COLUMNS = (
+    "fixed acidity", "volatile acidity", "citric acid", "residual sugar", "chlorides",
+    "free sulfur dioxide", "total sulfur dioxide", "density", "pH", "sulphates", "alcohol", "quality"
+)
+
+
+class InvalidUpload(ValueError):
+    """Raised when an uploaded CSV does not match the dataset format."""
+
+
+class CsvStreamValidator:
+    """
+    Validate a ';' separated wine CSV incrementally, as its bytes arrive.
+
+    The header must contain every required column and each row must have one
+    numeric (or empty) value per header column. Rows are expected on a single
+    line, as in the lab exports; a partial line is kept until the next chunk.
+    Valid rows are added to `stats` as they are parsed. Parsing and the
+    statistics updates are CPU-bound: stream_upload calls feed and finish in
+    a worker thread, never two at a time.
+    """
+
+    def __init__(self, required: Set[str] = frozenset(REQUIRED_COLUMNS), delimiter: str = ";"):
+        self.required = set(required)
+        self.delimiter = delimiter
+        self.columns: Optional[List[str]] = None
+        self.rows = 0
+        self.stats = DatasetStats()
+        self._line = 0
+        self._tail = b""
+
+    def feed(self, chunk: bytes) -> None:
+        """
+        Validate the complete lines of a chunk.
+
+        Raises:
+            InvalidUpload: On the first invalid header or row
+        """
+        lines = (self._tail + chunk).split(b"\n")
+        self._tail = lines.pop()
+        for line in lines:
+            self._check_line(line)
+
+    def finish(self) -> None:
+        """
+        Validate the last line and check the file had data.
+
+        Raises:
+            InvalidUpload: If the last row is invalid or the file has no rows
+        """
+        if self._tail:
+            self._check_line(self._tail)
+            self._tail = b""
+        if self.columns is None:
+            raise InvalidUpload("Empty file")
+        if self.rows == 0:
+            raise InvalidUpload("File has a header but no rows")
+
+    def _check_line(self, raw: bytes) -> None:
+        self._line += 1
+        try:
+            text = raw.rstrip(b"\r").decode("utf-8-sig" if self._line == 1 else "utf-8")
+        except UnicodeDecodeError:
+            raise InvalidUpload(f"Line {self._line} is not valid UTF-8")
+        if not text.strip():
+            return
+        fields = next(csv.reader([text], delimiter=self.delimiter))
+
+        if self.columns is None:
+            self.columns = [f.strip() for f in fields]
+            missing = self.required - set(self.columns)
+            if missing:
+                raise InvalidUpload(f"Missing columns: {', '.join(sorted(missing))}")
+            return
+
+        if len(fields) != len(self.columns):
+            raise InvalidUpload(f"Line {self._line} has {len(fields)} fields, expected {len(self.columns)}")
+        values: List[Optional[float]] = []
+        for name, value in zip(self.columns, fields):
+            value = value.strip()
+            if not value:
+                # Missing values are dropped by preprocessing
+                values.append(None)
+                continue
+            try:
+                number = float(value)
+            except ValueError:
+                raise InvalidUpload(f"Line {self._line}: '{name}' is not a number: {value!r}")
+            # 'nan' parses as a float but pandas reads it as missing
+            values.append(None if math.isnan(number) else number)
+        self.stats.add_row(self.columns, values)
+        self.rows += 1
+
+
+def block_id(upload_id: str, index: int) -> str:
+    """
+    ID of a staged block, unique to its upload.
+
+    Uncommitted blocks are shared by every writer of a blob: the upload ID
+    keeps concurrent uploads to the same name from replacing each other's
+    blocks. All IDs have the same length, as the service requires per blob.
+
+    Args:
+        upload_id (str): Hex UUID of the upload
+        index (int): Position of the block in the upload
+
+    Returns:
+        str: Block ID
+    """
+    return f"{upload_id}-{index:08d}"
+
+
+def new_upload_id() -> str:
+    return uuid.uuid4().hex
+
+
+async def stream_upload(blob_client: Any,
+                        read: Callable[[int], bytes],
+                        validator: Optional[CsvStreamValidator] = None,
+                        block_size: int = UPLOAD_BLOCK_SIZE,
+                        concurrency: int = UPLOAD_CONCURRENCY,
+                        content_settings: Optional[ContentSettings] = None) -> Dict[str, Any]:
+    """
+    Upload a stream as a block blob, validating it on the way.
+
+    The stream is read one block at a time off the event loop. Each block is
+    validated in a worker thread while the next one is read, and is staged
+    once it passed validation; up to `concurrency` blocks are staged in
+    parallel. The block list is committed only once the whole file passed
+    validation, so a rejected file never replaces the existing blob; its
+    staged blocks are discarded by the service.
+
+    Args:
+        blob_client: Async blob client of the destination blob
+        read (Callable[[int], bytes]): Blocking read function of the source stream
+        validator (Optional[CsvStreamValidator]): Validator fed with every block
+        block_size (int): Bytes per block
+        concurrency (int): Maximum blocks staged at the same time
+        content_settings (Optional[ContentSettings]): Content settings of the committed blob
+
+    Returns:
+        Dict[str, Any]: Commit result with the etag, plus the bytes and blocks uploaded
+
+    Raises:
+        InvalidUpload: If the validator rejects the content
+    """
+    slots = asyncio.Semaphore(concurrency)
+    upload_id = new_upload_id()
+    block_ids: List[BlobBlock] = []
+    tasks: List[asyncio.Task] = []
+    checks: List[asyncio.Task] = []
+    size = 0
+
+    async def check(data: bytes, previous: Optional[asyncio.Task]) -> None:
+        # The validator is stateful: blocks are fed in order, one at a time
+        if previous is not None:
+            await previous
+        await asyncio.to_thread(validator.feed, data)
+
+    async def stage(block_id: str, data: bytes, checked: Optional[asyncio.Task]) -> None:
+        try:
+            if checked is not None:
+                await checked
+            await blob_client.stage_block(block_id, data)
+        finally:
+            slots.release()
+
+    try:
+        while True:
+            # Stop reading at the first invalid block
+            if checks and checks[-1].done():
+                checks[-1].result()
+            # Wait for a free slot before reading, so at most `concurrency` blocks are in memory
+            await slots.acquire()
+            data = await asyncio.to_thread(read, block_size)
+            if not data:
+                slots.release()
+                break
+            checked = None
+            if validator is not None:
+                checked = asyncio.create_task(check(data, checks[-1] if checks else None))
+                checks.append(checked)
+            staged_id = block_id(upload_id, len(block_ids))
+            block_ids.append(BlobBlock(block_id=staged_id))
+            tasks.append(asyncio.create_task(stage(staged_id, data, checked)))
+            size += len(data)
+
+        if checks:
+            await checks[-1]
+        if validator is not None:
+            await asyncio.to_thread(validator.finish)
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks + checks:
+            task.cancel()
+        await asyncio.gather(*tasks, *checks, return_exceptions=True)
+        raise
+
+    result = await blob_client.commit_block_list(block_ids, content_settings=content_settings)
+    logging.info(f"Uploaded {size} bytes in {len(block_ids)} blocks"
+                 + (f", {validator.rows} rows validated" if validator is not None else ""))
+    return {**dict(result or {}), "size": size, "blocks": len(block_ids)}
@@ -0,0 +1,244 @@
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Record spans and counters; when off, every call returns at once and nothing is allocated
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "0").lower() in ("1", "true", "yes")
+# Seconds between metric snapshots written to the log as one JSON line, 0 to only serve metrics_function
+METRICS_LOG_INTERVAL = float(os.getenv("METRICS_LOG_INTERVAL", "0"))
+# Upper bounds of the latency histogram buckets, in milliseconds
+LATENCY_BUCKETS_MS = (0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000, 300000)
+
+# Every exported name starts with this prefix
+PREFIX = "winalyze"
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict[str, Any]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _label_text(labels: Labels) -> str:
+    if not labels:
+        return ""
+    escaped = ((k, v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")) for k, v in labels)
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram, as Prometheus exposes it."""
+
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(LATENCY_BUCKETS_MS, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-quantile, None when empty or beyond the last bucket."""
+        if not self.count:
+            return None
+        rank, seen = q * self.count, 0
+        for bound, count in zip(LATENCY_BUCKETS_MS, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return None
+
+
+class Span:
+    """Time a block and record it in the latency histogram of its name, with an 'outcome' label."""
+
+    __slots__ = ("registry", "name", "labels", "start")
+
+    def __init__(self, registry: "MetricsRegistry", name: str, labels: Dict[str, Any]):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+        self.start = 0.0
+
+    def __enter__(self) -> "Span":
+        self.start = time.perf_counter()
+        return self
+
+    def label(self, **labels: Any) -> None:
+        """Add labels known only inside the block, e.g. a response status."""
+        self.labels.update(labels)
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        elapsed_ms = (time.perf_counter() - self.start) * 1000
+        self.registry.observe(self.name, elapsed_ms, outcome="error" if exc_type else "ok", **self.labels)
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def label(self, **labels: Any) -> None:
+        return None
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        return None
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class MetricsRegistry:
+    """
+    Per-process latency histograms and counters, exported as Prometheus text or JSON.
+
+    Collectors registered by caches and clients report their own counters
+    at export time, so hit rates cost nothing on the hot path. Safe to
+    share between the threads of the inference executor.
+    """
+
+    def __init__(self, enabled: bool = METRICS_ENABLED, log_interval: float = METRICS_LOG_INTERVAL):
+        self.enabled = enabled
+        self.log_interval = log_interval
+        self._histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._collectors: Dict[str, Callable[[], Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+        self._logged_at = time.monotonic()
+
+    def span(self, name: str, **labels: Any):
+        if not self.enabled:
+            return _NOOP_SPAN
+        return Span(self, name, labels)
+
+    def observe(self, name: str, value_ms: float, **labels: Any) -> None:
+        if not self.enabled:
+            return
+        key = (name, _labels(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value_ms)
+        self._maybe_log()
+
+    def inc(self, name: str, amount: float = 1, **labels: Any) -> None:
+        if not self.enabled:
+            return
+        key = (name, _labels(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def register_collector(self, name: str, collect: Callable[[], Dict[str, Any]]) -> None:
+        """Report the numeric values returned by `collect` as gauges named <name>_<key>."""
+        self._collectors[name] = collect
+
+    def _collected(self) -> Dict[str, Dict[str, float]]:
+        collected = {}
+        for name, collect in list(self._collectors.items()):
+            try:
+                collected[name] = {k: float(v) for k, v in collect().items() if isinstance(v, (int, float))}
+            except Exception as e:
+                logging.warning(f"Metrics collector {name} failed: {str(e)}")
+        return collected
+
+    def snapshot(self) -> Dict[str, Any]:
+        """JSON-ready view of every metric, with approximate p50/p95/p99 per histogram."""
+        with self._lock:
+            histograms = [(name, dict(labels), h.count, h.total, h.quantile(0.5), h.quantile(0.95), h.quantile(0.99))
+                          for (name, labels), h in self._histograms.items()]
+            counters = [(name, dict(labels), value) for (name, labels), value in self._counters.items()]
+        return {
+            "pid": os.getpid(),
+            "latency_ms": [{"name": name, "labels": labels, "count": count, "sum": total,
+                            "p50": p50, "p95": p95, "p99": p99}
+                           for name, labels, count, total, p50, p95, p99 in histograms],
+            "counters": [{"name": name, "labels": labels, "value": value} for name, labels, value in counters],
+            "collectors": self._collected()
+        }
+
+    def render_prometheus(self) -> str:
+        """Metrics in the Prometheus text exposition format."""
+        lines: List[str] = []
+
+        with self._lock:
+            histograms = sorted((key, list(h.counts), h.total, h.count) for key, h in self._histograms.items())
+            counters = sorted(self._counters.items())
+
+        typed = set()
+        for (name, labels), counts, total, count in histograms:
+            metric = f"{PREFIX}_{name}_ms"
+            if metric not in typed:
+                lines.append(f"# TYPE {metric} histogram")
+                typed.add(metric)
+            cumulative = 0
+            for bound, bucket in zip(LATENCY_BUCKETS_MS + (float("inf"),), counts):
+                cumulative += bucket
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                lines.append(f"{metric}_bucket{_label_text(labels + (('le', le),))} {cumulative}")
+            lines.append(f"{metric}_sum{_label_text(labels)} {total:.3f}")
+            lines.append(f"{metric}_count{_label_text(labels)} {count}")
+
+        for (name, labels), value in counters:
+            metric = f"{PREFIX}_{name}_total"
+            if metric not in typed:
+                lines.append(f"# TYPE {metric} counter")
+                typed.add(metric)
+            lines.append(f"{metric}{_label_text(labels)} {value:g}")
+
+        for source, values in sorted(self._collected().items()):
+            for key, value in sorted(values.items()):
+                metric = f"{PREFIX}_{source}_{key}"
+                lines.append(f"# TYPE {metric} gauge")
+                lines.append(f"{metric} {value:g}")
+
+        return "\n".join(lines) + "\n"
+
+    def _maybe_log(self) -> None:
+        if self.log_interval <= 0 or time.monotonic() - self._logged_at < self.log_interval:
+            return
+        self._logged_at = time.monotonic()
+        logging.info(f"metrics {json.dumps(self.snapshot())}")
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+
+registry = MetricsRegistry()
+
+
+def span(name: str, **labels: Any):
+    """
+    Time a block: `with span("model_load", phase="download"): ...`.
+
+    Returns a shared no-op context manager when metrics are disabled.
+
+    Args:
+        name (str): Histogram name, exported as winalyze_<name>_ms
+        **labels: Low-cardinality labels, e.g. the wine type or stage
+
+    Returns:
+        Context manager
+    """
+    return registry.span(name, **labels)
+
+
+def count(name: str, amount: float = 1, **labels: Any) -> None:
+    """Add to a counter, exported as winalyze_<name>_total; e.g. bytes downloaded."""
+    registry.inc(name, amount, **labels)
+
+
+def register_collector(name: str, collect: Callable[[], Dict[str, Any]]) -> None:
+    """Export the counters of a cache or client, read only when metrics are exported."""
+    registry.register_collector(name, collect)
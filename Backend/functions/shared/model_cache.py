@@ -0,0 +1,286 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+from azure.core.exceptions import ResourceNotFoundError
+
+from shared.artifacts import load_for_inference
+from shared.compiled_forest import CompiledForest
+from shared.feature_schema import FeatureSchema
+from shared.disk_cache import artifact_cache, cached_blob_path, cached_blob_path_async
+from shared.executor import run_blocking
+from shared.metrics import count, span
+from shared.model_store import MODELS_CONTAINER, Pointer, read_pointer, read_pointer_sync
+from shared.prediction_cache import prediction_cache
+from shared.storage import get_blob_service, get_sync_blob_service
+
+# Seconds a loaded model is served before the production pointer is checked again
+DEFAULT_TTL = float(os.getenv("MODEL_CACHE_TTL", "30"))
+
+
+@dataclass(frozen=True)
+class ModelEntry:
+    """
+    Immutable snapshot of a loaded model.
+
+    Artifacts with a compiled forest are served from it alone: model and
+    scaler are then None and the sklearn objects are never unpickled.
+    """
+    model: Any
+    scaler: Any
+    manifest: Dict[str, Any]
+    version: str
+    loaded_at: float
+    compiled: Optional[CompiledForest] = None
+    schema: Optional[FeatureSchema] = None
+
+    @property
+    def predictor(self) -> Any:
+        """Compiled forest when the artifact has one, the sklearn model otherwise."""
+        return self.compiled if self.compiled is not None else self.model
+
+
+class ModelRegistry:
+    """
+    Process-wide cache of the production model and scaler for each wine type.
+
+    Entries are revalidated at most once per TTL by reading the small
+    production pointer; the immutable artifact it names is downloaded and
+    loaded again only when the pointer moved to another version. A new
+    entry is fully built before it replaces the old one, so requests
+    already holding the previous pair keep predicting with it.
+
+    get() serves blocking callers; get_async() serves the event loop and
+    never blocks it: loads are single-flight, so concurrent requests during a
+    cold load await the same task instead of each starting a download.
+    """
+
+    def __init__(self, container: str = MODELS_CONTAINER, ttl: float = DEFAULT_TTL,
+                 container_client=None, async_container_client=None):
+        self.container = container
+        self.ttl = ttl
+        self._container_client = container_client
+        self._async_container_client = async_container_client
+        self._entries: Dict[str, ModelEntry] = {}
+        self._checked_at: Dict[str, float] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._guard = threading.Lock()
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    def _get_container_client(self):
+        if self._container_client is None:
+            self._container_client = get_sync_blob_service().get_container_client(self.container)
+        return self._container_client
+
+    def _get_async_container_client(self):
+        if self._async_container_client is not None:
+            return self._async_container_client
+        return get_blob_service().get_container_client(self.container)
+
+    def _is_fresh(self, wine_type: str, entry: Optional[ModelEntry]) -> bool:
+        # Never checked, or invalidated, is stale whatever the uptime of the host
+        return entry is not None and time.monotonic() - self._checked_at.get(wine_type, float("-inf")) < self.ttl
+
+    def _store(self, wine_type: str, entry: ModelEntry) -> ModelEntry:
+        previous = self._entries.get(wine_type)
+        # A single dict assignment: readers see either the old or the new entry
+        self._entries[wine_type] = entry
+        self._checked_at[wine_type] = time.monotonic()
+        if previous is not None and previous.version != entry.version:
+            # Predictions of the replaced model can no longer be served
+            prediction_cache.invalidate(wine_type, keep_version=entry.version)
+        return entry
+
+    def _lock_for(self, wine_type: str) -> threading.Lock:
+        with self._guard:
+            return self._locks.setdefault(wine_type, threading.Lock())
+
+    @staticmethod
+    def _require(wine_type: str, pointer: Optional[Pointer]) -> Pointer:
+        if pointer is None:
+            raise ResourceNotFoundError(f"No production model for {wine_type} wine")
+        return pointer
+
+    def _current_version(self, wine_type: str) -> str:
+        return self._require(wine_type, read_pointer_sync(self._get_container_client(), wine_type)).digest
+
+    def _load(self, wine_type: str) -> ModelEntry:
+        pointer = self._require(wine_type, read_pointer_sync(self._get_container_client(), wine_type))
+        blob_client = self._get_container_client().get_blob_client(pointer.blob_name)
+
+        # Read through the host-wide disk cache: only one worker downloads a given version
+        with span("model_load", phase="download", wine_type=wine_type):
+            path = cached_blob_path(blob_client)
+        with span("model_load", phase="deserialize", wine_type=wine_type):
+            model, scaler, manifest, compiled = load_for_inference(path)
+        count("model_artifact_bytes", os.path.getsize(path), wine_type=wine_type)
+        schema = FeatureSchema.from_manifest(manifest, scaler)
+        logging.info(f"Model cache loaded {wine_type} model {pointer.digest}, disk cache {artifact_cache.stats()}")
+        return ModelEntry(model, scaler, manifest, pointer.digest, time.monotonic(), compiled, schema)
+
+    def get(self, wine_type: str) -> ModelEntry:
+        """
+        Return the cached entry for a wine type, loading or refreshing it if needed.
+
+        Args:
+            wine_type (str): Type of wine ('red' or 'white')
+
+        Returns:
+            ModelEntry: Current (model, scaler) snapshot
+        """
+        entry = self._entries.get(wine_type)
+        if self._is_fresh(wine_type, entry):
+            count("model_cache_lookups", result="fresh")
+            return entry
+
+        lock = self._lock_for(wine_type)
+        if entry is not None and not lock.acquire(blocking=False):
+            # Another request is already revalidating; keep serving the current model
+            return entry
+        if entry is None:
+            lock.acquire()
+
+        try:
+            # Re-read under the lock: a concurrent caller may have just refreshed it
+            entry = self._entries.get(wine_type)
+            if self._is_fresh(wine_type, entry):
+                return entry
+
+            if entry is not None:
+                try:
+                    if self._current_version(wine_type) == entry.version:
+                        count("model_cache_lookups", result="revalidated")
+                        self._checked_at[wine_type] = time.monotonic()
+                        return entry
+                except Exception as e:
+                    logging.warning(f"Model cache revalidation failed for {wine_type}, serving cached model: {str(e)}")
+                    self._checked_at[wine_type] = time.monotonic()
+                    return entry
+
+            count("model_cache_lookups", result="loaded")
+            return self._store(wine_type, self._load(wine_type))
+        finally:
+            lock.release()
+
+    async def _refresh_async(self, wine_type: str, entry: Optional[ModelEntry]) -> ModelEntry:
+        try:
+            container_client = self._get_async_container_client()
+            pointer = self._require(wine_type, await read_pointer(container_client, wine_type))
+            if entry is not None and pointer.digest == entry.version:
+                count("model_cache_lookups", result="revalidated")
+                self._checked_at[wine_type] = time.monotonic()
+                return entry
+
+            count("model_cache_lookups", result="loaded")
+            with span("model_load", phase="download", wine_type=wine_type):
+                path = await cached_blob_path_async(container_client.get_blob_client(pointer.blob_name))
+            # Unzipping and unpickling are CPU-bound: keep them off the event loop
+            with span("model_load", phase="deserialize", wine_type=wine_type):
+                model, scaler, manifest, compiled = await run_blocking(load_for_inference, path)
+            count("model_artifact_bytes", os.path.getsize(path), wine_type=wine_type)
+            logging.info(f"Model cache loaded {wine_type} model {pointer.digest}, disk cache {artifact_cache.stats()}")
+            schema = FeatureSchema.from_manifest(manifest, scaler)
+            entry = ModelEntry(model, scaler, manifest, pointer.digest, time.monotonic(), compiled, schema)
+            return self._store(wine_type, entry)
+        except Exception as e:
+            if entry is None:
+                raise
+            logging.warning(f"Model cache revalidation failed for {wine_type}, serving cached model: {str(e)}")
+            self._checked_at[wine_type] = time.monotonic()
+            return entry
+
+    async def get_async(self, wine_type: str) -> ModelEntry:
+        """
+        Return the cached entry for a wine type without blocking the event loop.
+
+        Args:
+            wine_type (str): Type of wine ('red' or 'white')
+
+        Returns:
+            ModelEntry: Current (model, scaler) snapshot
+        """
+        entry = self._entries.get(wine_type)
+        if self._is_fresh(wine_type, entry):
+            count("model_cache_lookups", result="fresh")
+            return entry
+
+        task = self._inflight.get(wine_type)
+        if task is None:
+            task = asyncio.ensure_future(self._refresh_async(wine_type, entry))
+            self._inflight[wine_type] = task
+            task.add_done_callback(lambda _: self._inflight.pop(wine_type, None))
+
+        if entry is not None:
+            # Stale while revalidating: keep serving the current model
+            return entry
+        # Shield the shared load from the cancellation of any single waiter
+        return await asyncio.shield(task)
+
+    def invalidate(self, wine_type: Optional[str] = None) -> None:
+        """Force the next lookup to revalidate one wine type, or all of them."""
+        for key in [wine_type] if wine_type else list(self._checked_at):
+            self._checked_at.pop(key, None)
+
+
+registry = ModelRegistry()
+
+
+def get_model(wine_type: str) -> Tuple[Any, Any]:
+    """
+    Return the cached production model and scaler for a wine type.
+
+    The model is the compiled forest when the artifact has one; predict
+    with shared.compiled_forest.predict_features to handle both cases.
+
+    Args:
+        wine_type (str): Type of wine ('red' or 'white')
+
+    Returns:
+        Tuple[Any, StandardScaler]: (model, scaler)
+    """
+    entry = registry.get(wine_type)
+    return entry.predictor, entry.scaler
+
+
+async def get_model_async(wine_type: str) -> Tuple[Any, Any]:
+    """
+    Async variant of get_model for the event loop.
+
+    Args:
+        wine_type (str): Type of wine ('red' or 'white')
+
+    Returns:
+        Tuple[Any, StandardScaler]: (model, scaler)
+    """
+    entry = await registry.get_async(wine_type)
+    return entry.predictor, entry.scaler
+
+
+def get_model_entry(wine_type: str) -> ModelEntry:
+    """
+    Return the cached entry of a wine type, with its predictor, schema and version.
+
+    Args:
+        wine_type (str): Type of wine ('red' or 'white')
+
+    Returns:
+        ModelEntry: Current snapshot
+    """
+    return registry.get(wine_type)
+
+
+async def get_model_entry_async(wine_type: str) -> ModelEntry:
+    """
+    Async variant of get_model_entry for the event loop.
+
+    Args:
+        wine_type (str): Type of wine ('red' or 'white')
+
+    Returns:
+        ModelEntry: Current snapshot
+    """
+    return await registry.get_async(wine_type)
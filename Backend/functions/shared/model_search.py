@@ -0,0 +1,229 @@
+import itertools
+import json
+import logging
+import os
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# 'off' keeps the single RandomForest of fit_model, 'grid' tries every configuration, 'random' samples them
+SEARCH_MODE = os.getenv("MODEL_SEARCH", "off").lower()
+# Configurations drawn in random mode
+SEARCH_SAMPLES = int(os.getenv("MODEL_SEARCH_SAMPLES", "8"))
+# Cross-validation folds; candidates are pruned after each one
+SEARCH_FOLDS = int(os.getenv("MODEL_SEARCH_FOLDS", "3"))
+# Parallel fits, -1 for one per core
+SEARCH_JOBS = int(os.getenv("MODEL_SEARCH_JOBS", "-1"))
+# Candidates whose mean CV F1 trails the best by more than this are dropped
+PRUNE_MARGIN = float(os.getenv("MODEL_SEARCH_PRUNE_MARGIN", "0.05"))
+# Objective = CV F1 - LATENCY_WEIGHT * ms per row - SIZE_WEIGHT * artifact MB
+LATENCY_WEIGHT = float(os.getenv("MODEL_SEARCH_LATENCY_WEIGHT", "0.01"))
+SIZE_WEIGHT = float(os.getenv("MODEL_SEARCH_SIZE_WEIGHT", "0.005"))
+# Single rows timed per finalist
+LATENCY_ROWS = 200
+
+RANDOM_FOREST = "random_forest"
+EXTRA_TREES = "extra_trees"
+HIST_GRADIENT_BOOSTING = "hist_gradient_boosting"
+
+# Parameter lists per model family; MODEL_SEARCH_SPACE (JSON) replaces it
+DEFAULT_SPACE: Dict[str, Dict[str, List[Any]]] = {
+    RANDOM_FOREST: {
+        "n_estimators": [50, 100, 200],
+        "max_depth": [None, 12, 20],
+        "min_samples_leaf": [1, 2],
+        "class_weight": ["balanced"]
+    },
+    EXTRA_TREES: {
+        "n_estimators": [100, 200],
+        "max_depth": [None, 20],
+        "min_samples_leaf": [1, 2],
+        "class_weight": ["balanced"]
+    },
+    HIST_GRADIENT_BOOSTING: {
+        "max_iter": [100, 200],
+        "learning_rate": [0.05, 0.1],
+        "max_leaf_nodes": [31, 63],
+        "class_weight": ["balanced"]
+    }
+}
+
+
+@dataclass(frozen=True)
+class Candidate:
+    """One model family with one set of hyperparameters."""
+    family: str
+    params: Tuple[Tuple[str, Any], ...]
+
+    def build(self) -> Any:
+        from sklearn.ensemble import ExtraTreesClassifier, HistGradientBoostingClassifier, RandomForestClassifier
+
+        families = {
+            RANDOM_FOREST: RandomForestClassifier,
+            EXTRA_TREES: ExtraTreesClassifier,
+            HIST_GRADIENT_BOOSTING: HistGradientBoostingClassifier
+        }
+        # Parallelism comes from the search, one core per fit
+        extra = {"n_jobs": 1} if self.family != HIST_GRADIENT_BOOSTING else {}
+        return families[self.family](random_state=42, **extra, **dict(self.params))
+
+    def describe(self) -> Dict[str, Any]:
+        return {"family": self.family, "params": dict(self.params)}
+
+
+@dataclass
+class CandidateResult:
+    """Scores gathered for a candidate during the search."""
+    candidate: Candidate
+    fold_f1: List[float] = field(default_factory=list)
+    pruned: bool = False
+    latency_ms: Optional[float] = None
+    size_bytes: Optional[int] = None
+    objective: Optional[float] = None
+
+    @property
+    def cv_f1(self) -> float:
+        return float(np.mean(self.fold_f1)) if self.fold_f1 else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            **self.candidate.describe(),
+            "cv_f1": self.cv_f1,
+            "folds": len(self.fold_f1),
+            "pruned": self.pruned,
+            "latency_ms": self.latency_ms,
+            "size_bytes": self.size_bytes,
+            "objective": self.objective
+        }
+
+
+def search_space() -> Dict[str, Dict[str, List[Any]]]:
+    configured = os.getenv("MODEL_SEARCH_SPACE")
+    return json.loads(configured) if configured else DEFAULT_SPACE
+
+
+def candidates(space: Dict[str, Dict[str, List[Any]]], mode: str = "grid",
+               samples: int = SEARCH_SAMPLES, seed: int = 42) -> List[Candidate]:
+    """
+    Expand a search space into candidates.
+
+    Args:
+        space: Parameter lists per model family
+        mode (str): 'grid' for every combination, 'random' for `samples` of them
+        samples (int): Candidates drawn in random mode
+        seed (int): Seed of the random draw
+
+    Returns:
+        List[Candidate]: Candidates to evaluate
+    """
+    grid = []
+    for family, params in space.items():
+        names = sorted(params)
+        for values in itertools.product(*(params[n] for n in names)):
+            grid.append(Candidate(family, tuple(zip(names, values))))
+    if mode == "random" and samples < len(grid):
+        return random.Random(seed).sample(grid, samples)
+    return grid
+
+
+def _fold_f1(candidate: Candidate, X: pd.DataFrame, y: pd.Series, train: np.ndarray, test: np.ndarray) -> float:
+    from sklearn.metrics import f1_score
+
+    model = candidate.build().fit(X.iloc[train], y.iloc[train])
+    return f1_score(y.iloc[test], model.predict(X.iloc[test]), average='weighted')
+
+
+def _fit(candidate: Candidate, X: pd.DataFrame, y: pd.Series) -> Any:
+    return candidate.build().fit(X, y)
+
+
+def _measure(result: CandidateResult, model: Any, X: pd.DataFrame) -> None:
+    from shared.artifacts import pack_artifact
+    from shared.compiled_forest import compile_forest
+
+    rows = X.iloc[:LATENCY_ROWS]
+
+    # Time single-row predictions the way they are served: compiled forests, or the sklearn model
+    if hasattr(model, "estimators_"):
+        forest = compile_forest(model, None)
+        values = rows.to_numpy(dtype=np.float64)
+        predict_row = lambda i: forest.predict(values[i:i + 1])
+    else:
+        predict_row = lambda i: model.predict(rows.iloc[i:i + 1])
+    timings = []
+    for i in range(len(rows)):
+        start = time.perf_counter()
+        predict_row(i)
+        timings.append(time.perf_counter() - start)
+
+    result.latency_ms = float(np.median(timings) * 1000)
+    result.size_bytes = len(pack_artifact(model, None, {}))
+    result.objective = (result.cv_f1 - LATENCY_WEIGHT * result.latency_ms
+                        - SIZE_WEIGHT * result.size_bytes / (1024 * 1024))
+
+
+def _folds(y: pd.Series, n_splits: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+    from sklearn.model_selection import KFold, StratifiedKFold
+
+    # Stratify unless a class is too rare to appear in every fold
+    splitter = StratifiedKFold if y.value_counts().min() >= n_splits else KFold
+    return list(splitter(n_splits=n_splits, shuffle=True, random_state=42).split(np.zeros(len(y)), y))
+
+
+def search_model(X: pd.DataFrame, y: pd.Series,
+                 mode: str = SEARCH_MODE,
+                 n_folds: int = SEARCH_FOLDS,
+                 n_jobs: int = SEARCH_JOBS,
+                 space: Optional[Dict[str, Dict[str, List[Any]]]] = None) -> Tuple[Any, List[Dict[str, Any]]]:
+    """
+    Pick a model family and hyperparameters by parallel cross-validation.
+
+    Folds are raced: every surviving candidate is scored on one fold at a
+    time, all of them in parallel, and candidates trailing the best mean
+    F1 by more than PRUNE_MARGIN are dropped before the next fold. The
+    candidates left after the last fold are refitted on all rows, timed on
+    single-row predictions and packed, and the winner maximizes the F1
+    penalized by latency and artifact size.
+
+    Args:
+        X (pd.DataFrame): Scaled training features
+        y (pd.Series): Labels
+        mode (str): 'grid' or 'random'
+        n_folds (int): Cross-validation folds
+        n_jobs (int): Parallel fits, -1 for one per core
+        space: Parameter lists per family, defaults to search_space()
+
+    Returns:
+        Tuple[Any, List[Dict[str, Any]]]: (winner fitted on X, summary of every candidate, best first)
+    """
+    from joblib import Parallel, delayed
+
+    # Threads: tree fitting releases the GIL, and training already runs in a worker process
+    parallel = Parallel(n_jobs=n_jobs, prefer="threads")
+    results = [CandidateResult(c) for c in candidates(space or search_space(), mode)]
+    alive = list(results)
+
+    for fold, (train, test) in enumerate(_folds(y, n_folds)):
+        scores = parallel(delayed(_fold_f1)(r.candidate, X, y, train, test) for r in alive)
+        for result, score in zip(alive, scores):
+            result.fold_f1.append(score)
+        best = max(r.cv_f1 for r in alive)
+        for result in alive:
+            result.pruned = result.cv_f1 < best - PRUNE_MARGIN
+        alive = [r for r in alive if not r.pruned]
+        logging.info(f"Model search fold {fold + 1}/{n_folds}: best F1 {best:.4f}, {len(alive)} candidates left")
+
+    models = parallel(delayed(_fit)(r.candidate, X, y) for r in alive)
+    # Timed one at a time, so that concurrent fits do not skew latencies
+    for result, model in zip(alive, models):
+        _measure(result, model, X)
+    winner, model = max(zip(alive, models), key=lambda pair: pair[0].objective)
+    logging.info(f"Model search picked {winner.candidate.describe()} (F1 {winner.cv_f1:.4f}, "
+                 f"{winner.latency_ms:.3f} ms/row, {winner.size_bytes} bytes)")
+
+    summary = sorted(results, key=lambda r: (r.objective is not None, r.objective or r.cv_f1), reverse=True)
+    return model, [r.to_dict() for r in summary]
@@ -0,0 +1,246 @@
+import json
+import logging
+import os
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from azure.core import MatchConditions
+from azure.core.exceptions import ResourceExistsError, ResourceModifiedError, ResourceNotFoundError
+
+from shared.artifacts import ARTIFACT_EXTENSION, content_digest
+
+MODELS_CONTAINER = "models"
+# Immutable artifacts, one blob per content digest
+VERSIONS_PREFIX = "versions"
+# Unreferenced versions kept by prune_versions, most recent first, for manual promotion and inspection
+VERSIONS_TO_KEEP = int(os.getenv("MODEL_VERSIONS_KEEP", "5"))
+
+# Pointer stages: the model served in production and the last trained one awaiting validation
+CURRENT = "current"
+CANDIDATE = "candidate"
+
+
+class PromotionConflict(Exception):
+    """Raised when a pointer moved between the read that decided a promotion and its write."""
+
+
+def artifact_digest(artifact_bytes: bytes) -> str:
+    """Digest identifying the model of an artifact, see shared.artifacts.content_digest."""
+    return content_digest(artifact_bytes)
+
+
+def version_blob_name(wine_type: str, digest: str) -> str:
+    return f"{VERSIONS_PREFIX}/{wine_type}/{digest}.{ARTIFACT_EXTENSION}"
+
+
+def pointer_blob_name(wine_type: str, stage: str = CURRENT) -> str:
+    return f"pointers/{wine_type}/{stage}.json"
+
+
+@dataclass(frozen=True)
+class Pointer:
+    """
+    Small document naming the artifact version of a stage.
+
+    `etag` is the ETag of the pointer blob when it was read, used to make
+    the next write conditional; it is not part of the document.
+    """
+    wine_type: str
+    digest: str
+    previous: Optional[str] = None
+    updated_at: Optional[str] = None
+    etag: Optional[str] = None
+
+    @property
+    def blob_name(self) -> str:
+        return version_blob_name(self.wine_type, self.digest)
+
+    def to_json(self) -> bytes:
+        return json.dumps({
+            "wine_type": self.wine_type,
+            "digest": self.digest,
+            "blob": self.blob_name,
+            "previous": self.previous,
+            "updated_at": self.updated_at
+        }).encode()
+
+    @classmethod
+    def from_json(cls, data: bytes, etag: Optional[str] = None) -> "Pointer":
+        document: Dict[str, Any] = json.loads(data)
+        return cls(document["wine_type"], document["digest"], document.get("previous"),
+                   document.get("updated_at"), etag)
+
+
+async def put_version(container, wine_type: str, artifact_bytes: bytes) -> str:
+    """
+    Store an artifact under its content digest, once.
+
+    The digest covers the model and its manifest but not the creation time,
+    so a model retrained identically maps to the version already stored.
+
+    Args:
+        container: Async container client of MODELS_CONTAINER
+        wine_type (str): Type of wine ('red' or 'white')
+        artifact_bytes (bytes): Artifact content (see shared.artifacts)
+
+    Returns:
+        str: Digest of the artifact, which identifies the version
+    """
+    digest = artifact_digest(artifact_bytes)
+    blob_client = container.get_blob_client(version_blob_name(wine_type, digest))
+    try:
+        await blob_client.upload_blob(artifact_bytes, overwrite=False)
+    except ResourceExistsError:
+        # Same digest, same model: the stored artifact only differs by its creation time
+        logging.info(f"Model version {digest} of {wine_type} wine already stored")
+    return digest
+
+
+async def read_pointer(container, wine_type: str, stage: str = CURRENT) -> Optional[Pointer]:
+    """
+    Read a pointer with its ETag.
+
+    Args:
+        container: Async container client of MODELS_CONTAINER
+        wine_type (str): Type of wine ('red' or 'white')
+        stage (str): CURRENT or CANDIDATE
+
+    Returns:
+        Optional[Pointer]: The pointer, or None if none was written yet
+    """
+    blob_client = container.get_blob_client(pointer_blob_name(wine_type, stage))
+    try:
+        stream = await blob_client.download_blob()
+        return Pointer.from_json(await stream.readall(), stream.properties.etag)
+    except ResourceNotFoundError:
+        return None
+
+
+def read_pointer_sync(container, wine_type: str, stage: str = CURRENT) -> Optional[Pointer]:
+    """Blocking variant of read_pointer, for a sync container client."""
+    blob_client = container.get_blob_client(pointer_blob_name(wine_type, stage))
+    try:
+        stream = blob_client.download_blob()
+        return Pointer.from_json(stream.readall(), stream.properties.etag)
+    except ResourceNotFoundError:
+        return None
+
+
+async def write_pointer(container, wine_type: str, digest: str, stage: str = CURRENT,
+                        expected: Optional[Pointer] = None) -> Pointer:
+    """
+    Point a stage at a stored version, atomically.
+
+    The write is conditional on the pointer being unchanged since
+    `expected` was read, or on it not existing when `expected` is None,
+    so two concurrent promotions cannot silently overwrite each other.
+
+    Args:
+        container: Async container client of MODELS_CONTAINER
+        wine_type (str): Type of wine ('red' or 'white')
+        digest (str): Version to point at, as returned by put_version
+        stage (str): CURRENT or CANDIDATE
+        expected (Optional[Pointer]): Pointer the decision was based on
+
+    Returns:
+        Pointer: The pointer written, with its new ETag
+
+    Raises:
+        PromotionConflict: If the pointer changed in the meantime
+    """
+    pointer = Pointer(wine_type, digest, expected.digest if expected else None,
+                      datetime.now(timezone.utc).isoformat())
+    blob_client = container.get_blob_client(pointer_blob_name(wine_type, stage))
+    try:
+        if expected is None:
+            result = await blob_client.upload_blob(pointer.to_json(), overwrite=False)
+        else:
+            result = await blob_client.upload_blob(pointer.to_json(), overwrite=True, etag=expected.etag,
+                                                   match_condition=MatchConditions.IfNotModified)
+    except (ResourceExistsError, ResourceModifiedError) as e:
+        raise PromotionConflict(f"{stage} pointer of {wine_type} wine changed concurrently") from e
+    etag = result.get("etag") if isinstance(result, dict) else None
+    return Pointer(pointer.wine_type, pointer.digest, pointer.previous, pointer.updated_at, etag)
+
+
+async def promote(container, wine_type: str, digest: str, expected: Optional[Pointer] = None) -> Pointer:
+    """
+    Make a stored version the production model of a wine type.
+
+    Only the pointer is written: promotion costs the same whatever the
+    model size, and inference caches pick the version up on their next
+    pointer check.
+
+    Args:
+        container: Async container client of MODELS_CONTAINER
+        wine_type (str): Type of wine ('red' or 'white')
+        digest (str): Version to promote
+        expected (Optional[Pointer]): Current pointer the decision was based on, None if there was none
+
+    Returns:
+        Pointer: The new current pointer
+    """
+    pointer = await write_pointer(container, wine_type, digest, CURRENT, expected)
+    logging.info(f"Model {digest} of {wine_type} wine promoted to production")
+    return pointer
+
+
+async def rollback(container, wine_type: str) -> Pointer:
+    """
+    Point production back at the version it replaced.
+
+    Rolling back twice returns to the original version.
+
+    Args:
+        container: Async container client of MODELS_CONTAINER
+        wine_type (str): Type of wine ('red' or 'white')
+
+    Returns:
+        Pointer: The new current pointer
+    """
+    current = await read_pointer(container, wine_type)
+    if current is None or current.previous is None:
+        raise ValueError(f"No previous {wine_type} model to roll back to")
+    return await promote(container, wine_type, current.previous, expected=current)
+
+
+async def prune_versions(container, wine_type: str, keep: int = VERSIONS_TO_KEEP) -> List[str]:
+    """
+    Delete the versions of a wine type no pointer references, but the `keep` most recent.
+
+    The current and candidate versions and the versions they replaced are
+    never deleted, so rollback keeps working.
+
+    Args:
+        container: Async container client of MODELS_CONTAINER
+        wine_type (str): Type of wine ('red' or 'white')
+        keep (int): Number of unreferenced versions kept
+
+    Returns:
+        List[str]: Digests of the deleted versions
+    """
+    referenced = set()
+    for stage in (CURRENT, CANDIDATE):
+        pointer = await read_pointer(container, wine_type, stage)
+        if pointer is not None:
+            referenced.update(d for d in (pointer.digest, pointer.previous) if d)
+
+    prefix = f"{VERSIONS_PREFIX}/{wine_type}/"
+    suffix = f".{ARTIFACT_EXTENSION}"
+    unreferenced = []
+    async for blob in container.list_blobs(name_starts_with=prefix):
+        digest = blob.name[len(prefix):]
+        if digest.endswith(suffix) and digest[:-len(suffix)] not in referenced:
+            unreferenced.append((blob.last_modified, digest[:-len(suffix)]))
+
+    deleted = []
+    for _, digest in sorted(unreferenced, reverse=True)[max(keep, 0):]:
+        try:
+            await container.get_blob_client(version_blob_name(wine_type, digest)).delete_blob()
+        except ResourceNotFoundError:
+            continue
+        deleted.append(digest)
+    if deleted:
+        logging.info(f"Pruned {len(deleted)} unreferenced model versions of {wine_type} wine")
+    return deleted
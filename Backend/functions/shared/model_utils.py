@@ -1,27 +1,39 @@
-import joblib
-import io
-from sklearn.ensemble import RandomForestClassifier
 import pandas as pd
-from sklearn.preprocessing import StandardScaler
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import accuracy_score
 import pickle
 import logging
-from typing import Tuple
-import os
-from azure.storage.blob import BlobServiceClient
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Tuple, Union
+from azure.core.exceptions import ResourceNotFoundError
+from shared.artifacts import build_manifest, load_artifact, pack_artifact
+from shared.dataset_stats import DatasetStats
+from shared.incremental import (INCREMENTAL, FullRetrainRequired, class_weights, count_classes, needs_full_retrain,
+                                trees_to_add)
+from shared.model_search import SEARCH_MODE, search_model
+from shared.disk_cache import cached_blob_path
+from shared.feature_schema import FeatureSchema
+from shared.model_store import MODELS_CONTAINER, read_pointer_sync
+from shared.storage import get_sync_blob_service
 
-def preprocess_data(df: pd.DataFrame, wine_type: str) -> Tuple[pd.DataFrame, bytes]:
+# scikit-learn is imported where a model is fitted: the worker processes that train,
+# not every function that reaches this module
+if TYPE_CHECKING:
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.preprocessing import StandardScaler
+
+def preprocess_data(df: pd.DataFrame, wine_type: str,
+                    stats: Optional[DatasetStats] = None) -> Tuple[pd.DataFrame, bytes]:
     """
     Preprocess the dataset by applying standardization.
     
     Args:
         df (pd.DataFrame): Raw DataFrame with wine data
         wine_type (str): Type of wine ('red' or 'white')
+        stats (Optional[DatasetStats]): Statistics computed at upload, used instead of fitting the scaler
         
     Returns:
         Tuple[pd.DataFrame, bytes]: (Preprocessed DataFrame, serialized scaler)
     """
+    from sklearn.preprocessing import StandardScaler
+
     logging.info(f"Starting preprocessing for {wine_type} wine")
     
     # Data cleaning
@@ -32,9 +44,14 @@ def preprocess_data(df: pd.DataFrame, wine_type: str) -> Tuple[pd.DataFrame, byt
     X = df_cleaned.drop('quality', axis=1)
     y = df_cleaned['quality']
     
-    # Standardization
-    scaler = StandardScaler()
-    X_scaled = scaler.fit_transform(X)
+    # Standardization, with the scaler built from the upload statistics when they describe this data
+    if stats is not None and stats.rows == len(X) and set(X.columns) <= set(stats.columns):
+        scaler = stats.to_scaler(list(X.columns))
+        X_scaled = scaler.transform(X)
+        logging.info(f"Scaler for {wine_type} wine built from upload statistics")
+    else:
+        scaler = StandardScaler()
+        X_scaled = scaler.fit_transform(X)
     
     # Rebuild DataFrame with scaled features and target
     df_cleaned = pd.concat([
@@ -48,17 +65,26 @@ def preprocess_data(df: pd.DataFrame, wine_type: str) -> Tuple[pd.DataFrame, byt
     logging.info(f"Preprocessing completed for {wine_type} wine")
     return df_cleaned, scaler_bytes
 
-def train_model(df_cleaned: pd.DataFrame, wine_type: str) -> bytes:
+def fit_model(df_cleaned: pd.DataFrame, wine_type: str) -> Tuple["RandomForestClassifier", Dict[str, float]]:
     """
-    Train the model on preprocessed data.
+    Fit the model on preprocessed data and evaluate it on a held-out split.
     
     Args:
         df_cleaned (pd.DataFrame): Preprocessed DataFrame
         wine_type (str): Type of wine ('red' or 'white')
         
     Returns:
-        bytes: serialized model
+        Tuple[RandomForestClassifier, Dict[str, float]]: (fitted model, test set metrics)
     """
+    model, metrics, _ = _fit_and_evaluate(df_cleaned, wine_type)
+    return model, metrics
+
+def _fit_and_evaluate(df_cleaned: pd.DataFrame,
+                      wine_type: str) -> Tuple[Any, Dict[str, float], Optional[List[Dict[str, Any]]]]:
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.metrics import accuracy_score, f1_score
+    from sklearn.model_selection import train_test_split
+
     logging.info(f"Starting training for {wine_type} wine")
     
     # Separate features and target
@@ -70,26 +96,154 @@ def train_model(df_cleaned: pd.DataFrame, wine_type: str) -> bytes:
         X, y, test_size=0.2, random_state=42, stratify=y
     )
     
-    # Model training
-    model = RandomForestClassifier(
-        n_estimators=100,
-        random_state=42,
-        class_weight='balanced'
-    )
-    model.fit(X_train, y_train)
+    # Model training: a fixed forest, or the winner of the model search when MODEL_SEARCH is enabled
+    search = None
+    if SEARCH_MODE in ("grid", "random"):
+        model, search = search_model(X_train, y_train, mode=SEARCH_MODE)
+    else:
+        model = RandomForestClassifier(
+            n_estimators=100,
+            random_state=42,
+            class_weight='balanced'
+        )
+        model.fit(X_train, y_train)
     
     # Log test set accuracy
     y_pred = model.predict(X_test)
     accuracy = accuracy_score(y_test, y_pred)
     logging.info(f"Test set accuracy: {accuracy:.4f}")
     
-    # Serialization
-    model_bytes = pickle.dumps(model)
+    metrics = {
+        'accuracy': accuracy,
+        'f1': f1_score(y_test, y_pred, average='weighted')
+    }
     
     logging.info(f"Training completed for {wine_type} wine")
-    return model_bytes
+    return model, metrics, search
+
+def train_model(df_cleaned: pd.DataFrame, wine_type: str) -> bytes:
+    """
+    Train the model on preprocessed data.
+    
+    Args:
+        df_cleaned (pd.DataFrame): Preprocessed DataFrame
+        wine_type (str): Type of wine ('red' or 'white')
+        
+    Returns:
+        bytes: serialized model
+    """
+    model, _ = fit_model(df_cleaned, wine_type)
+    
+    # Serialization
+    return pickle.dumps(model)
+
+def train_artifact(df_cleaned: pd.DataFrame, scaler_bytes: bytes, wine_type: str,
+                   data_hash: Optional[str] = None,
+                   training: Optional[Dict[str, Any]] = None) -> bytes:
+    """
+    Train the model and pack it with its scaler into a model artifact.
+    
+    Args:
+        df_cleaned (pd.DataFrame): Preprocessed DataFrame
+        scaler_bytes (bytes): Serialized scaler returned by preprocess_data
+        wine_type (str): Type of wine ('red' or 'white')
+        data_hash (Optional[str]): SHA-256 of the raw dataset
+        training (Optional[Dict[str, Any]]): Training record from shared.incremental.training_record
+        
+    Returns:
+        bytes: artifact content (see shared.artifacts)
+    """
+    model, metrics, search = _fit_and_evaluate(df_cleaned, wine_type)
+    scaler = pickle.loads(scaler_bytes)
+
+    # Record the feature names, order and observed ranges used to validate requests
+    schema = FeatureSchema.from_training(df_cleaned.drop('quality', axis=1), scaler)
+    if training is not None:
+        training = {**training, "full_trees": len(getattr(model, "estimators_", [])),
+                    "class_counts": count_classes(df_cleaned['quality'])}
+    manifest = build_manifest(model, scaler, wine_type, data_hash=data_hash, metrics=metrics, schema=schema,
+                              training=training, search=search)
+    return pack_artifact(model, scaler, manifest)
 
-def load_model(wine_type: str) -> Tuple[RandomForestClassifier, StandardScaler]:
+def extend_artifact(production: Union[bytes, str], df_new: pd.DataFrame, wine_type: str,
+                    data_hash: Optional[str], base_etag: str, partitions: Sequence[str]) -> bytes:
+    """
+    Add trees fitted on new rows to the production forest, keeping its scaler.
+
+    The new trees are grown with warm_start on the new rows only, scaled with
+    the scaler of the production model so that every tree splits in the
+    same feature space. Their number follows the share of new rows in the
+    data, and a balanced forest weighs classes by their counts in all the
+    data the model covers, not in the new rows. Metrics are measured on a
+    held-out part of the new rows.
+
+    Args:
+        production (Union[bytes, str]): Production artifact (content or path), with a 'training' record in its manifest
+        df_new (pd.DataFrame): Raw rows of the new partitions
+        wine_type (str): Type of wine ('red' or 'white')
+        data_hash (Optional[str]): SHA-256 of the raw data the extended model covers
+        base_etag (str): ETag of the base raw blob
+        partitions (Sequence[str]): All partitions the extended model covers
+
+    Returns:
+        bytes: artifact content (see shared.artifacts)
+
+    Raises:
+        FullRetrainRequired: If the new rows do not allow an incremental round
+    """
+    from sklearn.metrics import accuracy_score, f1_score
+    from sklearn.model_selection import train_test_split
+
+    model, scaler, manifest = load_artifact(production)
+    trained = manifest["training"]
+    if not hasattr(model, "estimators_"):
+        raise FullRetrainRequired(f"{type(model).__name__} cannot be extended with trees")
+
+    df_new = df_new.dropna()
+    features = list(scaler.feature_names_in_)
+    X = pd.DataFrame(scaler.transform(df_new[features]), columns=features)
+    y = df_new['quality'].reset_index(drop=True)
+    if len(y) < 2:
+        raise FullRetrainRequired("new partitions have fewer than 2 complete rows")
+
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    reason = needs_full_retrain(len(y_train), trained["rows"], y_train.unique(), model.classes_)
+    if reason:
+        raise FullRetrainRequired(reason)
+
+    full_trees = trained.get("full_trees") or len(model.estimators_)
+    added = trees_to_add(full_trees, len(y_train), trained["rows"] + len(y_train))
+    logging.info(f"Adding {added} trees to the {len(model.estimators_)} of the {wine_type} wine model "
+                 f"for {len(y)} new rows")
+    counts = count_classes(y, trained["class_counts"]) if trained.get("class_counts") else None
+    # Models trained before class counts were recorded get unweighted trees
+    weights = class_weights(counts, model.classes_) if model.class_weight is not None else None
+    model.set_params(warm_start=True, n_estimators=len(model.estimators_) + added, class_weight=weights)
+    model.fit(X_train, y_train)
+    model.set_params(warm_start=False)
+
+    y_pred = model.predict(X_test)
+    metrics = {
+        'accuracy': accuracy_score(y_test, y_pred),
+        'f1': f1_score(y_test, y_pred, average='weighted')
+    }
+
+    # Requests within the new data's range stay valid
+    schema = FeatureSchema.from_manifest(manifest, scaler).union(FeatureSchema.from_training(X, scaler))
+    training = {
+        **trained,
+        "mode": INCREMENTAL,
+        "base_etag": base_etag,
+        "partitions": list(partitions),
+        "rows": trained["rows"] + len(y),
+        "rounds": trained.get("rounds", 0) + 1,
+        "class_counts": counts
+    }
+    manifest = build_manifest(model, scaler, wine_type, data_hash=data_hash, metrics=metrics, schema=schema,
+                              training=training)
+    return pack_artifact(model, scaler, manifest)
+
+def load_model(wine_type: str) -> Tuple["RandomForestClassifier", "StandardScaler"]:
     """
     Load the model and scaler from blob storage.
     
@@ -100,22 +254,17 @@ def load_model(wine_type: str) -> Tuple[RandomForestClassifier, StandardScaler]:
         Tuple[RandomForestClassifier, StandardScaler]: (model, scaler)
     """
     try:
-        connection_string = os.getenv("AzureWebJobsStorage")
-        blob_service = BlobServiceClient.from_connection_string(connection_string)
-        container_client = blob_service.get_container_client("models")
-
-        model_blob = container_client.get_blob_client(f"model_{wine_type}.pkl")
-        model_bytes = model_blob.download_blob().readall()
-
-        scaler_blob = container_client.get_blob_client(f"scaler_{wine_type}.pkl")
-        scaler_bytes = scaler_blob.download_blob().readall()
+        container_client = get_sync_blob_service().get_container_client(MODELS_CONTAINER)
 
-        model = joblib.load(io.BytesIO(model_bytes))
-        scaler = joblib.load(io.BytesIO(scaler_bytes))
+        current = read_pointer_sync(container_client, wine_type)
+        if current is None:
+            raise ResourceNotFoundError(f"No production model for {wine_type} wine")
+        artifact_blob = container_client.get_blob_client(current.blob_name)
+        model, scaler, _ = load_artifact(cached_blob_path(artifact_blob))
 
         logging.info(f"Model and scaler successfully loaded for {wine_type} wine")
         return model, scaler
 
     except Exception as e:
         logging.error(f"Error loading model: {str(e)}")
-        raise
\ No newline at end of file
+        raise
@@ -0,0 +1,257 @@
+import hashlib
+import io
+import logging
+import os
+import resource
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from azure.core import MatchConditions
+
+from shared.artifacts import build_manifest, pack_artifact
+from shared.dataset_stats import TARGET_COLUMN, ColumnStats, DatasetStats
+from shared.feature_schema import FeatureSchema
+from shared.incremental import count_classes
+from shared.scoring import BlobChunkReader
+from shared.storage import get_sync_blob_service
+
+# Raw data size above which training switches to the memory-bounded mode; 0 always uses it
+BOUNDED_THRESHOLD_BYTES = int(os.getenv("TRAINING_BOUNDED_THRESHOLD_BYTES", str(256 * 1024 * 1024)))
+# Rows parsed per CSV chunk
+CHUNK_ROWS = int(os.getenv("TRAINING_CHUNK_ROWS", "100000"))
+# Upper bound of the bootstrap sample drawn for each tree
+MAX_TREE_SAMPLES = int(os.getenv("TRAINING_MAX_TREE_SAMPLES", "200000"))
+# Rows scaled or predicted per block, so temporary float64 copies stay small
+BLOCK_ROWS = 65536
+
+# A raw blob to read: (container, blob name, etag)
+BlobRef = Tuple[str, str, str]
+
+
+def use_bounded_mode(total_bytes: int) -> bool:
+    return total_bytes >= BOUNDED_THRESHOLD_BYTES
+
+
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except OSError:
+        return 0.0
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class StageMeter:
+    """
+    Record duration, resident memory and peak resident memory at the end of each stage.
+
+    The peak is the high-water mark of the process, so in a reused worker
+    process it can come from an earlier job; the current RSS is exact.
+    """
+
+    def __init__(self):
+        self.stages: List[Dict[str, Any]] = []
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        yield
+        report = {
+            "stage": name,
+            "seconds": round(time.perf_counter() - start, 3),
+            "rss_mb": round(_rss_mb(), 1),
+            "peak_rss_mb": round(_peak_rss_mb(), 1)
+        }
+        self.stages.append(report)
+        logging.info(f"Training stage {name}: {report['seconds']}s, RSS {report['rss_mb']} MB, "
+                     f"peak {report['peak_rss_mb']} MB")
+
+
+class ColumnarBuffer:
+    """
+    Growable float32 feature matrix and int label vector, filled chunk by chunk.
+
+    Capacity grows by resizing in place, so the data is held once instead of
+    as a list of chunks plus their concatenation.
+    """
+
+    def __init__(self, n_features: int, capacity: int = 1024):
+        self.X = np.empty((max(capacity, 1), n_features), dtype=np.float32)
+        self.y = np.empty(max(capacity, 1), dtype=np.int32)
+        self.rows = 0
+
+    def append(self, X: np.ndarray, y: np.ndarray) -> None:
+        needed = self.rows + len(X)
+        if needed > len(self.X):
+            capacity = max(needed, int(len(self.X) * 1.5))
+            self.X.resize((capacity, self.X.shape[1]), refcheck=False)
+            self.y.resize(capacity, refcheck=False)
+        self.X[self.rows:needed] = X
+        self.y[self.rows:needed] = y
+        self.rows = needed
+
+    def trim(self) -> Tuple[np.ndarray, np.ndarray]:
+        self.X.resize((self.rows, self.X.shape[1]), refcheck=False)
+        self.y.resize(self.rows, refcheck=False)
+        return self.X, self.y
+
+
+def read_columnar(readers: Iterable[io.BufferedIOBase],
+                  features: Optional[Sequence[str]] = None,
+                  size_hint: int = 0,
+                  chunk_rows: int = CHUNK_ROWS) -> Tuple[np.ndarray, np.ndarray, List[str], Dict[str, ColumnStats]]:
+    """
+    Parse ';' separated CSV streams chunk by chunk into a float32 columnar buffer.
+
+    Incomplete rows are dropped, as preprocess_data does, and per-column
+    statistics are accumulated in float64 during the same pass.
+
+    Args:
+        readers: Binary file objects, one per raw blob
+        features (Optional[Sequence[str]]): Feature columns in order, defaults to those of the first header
+        size_hint (int): Total bytes, used to preallocate the buffer
+        chunk_rows (int): Rows per parsed chunk
+
+    Returns:
+        Tuple: (raw float32 features, labels, feature names, statistics per feature)
+    """
+    buffer: Optional[ColumnarBuffer] = None
+    stats: Dict[str, ColumnStats] = {}
+
+    for reader in readers:
+        for chunk in pd.read_csv(reader, sep=";", chunksize=chunk_rows):
+            chunk = chunk.dropna()
+            if features is None:
+                features = [c for c in chunk.columns if c != TARGET_COLUMN]
+            X = chunk[list(features)].to_numpy(dtype=np.float32)
+            y = chunk[TARGET_COLUMN].to_numpy(dtype=np.int32)
+
+            if buffer is None:
+                # About 100 bytes per raw row in the wine exports
+                buffer = ColumnarBuffer(len(features), capacity=max(size_hint // 100, len(X)))
+            buffer.append(X, y)
+
+            for j, name in enumerate(features):
+                stats[name] = stats.get(name, ColumnStats()).merge(ColumnStats.from_values(X[:, j]))
+
+    if buffer is None:
+        raise ValueError("No rows to train on")
+    X, y = buffer.trim()
+    return X, y, list(features), stats
+
+
+def scale_in_place(X: np.ndarray, scaler: Any, block_rows: int = BLOCK_ROWS) -> None:
+    """Standardize a float32 matrix block by block, computing each block in float64 like scaler.transform."""
+    for start in range(0, len(X), block_rows):
+        block = X[start:start + block_rows]
+        block[:] = (block.astype(np.float64) - scaler.mean_) / scaler.scale_
+
+
+def split_weights(y: np.ndarray, test_size: float = 0.2, seed: int = 42) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Split rows into train and test by index, stratified by label.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: (train sample weights, 1 for train rows and 0 for test rows; test indices)
+    """
+    from sklearn.model_selection import train_test_split
+
+    _, test_idx = train_test_split(np.arange(len(y)), test_size=test_size, random_state=seed, stratify=y)
+    weights = np.ones(len(y), dtype=np.float64)
+    weights[test_idx] = 0.0
+    return weights, np.sort(test_idx)
+
+
+def blob_readers(blobs: Sequence[BlobRef], digest: Optional[Any] = None) -> Iterator[io.BufferedIOBase]:
+    """Open streaming readers over raw blobs, pinned to the ETags being trained, hashing the bytes read."""
+    blob_service = get_sync_blob_service()
+    for container, name, etag in blobs:
+        blob = blob_service.get_blob_client(container=container, blob=name)
+        stream = blob.download_blob(etag=etag, match_condition=MatchConditions.IfNotModified)
+        chunks = stream.chunks()
+        if digest is not None:
+            chunks = (digest.update(chunk) or chunk for chunk in chunks)
+        yield io.BufferedReader(BlobChunkReader(chunks), buffer_size=4 * 1024 * 1024)
+
+
+def train_bounded(blobs: Sequence[BlobRef], wine_type: str,
+                  training: Optional[Dict[str, Any]] = None, size_hint: int = 0,
+                  stats: Optional[DatasetStats] = None) -> bytes:
+    """
+    Train a model artifact with memory bounded by one float32 copy of the features.
+
+    Raw blobs are streamed chunk by chunk into a float32 columnar buffer
+    while the scaler statistics are accumulated, then the buffer is
+    standardized in place. Test rows are held out by giving them a zero
+    sample weight rather than by copying, and each tree draws at most
+    TRAINING_MAX_TREE_SAMPLES bootstrap rows. Duration and memory after
+    every stage are logged and stored in the 'training' record of the
+    manifest, and the SHA-256 of the raw bytes is computed as they stream.
+
+    Args:
+        blobs (Sequence[BlobRef]): Raw blobs to train on, base dataset first
+        wine_type (str): Type of wine ('red' or 'white')
+        training (Optional[Dict[str, Any]]): Training record from shared.incremental.training_record
+        size_hint (int): Total size of the raw blobs
+        stats (Optional[DatasetStats]): Upload statistics, preferred over the ones of the read pass
+
+    Returns:
+        bytes: artifact content (see shared.artifacts)
+    """
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.metrics import accuracy_score, f1_score
+
+    meter = StageMeter()
+
+    digest = hashlib.sha256()
+    with meter.stage("read"):
+        X, y, features, column_stats = read_columnar(blob_readers(blobs, digest), size_hint=size_hint)
+    logging.info(f"Read {len(y)} rows of {wine_type} wine into {X.nbytes / (1024 * 1024):.1f} MB")
+
+    with meter.stage("scale"):
+        if stats is not None and stats.rows == len(y):
+            scaler = stats.to_scaler(features)
+        else:
+            scaler = DatasetStats(columns=column_stats, rows=len(y)).to_scaler(features)
+        scale_in_place(X, scaler)
+
+    with meter.stage("fit"):
+        weights, test_idx = split_weights(y)
+        n_train = int(weights.sum())
+        model = RandomForestClassifier(
+            n_estimators=100,
+            random_state=42,
+            class_weight='balanced',
+            max_samples=MAX_TREE_SAMPLES if MAX_TREE_SAMPLES < n_train else None,
+            n_jobs=-1
+        )
+        model.fit(X, y, sample_weight=weights)
+
+    with meter.stage("evaluate"):
+        y_pred = np.concatenate([
+            model.predict(X[test_idx[start:start + BLOCK_ROWS]])
+            for start in range(0, len(test_idx), BLOCK_ROWS)
+        ])
+        y_test = y[test_idx]
+        metrics = {
+            'accuracy': accuracy_score(y_test, y_pred),
+            'f1': f1_score(y_test, y_pred, average='weighted')
+        }
+        logging.info(f"Test set accuracy: {metrics['accuracy']:.4f}")
+
+    schema = FeatureSchema.from_ranges(features,
+                                       [column_stats[f].minimum for f in features],
+                                       [column_stats[f].maximum for f in features])
+    if training is not None:
+        training = {**training, "rows": len(y), "full_trees": len(model.estimators_), "stages": meter.stages,
+                    "class_counts": count_classes(y)}
+    manifest = build_manifest(model, scaler, wine_type, data_hash=digest.hexdigest(), metrics=metrics, schema=schema,
+                              training=training)
+    return pack_artifact(model, scaler, manifest)
@@ -0,0 +1,177 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import sys
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Optional
+
+from azure.core.exceptions import ResourceExistsError, ResourceNotFoundError
+
+from shared.metrics import count, span
+
+# Stage outputs, stored as {wine_type}/{stage}/{key}
+CHECKPOINT_CONTAINER = "checkpoints"
+# Bump when a stage produces different outputs for the same inputs, so older checkpoints are ignored
+PIPELINE_VERSION = 1
+
+# Training stages, in pipeline order
+INGEST = "ingest"
+PREPROCESS = "preprocess"
+TRAIN = "train"
+VALIDATE = "validate"
+PROMOTE = "promote"
+STAGES = (INGEST, PREPROCESS, TRAIN, VALIDATE, PROMOTE)
+
+
+def stage_key(stage: str, inputs: Any) -> str:
+    """
+    Content address of a stage output: the SHA-256 of the stage and its inputs.
+
+    Args:
+        stage (str): Stage name
+        inputs: JSON-serializable inputs, e.g. upstream keys, ETags and settings
+
+    Returns:
+        str: Hex digest
+    """
+    document = json.dumps([PIPELINE_VERSION, stage, inputs], sort_keys=True, default=str)
+    return hashlib.sha256(document.encode()).hexdigest()
+
+
+@dataclass(frozen=True)
+class StageResult:
+    """Output of a stage, with the key it is stored under and whether it came from a checkpoint."""
+    stage: str
+    key: str
+    value: Any
+    cached: bool = False
+
+
+def encode_json(value: Any) -> bytes:
+    return json.dumps(value).encode()
+
+
+def decode_json(data: bytes) -> Any:
+    return json.loads(data)
+
+
+class CheckpointStore:
+    """
+    Stage outputs in blob storage, addressed by the key of their inputs.
+
+    Checkpoints are written once and never modified; a failure to read or
+    write one is logged and only costs recomputing the stage.
+    """
+
+    def __init__(self, blob_service, container: str = CHECKPOINT_CONTAINER):
+        self.container_client = blob_service.get_container_client(container)
+
+    @staticmethod
+    def blob_name(wine_type: str, stage: str, key: str) -> str:
+        return f"{wine_type}/{stage}/{key}"
+
+    async def load(self, wine_type: str, stage: str, key: str) -> Optional[bytes]:
+        blob_client = self.container_client.get_blob_client(self.blob_name(wine_type, stage, key))
+        try:
+            stream = await blob_client.download_blob()
+            return await stream.readall()
+        except ResourceNotFoundError:
+            return None
+        except Exception as e:
+            logging.warning(f"Ignoring unreadable {stage} checkpoint of {wine_type} wine: {str(e)}")
+            return None
+
+    async def save(self, wine_type: str, stage: str, key: str, data: bytes) -> None:
+        blob_client = self.container_client.get_blob_client(self.blob_name(wine_type, stage, key))
+        try:
+            await blob_client.upload_blob(data, overwrite=False)
+        except ResourceExistsError:
+            pass
+        except Exception as e:
+            logging.error(f"Error saving {stage} checkpoint of {wine_type} wine: {str(e)}")
+
+
+async def run_stage(store: CheckpointStore, wine_type: str, stage: str, inputs: Any,
+                    compute: Callable[[], Awaitable[Any]],
+                    encode: Callable[[Any], bytes] = encode_json,
+                    decode: Callable[[bytes], Any] = decode_json,
+                    replay: bool = False) -> StageResult:
+    """
+    Return the checkpointed output of a stage, computing and storing it on a miss.
+
+    Args:
+        store (CheckpointStore): Checkpoints of the pipeline
+        wine_type (str): Type of wine ('red' or 'white')
+        stage (str): Stage name
+        inputs: Everything the output depends on, see stage_key
+        compute: Coroutine function producing the output
+        encode: Serializes the output; run in a thread
+        decode: Deserializes a checkpoint; run in a thread
+        replay (bool): Recompute even if a checkpoint exists
+
+    Returns:
+        StageResult: The output and its key
+    """
+    key = stage_key(stage, inputs)
+    if not replay:
+        data = await store.load(wine_type, stage, key)
+        if data is not None:
+            logging.info(f"Stage {stage} of {wine_type} wine reused checkpoint {key[:12]}")
+            count("pipeline_checkpoints", stage=stage, result="hit")
+            count("pipeline_checkpoint_bytes", len(data), stage=stage, direction="read")
+            return StageResult(stage, key, await asyncio.to_thread(decode, data), cached=True)
+
+    count("pipeline_checkpoints", stage=stage, result="replay" if replay else "miss")
+    with span("pipeline_stage", stage=stage, wine_type=wine_type):
+        value = await compute()
+    data = await asyncio.to_thread(encode, value)
+    count("pipeline_checkpoint_bytes", len(data), stage=stage, direction="write")
+    await store.save(wine_type, stage, key, data)
+    logging.info(f"Stage {stage} of {wine_type} wine computed, checkpoint {key[:12]}")
+    return StageResult(stage, key, value)
+
+
+def _summary(result: StageResult) -> str:
+    value = result.value
+    if not isinstance(value, dict):
+        # Preprocessed frames are summarized by their shape
+        value = {"rows": len(value[0]), "columns": list(value[0].columns)}
+    return json.dumps({"stage": result.stage, "key": result.key, "cached": result.cached, "value": value},
+                      indent=2, default=str)
+
+
+async def _run_cli(args: argparse.Namespace) -> StageResult:
+    from shared.storage import get_blob_service
+    from shared.training import PipelineRun, run_single_stage
+
+    blob_service = get_blob_service()
+    if args.version:
+        run = await PipelineRun.from_ingest(blob_service, args.wine_type, args.version)
+    else:
+        run = await PipelineRun.current(blob_service, args.wine_type)
+    if args.replay:
+        run.replay = {args.stage}
+    return await run_single_stage(run, args.stage)
+
+
+def main(argv: Optional[list] = None) -> None:
+    """
+    Run or replay one stage for a dataset version, reusing upstream checkpoints.
+
+    python -m shared.pipeline <stage> <wine_type> [--version INGEST_KEY] [--replay]
+    """
+    parser = argparse.ArgumentParser(description="Run one stage of the training pipeline")
+    parser.add_argument("stage", choices=STAGES)
+    parser.add_argument("wine_type", choices=["red", "white"])
+    parser.add_argument("--version", help="Ingest checkpoint key of the dataset version, defaults to the current data")
+    parser.add_argument("--replay", action="store_true", help="Recompute the stage even if it is checkpointed")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    print(_summary(asyncio.run(_run_cli(args))))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
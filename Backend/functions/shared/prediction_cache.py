@@ -0,0 +1,101 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from shared.metrics import register_collector
+
+# Maximum number of cached predictions; 0 disables the cache
+DEFAULT_MAX_ENTRIES = int(os.getenv("PREDICTION_CACHE_SIZE", "10000"))
+# Seconds a prediction stays cached; 0 keeps it until evicted or invalidated
+DEFAULT_TTL = float(os.getenv("PREDICTION_CACHE_TTL", "0"))
+
+# (wine type, model version, canonical feature vector)
+Key = Tuple[str, str, Hashable]
+
+
+class PredictionCache:
+    """
+    Bounded LRU cache of predictions keyed by model version and feature vector.
+
+    Keys carry the version (artifact digest) of the model that produced the
+    prediction, so a promoted model never serves its predecessor's results;
+    the registry also drops the entries of a wine type when it loads a new
+    version, instead of leaving them to age out. Safe to share between the
+    threads of the inference executor.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl: float = DEFAULT_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Key, Tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = self._misses = self._evictions = self._expirations = self._invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def get(self, key: Key) -> Optional[Any]:
+        """Return the cached prediction for a key, or None."""
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                self._misses += 1
+                return None
+            value, expires_at = item
+            if expires_at and expires_at < time.monotonic():
+                del self._entries[key]
+                self._expirations += 1
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def put(self, key: Key, value: Any) -> None:
+        """Cache a prediction, evicting the least recently used ones beyond the limit."""
+        if not self.enabled:
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl > 0 else 0.0
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def invalidate(self, wine_type: Optional[str] = None, keep_version: Optional[str] = None) -> None:
+        """
+        Drop cached predictions of a wine type, or of all of them.
+
+        Args:
+            wine_type (Optional[str]): Wine type to drop, all types when None
+            keep_version (Optional[str]): Model version whose predictions are kept
+        """
+        with self._lock:
+            stale = [key for key in self._entries
+                     if (wine_type is None or key[0] == wine_type) and key[1] != keep_version]
+            for key in stale:
+                del self._entries[key]
+            self._invalidations += len(stale)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit, miss, eviction and size counters, to size the cache."""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": self._hits / lookups if lookups else 0.0,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "invalidations": self._invalidations
+            }
+
+
+prediction_cache = PredictionCache()
+register_collector("prediction_cache", prediction_cache.stats)
@@ -0,0 +1,172 @@
+import io
+import logging
+import os
+from typing import Any, Dict, Iterator, List, Optional
+
+import pandas as pd
+from azure.storage.blob import BlobBlock, BlobServiceClient, ContentSettings
+
+from shared.compiled_forest import predict_features
+from shared.ingest import block_id, new_upload_id
+from shared.model_cache import get_model_entry
+from shared.scoring_jobs import DONE, FAILED, SCORING, default_output_name, write_job_status
+from shared.storage import get_sync_blob_service
+
+# Rows parsed and predicted per pandas chunk
+DEFAULT_CHUNK_ROWS = int(os.getenv("SCORING_CHUNK_ROWS", "50000"))
+# Predictions are buffered until this many bytes before a block is staged
+BLOCK_SIZE = 4 * 1024 * 1024
+
+
+class BlobChunkReader(io.RawIOBase):
+    """Read-only file object over the chunks of a blob download."""
+
+    def __init__(self, chunks: Iterator[bytes]):
+        self._chunks = chunks
+        self._buffer = b""
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        while not self._buffer:
+            try:
+                self._buffer = next(self._chunks)
+            except StopIteration:
+                return 0
+        n = min(len(b), len(self._buffer))
+        b[:n] = self._buffer[:n]
+        self._buffer = self._buffer[n:]
+        return n
+
+
+def predict_frame(df: pd.DataFrame, model: Any, scaler: Any, columns: Optional[List[str]] = None) -> pd.Series:
+    """
+    Predict every row of a chunk that has all model features.
+
+    Args:
+        df (pd.DataFrame): Chunk of input rows
+        model: Compiled forest or fitted classifier
+        scaler: Fitted scaler, None with a compiled forest
+        columns (Optional[List[str]]): Model features in order, defaults to the scaler's
+
+    Returns:
+        pd.Series: Predictions aligned with df, missing for rows with invalid features
+    """
+    columns = columns or list(getattr(scaler, "feature_names_in_", df.columns.drop("quality", errors="ignore")))
+    X = df.reindex(columns=columns).apply(pd.to_numeric, errors="coerce")
+    valid = X.notna().all(axis=1)
+
+    predictions = pd.Series(pd.NA, index=df.index, dtype="Int64")
+    if valid.any():
+        predictions[valid] = predict_features(model, scaler, X[valid])
+    return predictions
+
+
+def score_blob(wine_type: str,
+               source_container: str,
+               blob_name: str,
+               dest_container: str = "predictions",
+               dest_blob: Optional[str] = None,
+               chunk_rows: int = DEFAULT_CHUNK_ROWS,
+               blob_service: Optional[BlobServiceClient] = None) -> Dict[str, Any]:
+    """
+    Score a ';' separated CSV blob with the production model without loading it all in memory.
+
+    The source blob is downloaded chunk by chunk and parsed with
+    pd.read_csv(chunksize=...). Each chunk is predicted and the output rows are
+    staged as blocks of the destination block blob, which is committed at the
+    end, so peak memory depends on the chunk size and not on the file size.
+
+    Args:
+        wine_type (str): Type of wine ('red' or 'white')
+        source_container (str): Container holding the input CSV
+        blob_name (str): Name of the input CSV blob
+        dest_container (str): Container receiving the predictions
+        dest_blob (Optional[str]): Output blob name, defaults to 'scored_{blob_name}'
+        chunk_rows (int): Rows per parsed chunk
+        blob_service (Optional[BlobServiceClient]): Client to reuse
+
+    Returns:
+        Dict[str, Any]: Summary with rows scored, rows skipped and the output location
+    """
+    blob_service = blob_service or get_sync_blob_service()
+    dest_blob = dest_blob or default_output_name(blob_name)
+
+    entry = get_model_entry(wine_type)
+
+    source = blob_service.get_blob_client(container=source_container, blob=blob_name)
+    target = blob_service.get_blob_client(container=dest_container, blob=dest_blob)
+
+    reader = io.BufferedReader(BlobChunkReader(source.download_blob().chunks()), buffer_size=BLOCK_SIZE)
+
+    # A re-enqueued job may write the same output concurrently: its blocks must not replace ours
+    upload_id = new_upload_id()
+    block_ids: List[BlobBlock] = []
+    pending: List[bytes] = []
+    pending_size = 0
+    rows = skipped = 0
+
+    def stage(data: bytes) -> None:
+        staged_id = block_id(upload_id, len(block_ids))
+        target.stage_block(staged_id, data)
+        block_ids.append(BlobBlock(block_id=staged_id))
+
+    for chunk in pd.read_csv(reader, sep=";", chunksize=chunk_rows):
+        chunk["prediction"] = predict_frame(chunk, entry.predictor, entry.scaler, list(entry.schema.names))
+        rows += len(chunk)
+        skipped += int(chunk["prediction"].isna().sum())
+
+        # Only the first block carries the CSV header
+        data = chunk.to_csv(sep=";", index=False, header=not block_ids and not pending).encode()
+        pending.append(data)
+        pending_size += len(data)
+        if pending_size >= BLOCK_SIZE:
+            stage(b"".join(pending))
+            pending, pending_size = [], 0
+
+    if pending:
+        stage(b"".join(pending))
+
+    target.commit_block_list(
+        block_ids,
+        content_settings=ContentSettings(content_type='text/csv', content_encoding='utf-8')
+    )
+
+    logging.info(f"Scored {rows} rows of {source_container}/{blob_name} into {dest_container}/{dest_blob}")
+    return {
+        "rows": rows,
+        "skipped": skipped,
+        "blocks": len(block_ids),
+        "output": f"{dest_container}/{dest_blob}"
+    }
+
+
+def run_scoring_job(job: Dict[str, Any], blob_service: Optional[BlobServiceClient] = None) -> Dict[str, Any]:
+    """
+    Run a scoring job enqueued by score_function, recording its progress in its status document.
+
+    Args:
+        job (Dict[str, Any]): wine_type, container and blob of the input, dest_container and dest_blob of the output
+        blob_service (Optional[BlobServiceClient]): Client to reuse
+
+    Returns:
+        Dict[str, Any]: Summary returned by score_blob
+    """
+    blob_service = blob_service or get_sync_blob_service()
+    write_job_status(blob_service, job, SCORING)
+    try:
+        result = score_blob(
+            job["wine_type"],
+            job["container"],
+            job["blob"],
+            dest_container=job["dest_container"],
+            dest_blob=job["dest_blob"],
+            blob_service=blob_service
+        )
+    except Exception as e:
+        # Re-raised so the queue retries the job
+        write_job_status(blob_service, job, FAILED, error=str(e))
+        raise
+    write_job_status(blob_service, job, DONE, result=result)
+    return result
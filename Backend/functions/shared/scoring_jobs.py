@@ -0,0 +1,102 @@
+import json
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from azure.core.exceptions import ResourceNotFoundError
+
+# Container receiving the predictions when a request does not name one
+DEFAULT_DEST_CONTAINER = "predictions"
+# Containers a job may read from and write to; the endpoint is anonymous, so nothing else is reachable
+SOURCE_CONTAINERS = ("raw",)
+DEST_CONTAINERS = (DEFAULT_DEST_CONTAINER,)
+
+STATUS_SUFFIX = ".status.json"
+
+# Job states; 'done' and 'failed' are terminal
+QUEUED = "queued"
+SCORING = "scoring"
+DONE = "done"
+FAILED = "failed"
+
+
+def default_output_name(blob_name: str) -> str:
+    return f"scored_{blob_name.rsplit('/', 1)[-1]}"
+
+
+def job_status_blob_name(dest_blob: str) -> str:
+    """Name of the status document of a job, stored next to its output blob."""
+    return f"{dest_blob}{STATUS_SUFFIX}"
+
+
+def job_error(job: Dict[str, Any]) -> Optional[str]:
+    """
+    Check the blobs a job reads and writes against the allowed containers and names.
+
+    Args:
+        job (Dict[str, Any]): Job with container, blob, dest_container and dest_blob
+
+    Returns:
+        Optional[str]: Reason the job is rejected, None if it is allowed
+    """
+    if job.get("container") not in SOURCE_CONTAINERS:
+        return f"'container' must be one of: {', '.join(SOURCE_CONTAINERS)}"
+    if not job.get("blob"):
+        return "Missing 'blob' parameter"
+    if job.get("dest_container") not in DEST_CONTAINERS:
+        return f"'dest_container' must be one of: {', '.join(DEST_CONTAINERS)}"
+    return output_name_error(job.get("dest_blob") or "")
+
+
+def output_name_error(dest_blob: str) -> Optional[str]:
+    """Reason an output blob name is rejected: it must be a plain file name, not a path or a status document."""
+    if not dest_blob or dest_blob.startswith("."):
+        return "Invalid 'dest_blob'"
+    if "/" in dest_blob or "\\" in dest_blob:
+        return "'dest_blob' must not contain '/' or '\\'"
+    if dest_blob.endswith(STATUS_SUFFIX):
+        return f"'dest_blob' must not end with {STATUS_SUFFIX}"
+    return None
+
+
+def write_job_status(blob_service, job: Dict[str, Any], status: str, **details: Any) -> Dict[str, Any]:
+    """
+    Record the state of a scoring job in its status document.
+
+    Args:
+        blob_service: Sync client to access blob storage
+        job (Dict[str, Any]): Job as enqueued by score_function, with its source and output blobs
+        status (str): New state
+        **details: Extra fields stored with the state (e.g. the scoring summary or an error)
+
+    Returns:
+        Dict[str, Any]: The document written
+    """
+    document = {
+        **job,
+        "status": status,
+        "updated_at": datetime.now(timezone.utc).isoformat(),
+        **{k: v for k, v in details.items() if v is not None}
+    }
+    blob_client = blob_service.get_blob_client(container=job["dest_container"],
+                                               blob=job_status_blob_name(job["dest_blob"]))
+    blob_client.upload_blob(json.dumps(document).encode(), overwrite=True)
+    return document
+
+
+def read_job_status(blob_service, dest_container: str, dest_blob: str) -> Optional[Dict[str, Any]]:
+    """
+    Read the status document of the job writing an output blob.
+
+    Args:
+        blob_service: Sync client to access blob storage
+        dest_container (str): Container of the output blob
+        dest_blob (str): Output blob of the job
+
+    Returns:
+        Optional[Dict[str, Any]]: The document, or None if no job wrote this output
+    """
+    blob_client = blob_service.get_blob_client(container=dest_container, blob=job_status_blob_name(dest_blob))
+    try:
+        return json.loads(blob_client.download_blob().readall())
+    except ResourceNotFoundError:
+        return None
@@ -0,0 +1,78 @@
+import json
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from azure.core.exceptions import ResourceNotFoundError
+
+STATUS_CONTAINER = "models"
+
+# Training states, in pipeline order; 'ready' and 'failed' are terminal
+QUEUED = "queued"
+PREPROCESSING = "preprocessing"
+TRAINING = "training"
+VALIDATING = "validating"
+READY = "ready"
+FAILED = "failed"
+
+# Transitions kept in the document for troubleshooting
+HISTORY_LIMIT = 20
+
+
+def status_blob_name(wine_type: str) -> str:
+    return f"status_{wine_type}.json"
+
+
+async def read_status(blob_service, wine_type: str) -> Optional[Dict[str, Any]]:
+    """
+    Read the status document of a wine type.
+
+    Args:
+        blob_service: Async client to access blob storage
+        wine_type (str): Type of wine ('red' or 'white')
+
+    Returns:
+        Optional[Dict[str, Any]]: The document, or None if no status was written yet
+    """
+    blob_client = blob_service.get_blob_client(container=STATUS_CONTAINER, blob=status_blob_name(wine_type))
+    try:
+        stream = await blob_client.download_blob()
+        return json.loads(await stream.readall())
+    except ResourceNotFoundError:
+        return None
+
+
+async def write_status(blob_service, wine_type: str, status: str, **details: Any) -> Dict[str, Any]:
+    """
+    Record a training state transition in the status document of a wine type.
+
+    Failures are logged and never interrupt the pipeline reporting them.
+
+    Args:
+        blob_service: Async client to access blob storage
+        wine_type (str): Type of wine ('red' or 'white')
+        status (str): New state
+        **details: Extra fields stored with the state (e.g. metrics, error)
+
+    Returns:
+        Dict[str, Any]: The document written
+    """
+    now = datetime.now(timezone.utc).isoformat()
+    document: Dict[str, Any] = {"wine_type": wine_type, "status": status, "updated_at": now}
+    try:
+        previous = await read_status(blob_service, wine_type) or {}
+        history = previous.get("history", [])
+        history.append({"status": status, "at": now})
+
+        document.update({k: v for k, v in details.items() if v is not None})
+        # Metrics of the last trained model stay visible while the next one is in progress
+        if "metrics" not in document and previous.get("metrics"):
+            document["metrics"] = previous["metrics"]
+        document["history"] = history[-HISTORY_LIMIT:]
+
+        blob_client = blob_service.get_blob_client(container=STATUS_CONTAINER, blob=status_blob_name(wine_type))
+        await blob_client.upload_blob(json.dumps(document).encode(), overwrite=True)
+        logging.info(f"Status of {wine_type} model set to {status}")
+    except Exception as e:
+        logging.error(f"Error writing status {status} for {wine_type} model: {str(e)}")
+    return document
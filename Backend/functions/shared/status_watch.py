@@ -0,0 +1,122 @@
+import asyncio
+import json
+import logging
+import os
+from typing import Any, Dict, Optional
+
+from azure.core.exceptions import ResourceNotFoundError
+
+from shared.status import STATUS_CONTAINER, status_blob_name
+from shared.storage import get_blob_service
+
+# Seconds between two checks of the status documents while requests are waiting
+WATCH_INTERVAL = float(os.getenv("STATUS_WATCH_INTERVAL", "1"))
+
+
+def status_version(document: Optional[Dict[str, Any]]) -> Optional[str]:
+    """Version clients pass back as 'since' (or Last-Event-ID) to wait for the next change."""
+    return document.get("updated_at") if document else None
+
+
+class StatusWatcher:
+    """
+    Single shared poller of the status documents of one worker.
+
+    While at least one request is waiting, one background task checks the
+    ETag of each watched document every WATCH_INTERVAL seconds, downloads it
+    only when it changed and wakes up the waiting requests. Storage traffic
+    therefore depends on the number of wine types, not on the number of
+    clients.
+    """
+
+    def __init__(self, interval: float = WATCH_INTERVAL):
+        self.interval = interval
+        self._documents: Dict[str, Optional[Dict[str, Any]]] = {}
+        self._etags: Dict[str, Optional[str]] = {}
+        self._conditions: Dict[str, asyncio.Condition] = {}
+        self._waiters = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def _refresh(self, wine_type: str) -> None:
+        blob_client = get_blob_service().get_blob_client(container=STATUS_CONTAINER,
+                                                         blob=status_blob_name(wine_type))
+        try:
+            properties = await blob_client.get_blob_properties()
+            if wine_type in self._documents and properties.etag == self._etags.get(wine_type):
+                return
+            stream = await blob_client.download_blob()
+            document = json.loads(await stream.readall())
+            etag = properties.etag
+        except ResourceNotFoundError:
+            document, etag = None, None
+
+        changed = status_version(document) != status_version(self._documents.get(wine_type))
+        self._documents[wine_type] = document
+        self._etags[wine_type] = etag
+        if changed:
+            condition = self._conditions.setdefault(wine_type, asyncio.Condition())
+            async with condition:
+                condition.notify_all()
+
+    async def _run(self) -> None:
+        while self._waiters > 0:
+            for wine_type in list(self._conditions):
+                try:
+                    await self._refresh(wine_type)
+                except Exception as e:
+                    logging.warning(f"Status watcher failed to refresh {wine_type}: {str(e)}")
+            await asyncio.sleep(self.interval)
+        self._task = None
+
+    def _polling(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def _ensure_running(self) -> None:
+        if not self._polling():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def wait_for_change(self, wine_type: str, since: Optional[str], timeout: float) -> Optional[Dict[str, Any]]:
+        """
+        Return the status document once its version differs from 'since', or after timeout.
+
+        Args:
+            wine_type (str): Type of wine ('red' or 'white')
+            since (Optional[str]): Version the client already has, None to return immediately
+            timeout (float): Maximum seconds to wait
+
+        Returns:
+            Optional[Dict[str, Any]]: Current document, or None if none was written yet
+        """
+        condition = self._conditions.setdefault(wine_type, asyncio.Condition())
+        # Documents are only kept current while the poller runs; otherwise check the ETag now
+        if wine_type not in self._documents or not self._polling():
+            await self._refresh(wine_type)
+
+        if since is None or status_version(self._documents.get(wine_type)) != since:
+            return self._documents.get(wine_type)
+
+        self._waiters += 1
+        self._ensure_running()
+        try:
+            async with condition:
+                await asyncio.wait_for(
+                    condition.wait_for(lambda: status_version(self._documents.get(wine_type)) != since),
+                    timeout
+                )
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            self._waiters -= 1
+        return self._documents.get(wine_type)
+
+
+# One watcher per event loop, like the storage client it uses
+_watchers: Dict[int, StatusWatcher] = {}
+
+
+def get_watcher() -> StatusWatcher:
+    loop_id = id(asyncio.get_running_loop())
+    watcher = _watchers.get(loop_id)
+    if watcher is None:
+        watcher = _watchers[loop_id] = StatusWatcher()
+    return watcher
@@ -0,0 +1,166 @@
+import asyncio
+import logging
+import os
+import threading
+from typing import Dict
+
+import aiohttp
+from azure.core.pipeline.transport import AioHttpTransport
+from azure.storage.blob.aio import BlobServiceClient, ExponentialRetry
+
+from shared.metrics import register_collector
+
+# Connection pool limits shared by all functions of a worker
+POOL_SIZE = int(os.getenv("STORAGE_POOL_SIZE", "32"))
+KEEPALIVE_SECONDS = float(os.getenv("STORAGE_KEEPALIVE_SECONDS", "60"))
+# Retry policy for transient storage errors
+RETRY_TOTAL = int(os.getenv("STORAGE_RETRY_TOTAL", "3"))
+RETRY_INITIAL_BACKOFF = int(os.getenv("STORAGE_RETRY_INITIAL_BACKOFF", "1"))
+RETRY_INCREMENT_BASE = int(os.getenv("STORAGE_RETRY_INCREMENT_BASE", "2"))
+CONNECTION_TIMEOUT = int(os.getenv("STORAGE_CONNECTION_TIMEOUT", "10"))
+
+# One async client per event loop: aio clients cannot be shared across loops
+_clients: Dict[int, BlobServiceClient] = {}
+# The blocking client and its requests session are built on first use only
+_sync_client = None
+_sync_session = None
+_sync_lock = threading.Lock()
+
+_counters = {"async_requests": 0, "async_connections_created": 0, "async_connections_reused": 0, "sync_requests": 0}
+_counters_lock = threading.Lock()
+
+
+def _count(name: str) -> None:
+    with _counters_lock:
+        _counters[name] += 1
+
+
+def _retry_policy(cls):
+    return cls(
+        initial_backoff=RETRY_INITIAL_BACKOFF,
+        increment_base=RETRY_INCREMENT_BASE,
+        retry_total=RETRY_TOTAL,
+        random_jitter_range=1
+    )
+
+
+def _trace_config() -> aiohttp.TraceConfig:
+    trace_config = aiohttp.TraceConfig()
+
+    async def on_request_start(session, context, params):
+        _count("async_requests")
+
+    async def on_connection_create_end(session, context, params):
+        _count("async_connections_created")
+
+    async def on_connection_reuseconn(session, context, params):
+        _count("async_connections_reused")
+
+    trace_config.on_request_start.append(on_request_start)
+    trace_config.on_connection_create_end.append(on_connection_create_end)
+    trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+    return trace_config
+
+
+def _counting_adapter(**kwargs):
+    """HTTPAdapter of the sync session, counting the requests it sends."""
+    from requests.adapters import HTTPAdapter
+
+    class CountingAdapter(HTTPAdapter):
+        def send(self, request, **send_kwargs):
+            _count("sync_requests")
+            return super().send(request, **send_kwargs)
+
+    return CountingAdapter(**kwargs)
+
+
+def _sync_connections(session) -> int:
+    # urllib3 does not count connections through a stable API: read the pools defensively
+    connections = 0
+    try:
+        for adapter in set(session.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in list(pools.keys()):
+                connections += getattr(pools[key], "num_connections", 0)
+    except Exception as e:
+        logging.debug(f"Sync connection count unavailable: {str(e)}")
+        return 0
+    return connections
+
+
+def get_blob_service() -> BlobServiceClient:
+    """
+    Return the process-wide async blob service client for the running event loop.
+
+    The client is created on first use and kept open, so its pooled
+    keep-alive connections are reused across invocations instead of paying
+    a new TLS handshake per request.
+
+    Returns:
+        BlobServiceClient: Shared async client
+    """
+    loop_id = id(asyncio.get_running_loop())
+    client = _clients.get(loop_id)
+    if client is None:
+        connector = aiohttp.TCPConnector(limit=POOL_SIZE, limit_per_host=POOL_SIZE,
+                                         keepalive_timeout=KEEPALIVE_SECONDS)
+        session = aiohttp.ClientSession(connector=connector, trace_configs=[_trace_config()])
+        client = BlobServiceClient.from_connection_string(
+            os.environ["AzureWebJobsStorage"],
+            transport=AioHttpTransport(session=session, session_owner=False),
+            retry_policy=_retry_policy(ExponentialRetry),
+            connection_timeout=CONNECTION_TIMEOUT
+        )
+        _clients[loop_id] = client
+    return client
+
+
+def get_sync_blob_service():
+    """
+    Return the process-wide blocking blob service client, for synchronous code paths.
+
+    Returns:
+        azure.storage.blob.BlobServiceClient: Shared sync client
+    """
+    global _sync_client, _sync_session
+    if _sync_client is None:
+        with _sync_lock:
+            if _sync_client is None:
+                import requests
+                from azure.core.pipeline.transport import RequestsTransport
+                from azure.storage.blob import BlobServiceClient as SyncBlobServiceClient
+                from azure.storage.blob import ExponentialRetry as SyncExponentialRetry
+
+                session = requests.Session()
+                adapter = _counting_adapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _sync_session = session
+                _sync_client = SyncBlobServiceClient.from_connection_string(
+                    os.environ["AzureWebJobsStorage"],
+                    transport=RequestsTransport(session=session, session_owner=False),
+                    retry_policy=_retry_policy(SyncExponentialRetry),
+                    connection_timeout=CONNECTION_TIMEOUT
+                )
+    return _sync_client
+
+
+def storage_stats() -> Dict[str, int]:
+    """
+    Return request and connection counters of the shared clients.
+
+    A low ratio of created connections to requests means keep-alive
+    connections are being reused.
+
+    Returns:
+        Dict[str, int]: Counters for the async and sync clients
+    """
+    with _counters_lock:
+        stats = dict(_counters)
+
+    stats["sync_connections_created"] = _sync_connections(_sync_session) if _sync_session is not None else 0
+    stats["async_clients"] = len(_clients)
+    return stats
+
+
+register_collector("storage", storage_stats)
@@ -1,11 +1,29 @@
+import asyncio
 import pandas as pd
-import joblib
 import io
 import os
-from typing import Dict
-from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
+from typing import Any, Dict, Optional, Tuple
 from azure.storage.blob.aio import BlobServiceClient
 import logging
+from shared.artifacts import load_artifact, load_compiled
+from shared.disk_cache import cached_blob_path_async
+from shared.incremental import MAX_ACCURACY_LOSS
+from shared.metrics import count, span
+from shared.model_store import (CANDIDATE, MODELS_CONTAINER, Pointer, PromotionConflict, promote, read_pointer,
+                                version_blob_name)
+
+TEST_CONTAINER = "test-data"
+
+# Minimum test set metrics of a model promoted to production
+THRESHOLDS = {
+    'accuracy': 0.70,
+    'precision': 0.60,
+    'recall': 0.70,
+    'f1': 0.65
+}
+
+def validation_blob_name(wine_type: str) -> str:
+    return f"test_{wine_type}.csv"
 
 def get_metrics(y_true: pd.Series, y_pred: pd.Series) -> Dict[str, float]:
     """
@@ -18,6 +36,8 @@ def get_metrics(y_true: pd.Series, y_pred: pd.Series) -> Dict[str, float]:
     Returns:
         Dictionary containing metrics
     """
+    from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
+
     return {
         'accuracy': accuracy_score(y_true, y_pred),
         'precision': precision_score(y_true, y_pred, average='weighted'),
@@ -25,90 +45,152 @@ def get_metrics(y_true: pd.Series, y_pred: pd.Series) -> Dict[str, float]:
         'f1': f1_score(y_true, y_pred, average='weighted')
     }
 
-async def validate_model(wine_type: str, blob_service: BlobServiceClient) -> bool:
+def score_model(model: Any, scaler: Any, manifest: Dict[str, Any],
+                df: pd.DataFrame) -> Tuple[Dict[str, float], Any, pd.DataFrame]:
     """
-    Validates the model and promotes it to production if it passes the evaluation.
-    
+    Predict the test data with a model; CPU-bound, callers run it in a thread.
+
+    Returns:
+        Tuple: Metrics, predictions and the unscaled features in the training column order
+    """
+    X = df.drop("quality", axis=1)
+    # Scale features with the scaler fitted at training time, in the training column order
+    if manifest.get("features"):
+        X = X[manifest["features"]]
+    with span("validate_phase", phase="predict"):
+        y_pred = model.predict(scaler.transform(X))
+    return get_metrics(df["quality"], y_pred), y_pred, X
+
+def compiled_matches(compiled: Any, X: pd.DataFrame, y_pred: Any) -> bool:
+    """True if the compiled forest predicts exactly what the model predicted."""
+    return bool((compiled.predict(X.to_numpy(dtype=float)) == y_pred).all())
+
+async def production_accuracy(wine_type: str, blob_service: BlobServiceClient, df: pd.DataFrame,
+                              current: Optional[Pointer]) -> float:
+    """
+    Accuracy of the production version `current` on the validation data, 0.0 when there is none.
+    """
+    if current is None:
+        return 0.0
+    prod_blob = blob_service.get_blob_client(container=MODELS_CONTAINER, blob=current.blob_name)
+    path = await cached_blob_path_async(prod_blob)
+    model, scaler, manifest = await asyncio.to_thread(load_artifact, path)
+    metrics, _, _ = await asyncio.to_thread(score_model, model, scaler, manifest, df)
+    return metrics["accuracy"]
+
+async def evaluate_model(wine_type: str, blob_service: BlobServiceClient, digest: str,
+                         compare_to_production: bool = False,
+                         production: Optional[Pointer] = None) -> Dict[str, Any]:
+    """
+    Evaluate a stored model version on the test data, without promoting it.
+
     Args:
         wine_type: Type of wine ('red' or 'white')
         blob_service: Client to access blob storage
-    
+        digest: Version to evaluate, see shared.model_store
+        compare_to_production: Also require the accuracy of the production model, less
+            MAX_ACCURACY_LOSS, as used for incrementally extended models
+        production: Production pointer the decision is based on, read here when not given
+
     Returns:
-        bool: True if validation succeeded, False otherwise
+        Dict[str, Any]: {'passed': bool, 'metrics': metrics on the test data}
     """
-    try:
-        logging.info(f"Starting validation for {wine_type} model")
-
-        # Download model and scaler using direct blob access
-        model_blob = blob_service.get_blob_client(container="models-testing", 
-                                                blob=f"model_{wine_type}-testing.pkl")
-        scaler_blob = blob_service.get_blob_client(container="models", 
-                                                 blob=f"scaler_{wine_type}.pkl")
-
-        # Download and load the model
-        blob_model_stream = await model_blob.download_blob()
-        model_data = await blob_model_stream.readall()
-        model = joblib.load(io.BytesIO(model_data))
-
-        # Download and load the scaler
-        blob_scaler_stream = await scaler_blob.download_blob()
-        scaler_data = await blob_scaler_stream.readall()
-        scaler = joblib.load(io.BytesIO(scaler_data))
-
-        # Load test data
-        test_blob = blob_service.get_blob_client(container="test-data", 
-                                               blob=f"test_{wine_type}.csv")
-        
+    logging.info(f"Starting validation for {wine_type} model {digest}")
+
+    # The model artifact packs the model with its scaler; read it through the
+    # local disk cache, shared with the inference paths
+    model_blob = blob_service.get_blob_client(container=MODELS_CONTAINER, blob=version_blob_name(wine_type, digest))
+    with span("validate_phase", phase="load"):
+        model_path = await cached_blob_path_async(model_blob)
+        model, scaler, manifest = await asyncio.to_thread(load_artifact, model_path)
+
+    # Load test data
+    with span("validate_phase", phase="test_data"):
+        test_blob = blob_service.get_blob_client(container=TEST_CONTAINER, blob=validation_blob_name(wine_type))
         test_stream = await test_blob.download_blob()
         test_data = await test_stream.readall()
-        df = pd.read_csv(io.BytesIO(test_data), sep=";")
+        df = await asyncio.to_thread(pd.read_csv, io.BytesIO(test_data), sep=";")
+    count("test_data_bytes", len(test_data))
 
-        X = df.drop("quality", axis=1)
-        y = df["quality"]
+    # Make predictions and evaluate
+    metrics, y_pred, X = await asyncio.to_thread(score_model, model, scaler, manifest, df)
 
-        # Preprocess test data by scaling features
-        X_scaled = scaler.fit_transform(X)
-        
-        # Make predictions and evaluate
-        y_pred = model.predict(X_scaled)
-        metrics = get_metrics(y, y_pred)
-        
-        # Log metrics
-        for metric_name, value in metrics.items():
-            logging.info(f"{wine_type} model {metric_name}: {value:.4f}")
-
-        # Define performance thresholds for validation
-        thresholds = {
-            'accuracy': 0.70,
-            'precision': 0.60,
-            'recall': 0.70,
-            'f1': 0.65
-        }
-        
-        validation_passed = all(
-            metrics[metric] >= threshold 
-            for metric, threshold in thresholds.items()
-        )
+    # The compiled forest serves production traffic: it must agree with the model on every row
+    compiled = await asyncio.to_thread(load_compiled, model_path)
+    if compiled is not None and not await asyncio.to_thread(compiled_matches, compiled, X, y_pred):
+        logging.warning(f"Compiled {wine_type} forest does not match the model predictions")
+        return {"passed": False, "metrics": metrics}
+
+    # Log metrics
+    for metric_name, value in metrics.items():
+        logging.info(f"{wine_type} model {metric_name}: {value:.4f}")
+
+    validation_passed = all(
+        metrics[metric] >= threshold
+        for metric, threshold in THRESHOLDS.items()
+    )
 
-        if validation_passed:
+    # An extended forest must not lose accuracy against the model it extends
+    if validation_passed and compare_to_production:
+        if production is None:
+            production = await read_pointer(blob_service.get_container_client(MODELS_CONTAINER), wine_type)
+        baseline = await production_accuracy(wine_type, blob_service, df, production)
+        logging.info(f"{wine_type} candidate accuracy {metrics['accuracy']:.4f}, production {baseline:.4f}")
+        validation_passed = metrics['accuracy'] >= baseline - MAX_ACCURACY_LOSS
+
+    return {"passed": validation_passed, "metrics": metrics}
+
+async def promote_version(wine_type: str, blob_service: BlobServiceClient, digest: str,
+                          expected: Optional[Pointer]) -> bool:
+    """
+    Move the production pointer to a validated version, conditional on it still being `expected`.
+
+    Returns:
+        bool: True if the version is in production
+    """
+    if expected is not None and expected.digest == digest:
+        logging.info(f"Model {wine_type} is already in production")
+        return True
+    try:
+        await promote(blob_service.get_container_client(MODELS_CONTAINER), wine_type, digest, expected=expected)
+    except PromotionConflict as e:
+        logging.warning(f"Model {wine_type} not promoted: {str(e)}")
+        return False
+    return True
+
+async def validate_model(wine_type: str, blob_service: BlobServiceClient,
+                         compare_to_production: bool = False) -> bool:
+    """
+    Validates the candidate model and promotes it to production if it passes the evaluation.
+
+    Promotion only moves the production pointer to the candidate version, on
+    the condition that it still names the model read here.
+    
+    Args:
+        wine_type: Type of wine ('red' or 'white')
+        blob_service: Client to access blob storage
+        compare_to_production: See evaluate_model
+    
+    Returns:
+        bool: True if validation succeeded, False otherwise
+    """
+    try:
+        # Resolve the candidate and production versions before deciding
+        models_container = blob_service.get_container_client(MODELS_CONTAINER)
+        candidate = await read_pointer(models_container, wine_type, CANDIDATE)
+        if candidate is None:
+            logging.warning(f"No candidate {wine_type} model to validate")
+            return False
+        current = await read_pointer(models_container, wine_type)
+
+        result = await evaluate_model(wine_type, blob_service, candidate.digest, compare_to_production, current)
+        if result["passed"]:
             logging.info(f"Validation successful for {wine_type} model")
-            
-            # Promote the model to production
-            prod_blob = blob_service.get_blob_client(container="models", 
-                                                   blob=f"model_{wine_type}.pkl")
-            
-            # Direct upload to production
-            await prod_blob.upload_blob(model_data, overwrite=True)
-            
-            # Delete the testing version
-            await model_blob.delete_blob()
-            
-            logging.info(f"Model {wine_type} promoted to production")
-            return True
+            return await promote_version(wine_type, blob_service, candidate.digest, current)
             
         logging.warning(f"Validation failed for {wine_type} model")
         return False
 
     except Exception as e:
         logging.error(f"Error validating {wine_type} model: {str(e)}")
-        return False
\ No newline at end of file
+        return False
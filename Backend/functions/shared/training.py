@@ -0,0 +1,667 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from io import BytesIO
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple, Union
+
+import pandas as pd
+from azure.core import MatchConditions
+from azure.core.exceptions import ResourceNotFoundError
+from azure.storage.blob.aio import BlobServiceClient
+
+from shared.artifacts import read_manifest
+from shared.dataset import RAW_CONTAINER, Partition, list_partitions, raw_blob_name
+from shared.dataset_stats import DatasetStats, stats_blob_name
+from shared.disk_cache import cached_blob_path_async
+from shared.incremental import (FULL, INCREMENTAL, MAX_ACCURACY_LOSS, FullRetrainRequired, TrainingPlan, plan_training,
+                                training_record)
+from shared.model_store import (CANDIDATE, MODELS_CONTAINER, Pointer, prune_versions, put_version, read_pointer,
+                                version_blob_name, write_pointer)
+from shared.model_search import SEARCH_MODE, search_space
+from shared.model_utils import extend_artifact, preprocess_data, train_artifact
+from shared.metrics import count, span
+from shared.out_of_core import train_bounded, use_bounded_mode
+from shared.pipeline import (INGEST, PREPROCESS, PROMOTE, STAGES, TRAIN, VALIDATE, CheckpointStore, StageResult,
+                             run_stage, stage_key)
+from shared.promote import trigger_merge_to_alpha
+from shared.status import FAILED, PREPROCESSING, READY, TRAINING, VALIDATING, write_status
+from shared.test.train_validate import (TEST_CONTAINER, THRESHOLDS, evaluate_model, promote_version,
+                                        validation_blob_name)
+
+# Name of the queue upload_function posts training jobs to
+TRAINING_QUEUE = "training-jobs"
+
+# Datasets trained by each run; every entry gets its own concurrent pipeline
+WINE_TYPES = ('red', 'white')
+
+# Outcome of a validated model, reported in the final status
+PROMOTED = "promoted"
+REJECTED = "rejected"
+CONFLICT = "conflict"
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _pool_size() -> int:
+    configured = os.getenv("TRAINING_WORKERS")
+    if configured:
+        return max(1, int(configured))
+    try:
+        return max(1, len(os.sched_getaffinity(0)))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """Return the process pool used for CPU-bound training work, creating it on first use."""
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(max_workers=_pool_size())
+    return _process_pool
+
+
+async def run_cpu_bound(fn: Callable, *args: Any) -> Any:
+    """
+    Run a CPU-bound function in the process pool so it does not compete for the GIL.
+
+    Args:
+        fn: Picklable module-level function
+        *args: Picklable arguments
+
+    Returns:
+        Any: Return value of fn
+    """
+    global _process_pool
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(get_process_pool(), fn, *args)
+    except BrokenProcessPool:
+        # A worker died (e.g. out of memory): drop the pool so the next call starts a fresh one
+        _process_pool = None
+        raise
+
+
+def parse_raw(contents: Sequence[bytes]) -> pd.DataFrame:
+    """Parse raw ';' separated CSVs (base dataset and partitions) into one frame."""
+    frames = [pd.read_csv(BytesIO(content), sep=";") for content in contents]
+    return frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+
+
+def parse_and_preprocess(contents: Union[bytes, Sequence[bytes]], wine_type: str,
+                         stats: Optional[DatasetStats] = None) -> Tuple[pd.DataFrame, bytes]:
+    """Parse raw ';' separated CSVs and preprocess them, in a single worker process call."""
+    df_raw = parse_raw([contents] if isinstance(contents, bytes) else contents)
+    return preprocess_data(df_raw, wine_type, stats=stats)
+
+
+def extend_from_partitions(production_path: str, contents: Sequence[bytes], wine_type: str,
+                           data_hash: str, base_etag: str, partitions: Sequence[str]) -> bytes:
+    """Parse new partitions and add their trees to the production model, in a single worker process call."""
+    return extend_artifact(production_path, parse_raw(contents), wine_type, data_hash, base_etag, partitions)
+
+
+def source_record_name(wine_type: str) -> str:
+    return f"source_{wine_type}.json"
+
+
+async def get_blob_stats(blob_service: BlobServiceClient, blob_name: str, etag: str) -> Optional[DatasetStats]:
+    """
+    Read the column statistics upload_function stored next to a raw blob.
+
+    Args:
+        blob_service: Client to access blob storage
+        blob_name (str): Raw blob (base dataset or partition) in the raw container
+        etag (str): ETag of the raw blob version being trained
+
+    Returns:
+        Optional[DatasetStats]: The statistics, or None if missing or computed for another version
+    """
+    stats_blob = blob_service.get_blob_client(container=RAW_CONTAINER, blob=stats_blob_name(blob_name))
+    try:
+        stream = await stats_blob.download_blob()
+        document = json.loads(await stream.readall())
+    except ResourceNotFoundError:
+        return None
+    except Exception as e:
+        logging.warning(f"Ignoring unreadable upload statistics of {blob_name}: {str(e)}")
+        return None
+    if document.get("etag") != etag:
+        return None
+    return DatasetStats.from_dict(document)
+
+
+async def get_dataset_stats(blob_service: BlobServiceClient, wine_type: str, etag: str,
+                            partitions: Sequence[Partition]) -> Optional[DatasetStats]:
+    """Merged statistics of the base dataset and its partitions, None unless all of them have some."""
+    parts = await asyncio.gather(
+        get_blob_stats(blob_service, raw_blob_name(wine_type), etag),
+        *(get_blob_stats(blob_service, p.name, p.etag) for p in partitions)
+    )
+    if any(stats is None for stats in parts):
+        return None
+    merged = parts[0]
+    for stats in parts[1:]:
+        merged = merged.merge(stats)
+    return merged
+
+
+async def get_trained_source(blob_service: BlobServiceClient, wine_type: str) -> Optional[dict]:
+    """
+    Read the record of the raw blob version the current model was trained from.
+
+    Args:
+        blob_service: Client to access blob storage
+        wine_type (str): Type of wine ('red' or 'white')
+
+    Returns:
+        Optional[dict]: The stored record, or None if no model was trained yet
+    """
+    record_blob = blob_service.get_blob_client(container="models-testing",
+                                               blob=source_record_name(wine_type))
+    try:
+        stream = await record_blob.download_blob()
+        return json.loads(await stream.readall())
+    except ResourceNotFoundError:
+        return None
+
+
+async def save_trained_source(blob_service: BlobServiceClient, wine_type: str, etag: str,
+                              partitions: Sequence[str] = ()) -> None:
+    record = {
+        "blob": f"raw/{raw_blob_name(wine_type)}",
+        "etag": etag,
+        "partitions": list(partitions),
+        "trained_at": datetime.now(timezone.utc).isoformat()
+    }
+    record_blob = blob_service.get_blob_client(container="models-testing",
+                                               blob=source_record_name(wine_type))
+    await record_blob.upload_blob(json.dumps(record).encode(), overwrite=True)
+
+
+async def get_production_artifact(blob_service: BlobServiceClient,
+                                  wine_type: str) -> Optional[Tuple[str, dict, str]]:
+    """
+    Local path, manifest and digest of the production artifact of a wine type, None if there is none.
+    """
+    current = await read_pointer(blob_service.get_container_client(MODELS_CONTAINER), wine_type)
+    if current is None:
+        return None
+    prod_blob = blob_service.get_blob_client(container=MODELS_CONTAINER, blob=current.blob_name)
+    path = await cached_blob_path_async(prod_blob)
+    return path, read_manifest(path), current.digest
+
+
+async def download_raw(blob_service: BlobServiceClient, blob_name: str, etag: str) -> bytes:
+    """Download the exact version of a raw blob whose ETag gets recorded."""
+    blob_client = blob_service.get_blob_client(container=RAW_CONTAINER, blob=blob_name)
+    blob_data = await blob_client.download_blob(etag=etag, match_condition=MatchConditions.IfNotModified)
+    content = await blob_data.readall()
+    count("raw_download_bytes", len(content))
+    return content
+
+
+def to_parquet_bytes(df: pd.DataFrame) -> bytes:
+    buffer = BytesIO()
+    df.to_parquet(buffer, index=False, compression="zstd")
+    return buffer.getvalue()
+
+
+async def save_cleaned(cleaned_container, df_cleaned: pd.DataFrame, wine_type: str) -> None:
+    """
+    Persist the cleaned dataset as Parquet in the 'cleaned' container.
+
+    This is a side output for inspection and reuse; training does not read it
+    back, so a failure is logged without stopping the pipeline.
+
+    Args:
+        cleaned_container: Client of the 'cleaned' container
+        df_cleaned (pd.DataFrame): Preprocessed DataFrame
+        wine_type (str): Type of wine ('red' or 'white')
+    """
+    try:
+        data = await asyncio.to_thread(to_parquet_bytes, df_cleaned)
+        cleaned_blob = cleaned_container.get_blob_client(f"cleaned_{wine_type}.parquet")
+        await cleaned_blob.upload_blob(data, overwrite=True)
+        logging.info(f"Cleaned dataset saved for {wine_type} wine ({len(data)} bytes)")
+    except Exception as e:
+        logging.error(f"Error saving cleaned dataset for {wine_type} wine: {str(e)}")
+
+
+@dataclass
+class PipelineRun:
+    """
+    One dataset version going through the training stages.
+
+    The version is the base blob and its partitions, pinned to their ETags.
+    Raw contents are downloaded at most once per run, and only when a stage
+    that needs them misses its checkpoint.
+    """
+    blob_service: Any
+    wine_type: str
+    etag: str
+    partitions: List[Partition] = field(default_factory=list)
+    base_size: int = 0
+    # Stages recomputed even when checkpointed
+    replay: Set[str] = field(default_factory=set)
+    checkpoints: CheckpointStore = field(init=False, repr=False)
+    _contents: Optional[List[bytes]] = field(default=None, init=False, repr=False)
+
+    def __post_init__(self):
+        self.checkpoints = CheckpointStore(self.blob_service)
+
+    @property
+    def blobs(self) -> List[Tuple[str, str]]:
+        """(raw blob name, ETag) of the base dataset and its partitions, in append order."""
+        return [(raw_blob_name(self.wine_type), self.etag)] + [(p.name, p.etag) for p in self.partitions]
+
+    @property
+    def size(self) -> int:
+        return self.base_size + sum(p.size for p in self.partitions)
+
+    async def raw_contents(self) -> List[bytes]:
+        if self._contents is None:
+            self._contents = list(await asyncio.gather(
+                *(download_raw(self.blob_service, name, etag) for name, etag in self.blobs)
+            ))
+        return self._contents
+
+    def stage(self, stage: str, inputs: Any, compute: Callable[[], Awaitable[Any]], **codec: Any) -> Awaitable[StageResult]:
+        return run_stage(self.checkpoints, self.wine_type, stage, inputs, compute, replay=stage in self.replay, **codec)
+
+    @classmethod
+    async def current(cls, blob_service: BlobServiceClient, wine_type: str) -> "PipelineRun":
+        """Run over the raw data as it is now."""
+        blob_client = blob_service.get_blob_client(container=RAW_CONTAINER, blob=raw_blob_name(wine_type))
+        properties = await blob_client.get_blob_properties()
+        partitions = await list_partitions(blob_service, wine_type)
+        return cls(blob_service, wine_type, properties.etag, partitions, properties.size)
+
+    @classmethod
+    async def from_ingest(cls, blob_service: BlobServiceClient, wine_type: str, key: str) -> "PipelineRun":
+        """Run over the dataset version recorded by an ingest checkpoint."""
+        data = await CheckpointStore(blob_service).load(wine_type, INGEST, key)
+        if data is None:
+            raise ValueError(f"No ingest checkpoint {key} for {wine_type} wine")
+        (_, etag, base_size), *partitions = json.loads(data)["blobs"]
+        return cls(blob_service, wine_type, etag, [Partition(*p) for p in partitions], base_size)
+
+
+def training_settings(bounded: bool) -> Dict[str, Any]:
+    """Settings a trained model depends on besides its data, part of the train checkpoint key."""
+    return {
+        "search": SEARCH_MODE,
+        "space": search_space() if SEARCH_MODE != "off" else None,
+        "bounded": bounded
+    }
+
+
+async def store_version(blob_service: BlobServiceClient, wine_type: str, artifact_bytes: bytes) -> Dict[str, Any]:
+    """Store a trained artifact as an immutable version; the train stage output."""
+    digest = await put_version(blob_service.get_container_client(MODELS_CONTAINER), wine_type, artifact_bytes)
+    return {"digest": digest, "metrics": read_manifest(artifact_bytes).get("metrics")}
+
+
+async def train_stage(run: PipelineRun, inputs: Any,
+                      compute: Callable[[], Awaitable[Dict[str, Any]]]) -> StageResult:
+    """Run a train stage; a checkpoint naming a version pruned since is recomputed."""
+    trained = await run.stage(TRAIN, inputs, compute)
+    if trained.cached:
+        version = run.blob_service.get_blob_client(container=MODELS_CONTAINER,
+                                                   blob=version_blob_name(run.wine_type, trained.value["digest"]))
+        if not await version.exists():
+            logging.info(f"Model version {trained.value['digest']} of {run.wine_type} wine was pruned, retraining")
+            trained = await run_stage(run.checkpoints, run.wine_type, TRAIN, inputs, compute, replay=True)
+    return trained
+
+
+async def ingest_stage(run: PipelineRun) -> StageResult:
+    """Pin the dataset version: the raw blobs and ETags every later stage reads."""
+    async def compute() -> Dict[str, Any]:
+        sizes = [run.base_size] + [p.size for p in run.partitions]
+        return {"blobs": [[name, etag, size] for (name, etag), size in zip(run.blobs, sizes)], "size": run.size}
+
+    return await run.stage(INGEST, run.blobs, compute)
+
+
+async def preprocess_stage(run: PipelineRun, ingested: StageResult) -> StageResult:
+    """Parse and standardize the raw data; output (cleaned frame, scaler bytes, SHA-256 of the raw data)."""
+    async def compute() -> Tuple[pd.DataFrame, bytes, str]:
+        contents = await run.raw_contents()
+        digest = hashlib.sha256()
+        for content in contents:
+            digest.update(content)
+
+        # Parsing and preprocessing run in a worker process
+        stats = await get_dataset_stats(run.blob_service, run.wine_type, run.etag, run.partitions)
+        df_cleaned, scaler_bytes = await run_cpu_bound(parse_and_preprocess, contents, run.wine_type, stats)
+
+        # The cleaned dataset is also persisted as Parquet for inspection
+        await save_cleaned(run.blob_service.get_container_client("cleaned"), df_cleaned, run.wine_type)
+        return df_cleaned, scaler_bytes, digest.hexdigest()
+
+    return await run.stage(PREPROCESS, {"ingest": ingested.key}, compute, encode=pickle.dumps, decode=pickle.loads)
+
+
+async def training_input(run: PipelineRun, ingested: StageResult) -> StageResult:
+    """Output the full train stage reads: the preprocessed data, or the ingest stage in memory-bounded mode."""
+    if use_bounded_mode(run.size):
+        return ingested
+    return await preprocess_stage(run, ingested)
+
+
+async def train_full_stage(run: PipelineRun, upstream: StageResult) -> StageResult:
+    """Train a model from scratch and store it; output {'digest', 'metrics'}."""
+    bounded = upstream.stage == INGEST
+    training = training_record(run.etag, [p.name for p in run.partitions], 0)
+
+    async def compute() -> Dict[str, Any]:
+        if bounded:
+            # Large datasets are streamed by the worker into a float32 buffer instead of being downloaded here
+            logging.info(f"Training {run.wine_type} wine in memory-bounded mode ({run.size} bytes of raw data)")
+            blobs = [(RAW_CONTAINER, name, etag) for name, etag in run.blobs]
+            stats = await get_dataset_stats(run.blob_service, run.wine_type, run.etag, run.partitions)
+            artifact_bytes = await run_cpu_bound(train_bounded, blobs, run.wine_type, training, run.size, stats)
+        else:
+            # The scaler is packed with the model, so both are promoted together
+            df_cleaned, scaler_bytes, data_hash = upstream.value
+            training["rows"] = len(df_cleaned)
+            artifact_bytes = await run_cpu_bound(train_artifact, df_cleaned, scaler_bytes, run.wine_type,
+                                                 data_hash, training)
+        return await store_version(run.blob_service, run.wine_type, artifact_bytes)
+
+    inputs = {"upstream": upstream.key, "mode": FULL, "settings": training_settings(bounded)}
+    return await train_stage(run, inputs, compute)
+
+
+async def train_incremental_stage(run: PipelineRun, plan: TrainingPlan,
+                                  production: Tuple[str, dict, str]) -> StageResult:
+    """Add trees for the new partitions to the production model and store it; output {'digest', 'metrics'}."""
+    production_path, manifest, production_digest = production
+    new_names = set(plan.new_partitions)
+    new = [p for p in run.partitions if p.name in new_names]
+
+    async def compute() -> Dict[str, Any]:
+        contents = await asyncio.gather(*(download_raw(run.blob_service, p.name, p.etag) for p in new))
+
+        # Chain the hash of the extended data onto the hash of the data the model already covers
+        digest = hashlib.sha256((manifest.get("data_hash") or "").encode())
+        for content in contents:
+            digest.update(content)
+
+        artifact_bytes = await run_cpu_bound(extend_from_partitions, production_path, list(contents), run.wine_type,
+                                             digest.hexdigest(), run.etag, [p.name for p in run.partitions])
+        return await store_version(run.blob_service, run.wine_type, artifact_bytes)
+
+    inputs = {
+        "production": production_digest,
+        "base_etag": run.etag,
+        "partitions": [(p.name, p.etag) for p in run.partitions],
+        "mode": INCREMENTAL,
+        "settings": training_settings(False)
+    }
+    return await train_stage(run, inputs, compute)
+
+
+async def validate_stage(run: PipelineRun, trained: StageResult, mode: str,
+                         current: Optional[Pointer]) -> StageResult:
+    """
+    Evaluate a trained version on the test data; output {'passed', 'metrics'}.
+
+    `current` is the production pointer read before validation; promote_stage
+    only moves the pointer if it is still the same.
+    """
+    test_blob = run.blob_service.get_blob_client(container=TEST_CONTAINER, blob=validation_blob_name(run.wine_type))
+    test_etag = (await test_blob.get_blob_properties()).etag
+    compare_to_production = mode == INCREMENTAL
+
+    # Extended forests are compared to the production model, which is then an input too
+    production = None
+    if compare_to_production:
+        production = current.digest if current else None
+
+    inputs = {
+        "digest": trained.value["digest"],
+        "test_data": test_etag,
+        "thresholds": THRESHOLDS,
+        "production": production,
+        "max_accuracy_loss": MAX_ACCURACY_LOSS if compare_to_production else None
+    }
+    return await run.stage(VALIDATE, inputs, lambda: evaluate_model(run.wine_type, run.blob_service,
+                                                                    trained.value["digest"], compare_to_production,
+                                                                    current))
+
+
+async def current_pointer(run: PipelineRun) -> Optional[Pointer]:
+    """Production pointer a validation decision is based on."""
+    return await read_pointer(run.blob_service.get_container_client(MODELS_CONTAINER), run.wine_type)
+
+
+async def promote_stage(run: PipelineRun, trained: StageResult, validated: StageResult,
+                        expected: Optional[Pointer]) -> StageResult:
+    """
+    Point production at a validated version; output {'digest', 'promoted'}.
+
+    The write is conditional on the pointer still being `expected`, the one
+    validation was based on: a promotion or rollback in between is never
+    overwritten. Not checkpointed: the production pointer is the state of
+    this stage, and promoting the version already in production is a no-op.
+    """
+    digest = trained.value["digest"]
+    promoted = False
+    if validated.value["passed"]:
+        promoted = await promote_version(run.wine_type, run.blob_service, digest, expected)
+    return StageResult(PROMOTE, stage_key(PROMOTE, digest), {"digest": digest, "promoted": promoted})
+
+
+async def run_single_stage(run: PipelineRun, stage: str) -> StageResult:
+    """
+    Run one stage of a full retrain, reusing or computing the checkpoints of the stages before it.
+
+    Args:
+        run (PipelineRun): Dataset version and stages to replay
+        stage (str): Stage name, see shared.pipeline.STAGES
+
+    Returns:
+        StageResult: Output of the stage
+    """
+    ingested = await ingest_stage(run)
+    if stage == INGEST:
+        return ingested
+    if stage == PREPROCESS:
+        return await preprocess_stage(run, ingested)
+    trained = await train_full_stage(run, await training_input(run, ingested))
+    if stage == TRAIN:
+        return trained
+    current = await current_pointer(run)
+    validated = await validate_stage(run, trained, FULL, current)
+    if stage == VALIDATE:
+        return validated
+    return await promote_stage(run, trained, validated, current)
+
+
+async def run_training(blob_service: BlobServiceClient, wine_type: str, force: bool = False) -> bool:
+    """
+    Preprocess, train and validate the model of one wine type if its raw data changed.
+
+    The raw data is the base blob plus its appended partitions. The ETag of
+    the base blob and the partitions a model was trained from are recorded
+    once the pipeline completes, and the next run is skipped while they are
+    unchanged. New partitions alone are added to the production forest when
+    the incremental policy allows it (see shared.incremental).
+
+    Every stage output is checkpointed under the key of its inputs (see
+    shared.pipeline): when a run fails, the next one resumes after the last
+    stage that completed instead of starting over from the download.
+
+    Args:
+        blob_service: Client to access blob storage
+        wine_type (str): Type of wine ('red' or 'white')
+        force (bool): Retrain from scratch even if the raw data did not change, ignoring checkpoints
+
+    Returns:
+        bool: True if the pipeline ran, False if it was skipped
+    """
+    blob_name = raw_blob_name(wine_type)
+    container_client = blob_service.get_container_client(RAW_CONTAINER)
+
+    # Load and preprocess raw data
+    blob_client = container_client.get_blob_client(blob_name)
+    if not await blob_client.exists():
+        logging.info(f"File {blob_name} not found, skipping...")
+        return False
+
+    # Skip the whole pipeline when the raw data is the one the model was trained from
+    properties = await blob_client.get_blob_properties()
+    partitions = await list_partitions(blob_service, wine_type)
+    trained_source = await get_trained_source(blob_service, wine_type)
+    if (not force and trained_source and trained_source.get("etag") == properties.etag
+            and trained_source.get("partitions", []) == [p.name for p in partitions]):
+        logging.info(f"Raw data for {wine_type} wine unchanged since last training, skipping...")
+        return False
+
+    logging.info(f"Processing {wine_type} wine dataset ({len(partitions)} appended partitions)")
+
+    run = PipelineRun(blob_service, wine_type, properties.etag, partitions, properties.size,
+                      replay=set(STAGES) if force else set())
+    try:
+        await _train_and_validate(run, force)
+    except Exception as e:
+        await write_status(blob_service, wine_type, FAILED, error=str(e))
+        raise
+
+    return True
+
+
+async def _train_and_validate(run: PipelineRun, force_full: bool = False) -> None:
+    names = [p.name for p in run.partitions]
+
+    # Only datasets with appended partitions can be trained incrementally
+    production = None
+    if run.partitions and not force_full:
+        production = await get_production_artifact(run.blob_service, run.wine_type)
+    plan = plan_training(run.etag, names, production[1] if production else None, force_full)
+    logging.info(f"Training plan for {run.wine_type} wine: {plan.mode} ({plan.reason})")
+
+    if plan.mode == INCREMENTAL:
+        try:
+            await write_status(run.blob_service, run.wine_type, TRAINING, source_etag=run.etag, mode=INCREMENTAL)
+            trained = await train_incremental_stage(run, plan, production)
+            if await _validate_and_report(run, trained, INCREMENTAL):
+                return
+            logging.info(f"Incremental {run.wine_type} wine model rejected, retraining from scratch")
+        except FullRetrainRequired as e:
+            logging.info(f"Full retrain of {run.wine_type} wine model required: {str(e)}")
+
+    await write_status(run.blob_service, run.wine_type, PREPROCESSING, source_etag=run.etag, mode=FULL)
+    upstream = await training_input(run, await ingest_stage(run))
+    logging.info(f"Data preprocessed for {run.wine_type} wine")
+
+    await write_status(run.blob_service, run.wine_type, TRAINING, source_etag=run.etag, mode=FULL)
+    trained = await train_full_stage(run, upstream)
+    await _validate_and_report(run, trained, FULL)
+
+
+async def _validate_and_report(run: PipelineRun, trained: StageResult, mode: str) -> bool:
+    blob_service, wine_type, etag = run.blob_service, run.wine_type, run.etag
+
+    # The stored version becomes the candidate, for inspection and manual promotion
+    models_container = blob_service.get_container_client(MODELS_CONTAINER)
+    candidate = await read_pointer(models_container, wine_type, CANDIDATE)
+    if candidate is None or candidate.digest != trained.value["digest"]:
+        await write_pointer(models_container, wine_type, trained.value["digest"], CANDIDATE, expected=candidate)
+
+    logging.info(f"Training completed for {wine_type} wine ({mode})")
+    metrics = trained.value.get("metrics")
+
+    # Validate the model and promote it if it meets criteria; extended forests are also compared to production.
+    # Errors propagate, so the next run retries from the checkpointed model.
+    await write_status(blob_service, wine_type, VALIDATING, source_etag=etag, metrics=metrics, mode=mode)
+    current = await current_pointer(run)
+    validated = await validate_stage(run, trained, mode, current)
+    passed = validated.value["passed"]
+    promoted = (await promote_stage(run, trained, validated, current)).value["promoted"]
+
+    # A rejected incremental model falls back to a full retrain, which records the source itself
+    if mode == INCREMENTAL and not passed:
+        return False
+
+    # Record the trained source so unchanged data is not retrained, whatever the validation outcome
+    await save_trained_source(blob_service, wine_type, etag, [p.name for p in run.partitions])
+
+    if promoted:
+        logging.info(f"Validation passed for {wine_type} wine model")
+        await _prune_versions(blob_service, wine_type)
+        await write_status(blob_service, wine_type, READY, source_etag=etag, metrics=metrics, mode=mode,
+                           outcome=PROMOTED)
+    elif passed:
+        # The model stays the candidate; retraining would not resolve a concurrent promotion
+        logging.warning(f"Validated {wine_type} wine model not promoted: production changed during the run")
+        await write_status(blob_service, wine_type, FAILED, source_etag=etag, metrics=metrics, mode=mode,
+                           outcome=CONFLICT, error="Model passed validation, but production changed during the "
+                                                   "run; it was kept as the candidate")
+    else:
+        logging.warning(f"Validation failed for {wine_type} wine model")
+        await write_status(blob_service, wine_type, FAILED, source_etag=etag, metrics=metrics, mode=mode,
+                           outcome=REJECTED, error="Model did not pass validation")
+    return passed
+
+
+async def _prune_versions(blob_service: BlobServiceClient, wine_type: str) -> None:
+    # Best effort: a failed cleanup leaves extra versions, the next promotion retries it
+    try:
+        await prune_versions(blob_service.get_container_client(MODELS_CONTAINER), wine_type)
+    except Exception as e:
+        logging.warning(f"Could not prune {wine_type} wine model versions: {str(e)}")
+
+
+async def run_all_training(blob_service: BlobServiceClient,
+                           wine_types: Iterable[str] = WINE_TYPES) -> Dict[str, bool]:
+    """
+    Run the pipelines of several datasets concurrently.
+
+    A failure in one pipeline is logged and does not affect the others.
+
+    Args:
+        blob_service: Client to access blob storage
+        wine_types: Datasets to train
+
+    Returns:
+        Dict[str, bool]: For each dataset, True if its pipeline ran to completion
+    """
+    wine_types = list(wine_types)
+    with span("training_run"):
+        results = await asyncio.gather(
+            *(run_training(blob_service, wine_type) for wine_type in wine_types),
+            return_exceptions=True
+        )
+
+    outcome = {}
+    for wine_type, result in zip(wine_types, results):
+        if isinstance(result, BaseException):
+            logging.error(f"Error processing {wine_type} wine dataset: {str(result)}")
+            outcome[wine_type] = False
+        else:
+            outcome[wine_type] = result
+    return outcome
+
+
+async def merge_if_both_in_production(blob_service: BlobServiceClient) -> None:
+    # Merge to alpha branch is performed only if both models are in production
+    try:
+        models_container = blob_service.get_container_client(MODELS_CONTAINER)
+        current = await asyncio.gather(*(read_pointer(models_container, wt) for wt in ("red", "white")))
+        if all(pointer is not None for pointer in current):
+            logging.info("Both models in prodoction — trigger merge to alpha")
+            trigger_merge_to_alpha()
+        else:
+            logging.info("Waiting: not both models are in production")
+    except Exception as e:
+        logging.error(f"Error while checking models in production: {str(e)}")
+
@@ -0,0 +1,67 @@
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import StandardScaler
+
+from shared.artifacts import build_manifest, content_digest, load_artifact, pack_artifact, read_manifest
+from shared.disk_cache import LOCK_SUFFIX, DiskCache
+from shared.feature_schema import FeatureSchema
+
+
+def test_artifact_roundtrip_through_local_cache(tmp_path):
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.normal(size=(80, 2)), columns=["alcohol", "pH"])
+    y = (X["alcohol"] > 0).astype(int) + 5
+    scaler = StandardScaler().fit(X)
+    model = RandomForestClassifier(n_estimators=10, random_state=0).fit(scaler.transform(X), y)
+
+    schema = FeatureSchema.from_training(scaler.transform(X), scaler)
+    manifest = build_manifest(model, scaler, "red", data_hash="abc", metrics={"accuracy": 0.9}, schema=schema)
+    data = pack_artifact(model, scaler, manifest)
+
+    assert read_manifest(data)["features"] == ["alcohol", "pH"]
+    assert read_manifest(data)["classes"] == [5, 6]
+    assert FeatureSchema.from_manifest(read_manifest(data)) == schema
+    # Packing the model again at another time gives the same content digest
+    assert content_digest(pack_artifact(model, scaler, {**manifest, "created_at": "later"})) == content_digest(data)
+
+    cache = DiskCache(str(tmp_path))
+    loaded_model, loaded_scaler, loaded_manifest = load_artifact(data, cache=cache)
+    assert loaded_manifest["data_hash"] == "abc"
+    assert cache.stats()["misses"] == 1
+    np.testing.assert_array_equal(loaded_model.predict(loaded_scaler.transform(X)),
+                                  model.predict(scaler.transform(X)))
+
+    # A second load reuses the unpacked file
+    load_artifact(data, cache=cache)
+    assert cache.stats() == {"hits": 1, "misses": 1, "evictions": 0}
+
+
+def test_disk_cache_creates_once_and_evicts_least_recently_used(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=250)
+    calls = []
+
+    def writer(content):
+        def create(tmp):
+            calls.append(content)
+            with open(tmp, "wb") as f:
+                f.write(content)
+        return create
+
+    first = cache.get_or_create("a@1", writer(b"a" * 100))
+    assert cache.get_or_create("a@1", writer(b"ignored")) == first
+    assert calls == [b"a" * 100]
+
+    cache.get_or_create("b@1", writer(b"b" * 100))
+    # Age "b" so it becomes the least recently used entry
+    os.utime(cache.path_for("b@1"), (time.time() - 60, time.time() - 60))
+    cache.get_or_create("c@1", writer(b"c" * 100))
+
+    assert not os.path.exists(cache.path_for("b@1"))
+    # Workers may still hold or wait on the lock of an evicted entry
+    assert os.path.exists(cache.path_for("b@1") + LOCK_SUFFIX)
+    assert os.path.exists(first)
+    assert cache.stats()["evictions"] == 1
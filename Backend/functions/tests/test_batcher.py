@@ -0,0 +1,62 @@
+import asyncio
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import StandardScaler
+
+from shared.batcher import MicroBatcher, ModelLoadError
+from shared.feature_schema import FeatureSchema, InvalidFeatures
+from shared.model_cache import ModelEntry
+
+FEATURES = ["fixed acidity", "volatile acidity", "alcohol"]
+
+
+def fit_model():
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.normal(size=(60, 3)), columns=FEATURES)
+    y = (X["alcohol"] > 0).astype(int) + 5
+    scaler = StandardScaler().fit(X)
+    model = RandomForestClassifier(n_estimators=5, random_state=0).fit(scaler.transform(X), y)
+    return model, scaler
+
+
+@pytest.mark.asyncio
+async def test_concurrent_rows_share_one_batch():
+    model, scaler = fit_model()
+    loads = []
+
+    async def loader(wine_type):
+        loads.append(wine_type)
+        return ModelEntry(model, scaler, {}, "test-batcher", 0.0, schema=FeatureSchema.from_names(FEATURES))
+
+    batcher = MicroBatcher(window_ms=20, max_size=64, loader=loader)
+    rows = [{"fixed acidity": 0.0, "volatile acidity": 0.0, "alcohol": a} for a in (-2.0, 2.0, -1.5, 1.5)]
+    bad = {"alcohol": "abc"}
+
+    results = await asyncio.gather(*(batcher.submit("red", r) for r in rows + [bad]), return_exceptions=True)
+
+    expected = model.predict(scaler.transform(pd.DataFrame(rows, columns=FEATURES)))
+    assert results[:4] == [int(p) for p in expected]
+    # The invalid row fails alone
+    assert isinstance(results[4], InvalidFeatures)
+    stats = batcher.stats()
+    assert stats["batches"] == 1 and stats["rows"] == 5
+    assert stats["batch_size_histogram"]["8"] == 1
+    assert loads == ["red"]
+
+
+@pytest.mark.asyncio
+async def test_full_batch_flushes_without_waiting_and_load_errors_propagate():
+    async def loader(wine_type):
+        raise RuntimeError("missing blob")
+
+    batcher = MicroBatcher(window_ms=10_000, max_size=2, loader=loader)
+    results = await asyncio.wait_for(
+        asyncio.gather(*(batcher.submit("white", {}) for _ in range(2)), return_exceptions=True), 1)
+
+    assert all(isinstance(r, ModelLoadError) for r in results)
+    # Batch tasks are referenced while they run, then released
+    await asyncio.sleep(0)
+    assert not batcher._tasks
@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import StandardScaler
+
+from shared.artifacts import build_manifest, load_compiled, pack_artifact
+from shared.compiled_forest import compile_forest
+
+
+def fit_model():
+    rng = np.random.default_rng(1)
+    # Features on very different scales, like the wine dataset
+    X = pd.DataFrame(rng.normal(size=(600, 4)) * [0.05, 3.0, 40.0, 1.0] + [0.5, 10.0, 120.0, 3.3],
+                     columns=["chlorides", "alcohol", "total sulfur dioxide", "pH"])
+    y = rng.integers(3, 9, len(X))
+    scaler = StandardScaler().fit(X)
+    model = RandomForestClassifier(n_estimators=30, random_state=0, class_weight="balanced").fit(scaler.transform(X), y)
+    return X, model, scaler
+
+
+def boundary_rows(X, forest):
+    # Rows sitting exactly on, just above and just below every folded threshold
+    splits = np.isfinite(forest.threshold)
+    rows = np.repeat(X.to_numpy()[:1], 3 * splits.sum(), axis=0)
+    for k, (feature, threshold) in enumerate(zip(forest.feature[splits], forest.threshold[splits])):
+        rows[3 * k, feature] = threshold
+        rows[3 * k + 1, feature] = np.nextafter(threshold, np.inf)
+        rows[3 * k + 2, feature] = np.nextafter(threshold, -np.inf)
+    return pd.DataFrame(rows, columns=X.columns)
+
+
+def test_compiled_forest_matches_sklearn_exactly():
+    X, model, scaler = fit_model()
+    forest = compile_forest(model, scaler)
+
+    for rows in (X, boundary_rows(X, forest)):
+        expected = model.predict_proba(scaler.transform(rows))
+        np.testing.assert_array_equal(forest.predict_proba(rows.to_numpy()), expected)
+        np.testing.assert_array_equal(forest.predict(rows.to_numpy()), model.predict(scaler.transform(rows)))
+
+
+def test_artifact_carries_compiled_forest():
+    X, model, scaler = fit_model()
+    data = pack_artifact(model, scaler, build_manifest(model, scaler, "red"))
+
+    forest = load_compiled(data)
+    np.testing.assert_array_equal(forest.predict(X.to_numpy()), model.predict(scaler.transform(X)))
+    assert load_compiled(pack_artifact(None, None, {})) is None
@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import StandardScaler
+
+from shared.dataset_stats import DatasetStats
+from shared.ingest import CsvStreamValidator
+from shared.model_utils import preprocess_data
+
+
+def make_frame(seed, rows):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "alcohol": rng.normal(10, 1, rows),
+        "pH": rng.normal(3.3, 0.2, rows),
+        "quality": rng.integers(3, 9, rows)
+    })
+
+
+def stats_of(df):
+    validator = CsvStreamValidator(required={"quality"})
+    validator.feed(df.to_csv(sep=";", index=False).encode())
+    validator.finish()
+    return validator.stats
+
+
+def test_upload_stats_build_the_scaler_preprocessing_would_fit():
+    df = make_frame(0, 500)
+    df.loc[[3, 7], "pH"] = np.nan
+    stats = stats_of(df)
+
+    assert stats.rows == 498 and stats.dropped_rows == 2
+    assert stats.columns["pH"].nulls == 2
+    assert sum(stats.classes.values()) == 498
+
+    complete = df.dropna()
+    expected = StandardScaler().fit(complete[["alcohol", "pH"]])
+    scaler = stats.to_scaler(["alcohol", "pH"])
+    np.testing.assert_allclose(scaler.mean_, expected.mean_, rtol=1e-12)
+    np.testing.assert_allclose(scaler.scale_, expected.scale_, rtol=1e-12)
+    assert stats.columns["alcohol"].minimum == complete["alcohol"].min()
+
+    fitted, _ = preprocess_data(df, "red")
+    from_stats, _ = preprocess_data(df, "red", stats=stats)
+    np.testing.assert_allclose(from_stats[["alcohol", "pH"]], fitted[["alcohol", "pH"]], atol=1e-12)
+
+
+def test_merged_stats_match_stats_of_concatenated_data():
+    first, second = make_frame(1, 300), make_frame(2, 700)
+
+    merged = DatasetStats.from_dict(stats_of(first).to_dict()).merge(stats_of(second))
+    whole = stats_of(pd.concat([first, second]))
+
+    assert merged.rows == whole.rows == 1000
+    assert merged.classes == whole.classes
+    for name in ("alcohol", "pH", "quality"):
+        a, b = merged.columns[name], whole.columns[name]
+        assert a.count == b.count
+        assert np.isclose(a.mean, b.mean, rtol=1e-12)
+        assert np.isclose(a.m2, b.m2, rtol=1e-10)
+        assert (a.minimum, a.maximum) == (b.minimum, b.maximum)
@@ -0,0 +1,41 @@
+import os
+
+import pytest
+
+from shared.import_profile import ENTRY_POINTS, import_report, profile_imports, total_import_ms
+
+# Cold import budget per entry point, including interpreter startup. Wall-clock
+# timings depend on the machine, so the budget test only runs when
+# IMPORT_BUDGET_SCALE is set (1 on a reference machine, more on slower ones).
+BUDGETS_MS = {
+    "infer_function": 1500,
+    "model_status": 1000,
+    "metrics_function": 1000,
+}
+DEFAULT_BUDGET_MS = 4000
+BUDGET_SCALE = float(os.getenv("IMPORT_BUDGET_SCALE", "1"))
+
+# Packages an entry point must not pull in at import time
+FORBIDDEN = {
+    "infer_function": {"sklearn", "pandas", "scipy", "joblib"},
+    "model_status": {"sklearn", "pandas", "scipy", "joblib", "numpy"},
+    "metrics_function": {"sklearn", "pandas", "scipy", "joblib", "numpy"},
+    "score_function": {"sklearn", "pandas", "scipy", "joblib", "numpy"},
+    "score_queue_function": {"sklearn", "scipy", "joblib"},
+}
+
+
+@pytest.mark.skipif("IMPORT_BUDGET_SCALE" not in os.environ, reason="set IMPORT_BUDGET_SCALE to check import budgets")
+@pytest.mark.parametrize("entry_point", ENTRY_POINTS)
+def test_entry_point_import_time_within_budget(entry_point):
+    costs = profile_imports(entry_point)
+    budget = BUDGETS_MS.get(entry_point, DEFAULT_BUDGET_MS) * BUDGET_SCALE
+
+    assert total_import_ms(costs) <= budget, import_report(entry_point)
+
+
+@pytest.mark.parametrize("entry_point", sorted(FORBIDDEN))
+def test_entry_point_does_not_import_heavy_packages(entry_point):
+    imported = {cost.module.split(".")[0] for cost in profile_imports(entry_point)}
+
+    assert not imported & FORBIDDEN[entry_point]
@@ -0,0 +1,69 @@
+import pickle
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from shared import incremental
+from shared.artifacts import load_artifact, read_manifest
+from shared.incremental import FULL, INCREMENTAL, FullRetrainRequired, class_weights, plan_training, training_record
+from shared.model_utils import extend_artifact, preprocess_data, train_artifact
+
+
+def make_raw(seed, rows):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({"alcohol": rng.normal(10, 1, rows), "pH": rng.normal(3.3, 0.2, rows)})
+    df["quality"] = np.where(df["alcohol"] > 10, 6, 5)
+    return df
+
+
+def test_plan_training_extends_only_a_model_of_the_same_base_and_partition_prefix(monkeypatch):
+    production = {"training": training_record("b1", ["p1"], rows=1000, full_trees=100)}
+
+    plan = plan_training("b1", ["p1", "p2", "p3"], production)
+    assert plan.mode == INCREMENTAL and plan.new_partitions == ["p2", "p3"]
+
+    assert plan_training("b2", ["p1", "p2"], production).mode == FULL
+    assert plan_training("b1", ["p2"], production).mode == FULL
+    assert plan_training("b1", ["p1", "p2"], None).mode == FULL
+    assert plan_training("b1", ["p1", "p2"], production, force_full=True).mode == FULL
+
+    monkeypatch.setattr(incremental, "MAX_ROUNDS", 2)
+    production["training"]["rounds"] = 2
+    assert "rounds" in plan_training("b1", ["p1", "p2"], production).reason
+
+
+def test_extend_artifact_adds_trees_and_keeps_the_scaler():
+    base = make_raw(0, 800)
+    df_cleaned, scaler_bytes = preprocess_data(base, "red")
+    artifact = train_artifact(df_cleaned, scaler_bytes, "red", "h0", training_record("b1", [], len(df_cleaned)))
+    assert read_manifest(artifact)["training"]["full_trees"] == 100
+    assert sum(read_manifest(artifact)["training"]["class_counts"].values()) == 800
+
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+        extended = extend_artifact(artifact, make_raw(1, 100), "red", "h1", "b1", ["p1"])
+    # New trees are weighted by the class counts of all the data, not with the 'balanced' preset
+    assert not [w for w in caught if "warm_start" in str(w.message)]
+
+    model, scaler, manifest = load_artifact(extended)
+    assert len(model.estimators_) > 100
+    assert manifest["training"]["mode"] == INCREMENTAL
+    assert manifest["training"]["rounds"] == 1
+    assert manifest["training"]["rows"] == 900
+    assert manifest["training"]["partitions"] == ["p1"]
+    assert sum(manifest["training"]["class_counts"].values()) == 900
+    assert model.class_weight == class_weights(manifest["training"]["class_counts"], model.classes_)
+    np.testing.assert_array_equal(scaler.mean_, pickle.loads(scaler_bytes).mean_)
+
+    # Too much new data relative to the model: retrain from scratch
+    with pytest.raises(FullRetrainRequired):
+        extend_artifact(artifact, make_raw(2, 800), "red", "h2", "b1", ["p1"])
+
+
+def test_class_weights_balance_the_recorded_counts():
+    assert class_weights({"5": 300, "6": 100}, [5, 6]) == {5: 400 / 600, 6: 2.0}
+    # Counts missing or not covering every class: unweighted trees
+    assert class_weights(None, [5, 6]) is None
+    assert class_weights({"5": 300}, [5, 6]) is None
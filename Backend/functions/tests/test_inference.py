@@ -0,0 +1,90 @@
+import json
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import StandardScaler
+
+from shared.feature_schema import FeatureSchema
+from shared.inference import parse_samples, predict_samples
+from shared.model_cache import ModelEntry
+from shared.prediction_cache import PredictionCache
+
+FEATURES = ["fixed acidity", "volatile acidity", "alcohol"]
+
+
+def make_loader():
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.normal(size=(60, 3)), columns=FEATURES)
+    y = (X["alcohol"] > 0).astype(int) + 5
+    scaler = StandardScaler().fit(X)
+    model = RandomForestClassifier(n_estimators=5, random_state=0).fit(scaler.transform(X), y)
+    schema = FeatureSchema.from_training(scaler.transform(X), scaler)
+    entry = ModelEntry(model, scaler, {}, "test-inference", 0.0, schema=schema)
+    models = {"red": entry, "white": entry}
+    return lambda wine_type: models[wine_type]
+
+
+def test_parse_samples_formats():
+    rows = [{"type": "red", "alcohol": 1.0}, {"type": "white", "alcohol": -1.0}]
+    as_json = json.dumps(rows).encode()
+    as_ndjson = "\n".join(json.dumps(r) for r in rows).encode()
+    as_csv = b"type;alcohol\nred;1.0\nwhite;-1.0\n"
+
+    assert parse_samples(as_json, "application/json") == rows
+    assert parse_samples(as_ndjson, "application/x-ndjson") == rows
+    assert parse_samples(as_csv, "text/csv") == rows
+    assert parse_samples(b'{"alcohol": 1}\nnot json\n', "application/x-ndjson")[1].startswith("Invalid JSON")
+
+
+def test_predict_samples_keeps_order_and_reports_row_errors():
+    loader = make_loader()
+    good = {"fixed acidity": 0.1, "volatile acidity": 0.2, "alcohol": 2.0}
+    rows = [
+        dict(good, type="white"),
+        {"type": "red", "alcohol": 1.0},
+        "Invalid JSON",
+        dict(good, type="rose"),
+        dict(good),
+    ]
+
+    results = predict_samples(rows, default_type="red", loader=loader)
+
+    assert results[0] == {"type": "white", "prediction": 6}
+    assert "fixed acidity" in results[1]["error"]
+    assert {"field": "volatile acidity", "code": "missing"} in results[1]["fields"]
+    assert results[2] == {"error": "Invalid JSON"}
+    assert "error" in results[3]
+    assert results[4] == {"type": "red", "prediction": 6}
+
+
+def test_predict_samples_decodes_by_name_and_checks_ranges():
+    loader = make_loader()
+    reordered = {"alcohol": 2.0, "volatile acidity": "0.2", "fixed acidity": 0.1}
+    out_of_range = {"alcohol": 1e6, "volatile acidity": 0.2, "fixed acidity": True}
+
+    results = predict_samples([reordered, out_of_range], default_type="red", loader=loader)
+
+    assert results[0] == {"type": "red", "prediction": 6}
+    codes = {e["field"]: e["code"] for e in results[1]["fields"]}
+    assert codes == {"alcohol": "out_of_range", "fixed acidity": "not_a_number"}
+
+
+def test_prediction_cache_serves_repeated_vectors_per_model_version():
+    loader = make_loader()
+    cache = PredictionCache(max_entries=2)
+    row = {"fixed acidity": 0.1, "volatile acidity": 0.2, "alcohol": 2.0}
+
+    first = predict_samples([row, dict(row)], default_type="red", loader=loader, cache=cache)
+    # Same vector with reordered keys and string values is a hit
+    again = predict_samples([{"alcohol": "2.0", "volatile acidity": 0.2, "fixed acidity": 0.1}],
+                            default_type="red", loader=loader, cache=cache)
+    assert again == first[:1]
+    assert cache.stats()["hits"] >= 1
+
+    predict_samples([dict(row, alcohol=a) for a in (-1.0, -2.0)], default_type="red", loader=loader, cache=cache)
+    assert cache.stats()["evictions"] == 1
+
+    # A new model version drops the old predictions
+    cache.invalidate("red", keep_version="v2")
+    assert cache.stats()["size"] == 0
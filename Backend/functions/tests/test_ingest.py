@@ -0,0 +1,114 @@
+import asyncio
+import io
+import threading
+
+import pytest
+
+from shared.ingest import REQUIRED_COLUMNS, CsvStreamValidator, InvalidUpload, stream_upload
+
+HEADER = ";".join(f'"{c}"' for c in REQUIRED_COLUMNS).encode() + b"\n"
+ROW = b"7.4;0.7;0;1.9;0.076;11;34;0.9978;3.51;0.56;9.4;5\n"
+
+
+class FakeBlockBlob:
+    def __init__(self):
+        self.staged = {}
+        self.committed = None
+        self.active = 0
+        self.max_active = 0
+        self.commits = []
+
+    async def stage_block(self, block_id, data):
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        await asyncio.sleep(0.01)
+        self.staged[block_id] = data
+        self.active -= 1
+
+    async def commit_block_list(self, block_list, content_settings=None):
+        self.committed = b"".join(self.staged[b.id] for b in block_list)
+        self.commits.append(self.committed)
+        return {"etag": "e1"}
+
+
+@pytest.mark.asyncio
+async def test_stream_upload_stages_blocks_in_parallel_and_commits_in_order():
+    content = HEADER + ROW * 200
+    blob = FakeBlockBlob()
+
+    result = await stream_upload(blob, io.BytesIO(content).read, CsvStreamValidator(),
+                                 block_size=100, concurrency=3)
+
+    assert blob.committed == content
+    assert result["etag"] == "e1"
+    assert result["blocks"] == len(blob.staged) > 3
+    assert 1 < blob.max_active <= 3
+
+
+@pytest.mark.asyncio
+async def test_concurrent_uploads_to_the_same_blob_keep_their_own_blocks():
+    blob = FakeBlockBlob()
+    first, second = HEADER + ROW * 100, HEADER + ROW.replace(b"9.4", b"9.9") * 100
+
+    await asyncio.gather(*(stream_upload(blob, io.BytesIO(content).read, block_size=100) for content in (first, second)))
+
+    assert sorted(blob.commits) == sorted([first, second])
+    assert len({len(block_id) for block_id in blob.staged}) == 1
+
+
+@pytest.mark.asyncio
+async def test_invalid_row_is_rejected_before_commit():
+    content = HEADER + ROW * 50 + b"7.4;abc;0;1.9;0.076;11;34;0.9978;3.51;0.56;9.4;5\n" + ROW * 50
+    blob = FakeBlockBlob()
+
+    with pytest.raises(InvalidUpload, match="Line 52"):
+        await stream_upload(blob, io.BytesIO(content).read, CsvStreamValidator(), block_size=64)
+
+    assert blob.committed is None
+    # Blocks after the bad one were never read
+    assert sum(len(d) for d in blob.staged.values()) < len(content) // 2 + 64
+
+
+@pytest.mark.asyncio
+async def test_blocks_are_validated_off_the_event_loop_in_order():
+    content = HEADER + ROW * 100
+    loop_thread = threading.get_ident()
+    threads = []
+
+    class RecordingValidator(CsvStreamValidator):
+        def feed(self, chunk):
+            threads.append(threading.get_ident())
+            super().feed(chunk)
+
+        def finish(self):
+            # The last row and the statistics it updates are checked off the loop too
+            threads.append(threading.get_ident())
+            super().finish()
+
+    validator = RecordingValidator()
+    await stream_upload(FakeBlockBlob(), io.BytesIO(content).read, validator, block_size=100)
+
+    assert validator.rows == 100
+    assert threads and loop_thread not in threads
+
+
+def test_validator_checks_header_and_row_width_across_chunk_boundaries():
+    validator = CsvStreamValidator()
+    data = HEADER + ROW
+    for i in range(0, len(data), 7):
+        validator.feed(data[i:i + 7])
+    validator.finish()
+    assert validator.rows == 1
+
+    with pytest.raises(InvalidUpload, match="Missing columns: quality"):
+        CsvStreamValidator().feed(HEADER.replace(b';"quality"', b""))
+
+    validator = CsvStreamValidator()
+    validator.feed(HEADER + b"1;2;3")
+    with pytest.raises(InvalidUpload, match="3 fields, expected 12"):
+        validator.finish()
+
+    with pytest.raises(InvalidUpload, match="no rows"):
+        validator = CsvStreamValidator()
+        validator.feed(HEADER)
+        validator.finish()
@@ -0,0 +1,59 @@
+import pytest
+
+from shared.metrics import MetricsRegistry, _NOOP_SPAN
+
+
+def test_disabled_registry_records_nothing():
+    registry = MetricsRegistry(enabled=False)
+
+    with registry.span("infer_request", mode="single") as span:
+        span.label(status=200)
+    registry.inc("infer_request_bytes", 10)
+
+    assert registry.span("infer_request") is _NOOP_SPAN
+    snapshot = registry.snapshot()
+    assert snapshot["latency_ms"] == [] and snapshot["counters"] == []
+
+
+def test_span_records_latency_and_outcome():
+    registry = MetricsRegistry(enabled=True, log_interval=0)
+
+    with registry.span("model_load", phase="download") as span:
+        span.label(wine_type="red")
+    with pytest.raises(ValueError):
+        with registry.span("model_load", phase="download", wine_type="red"):
+            raise ValueError("boom")
+
+    entries = {entry["labels"]["outcome"]: entry for entry in registry.snapshot()["latency_ms"]}
+    assert entries["ok"]["count"] == 1 and entries["error"]["count"] == 1
+    assert entries["ok"]["labels"] == {"phase": "download", "wine_type": "red", "outcome": "ok"}
+
+
+def test_histogram_quantiles_use_bucket_bounds():
+    registry = MetricsRegistry(enabled=True, log_interval=0)
+    for value in [1] * 90 + [100] * 10:
+        registry.observe("infer_phase", value, phase="predict")
+
+    (entry,) = registry.snapshot()["latency_ms"]
+    assert entry["count"] == 100 and entry["sum"] == 1090
+    assert entry["p50"] == 1 and entry["p95"] == 100 and entry["p99"] == 100
+
+
+def test_prometheus_text_exposes_histograms_counters_and_collectors():
+    registry = MetricsRegistry(enabled=True, log_interval=0)
+    registry.observe("infer_request", 3, mode="batch")
+    registry.inc("infer_request_bytes", 512, mode="batch")
+    registry.inc("infer_request_bytes", 512, mode="batch")
+    registry.register_collector("prediction_cache", lambda: {"hits": 4, "misses": 1, "name": "ignored"})
+    registry.register_collector("broken", lambda: 1 / 0)
+
+    text = registry.render_prometheus()
+
+    assert "# TYPE winalyze_infer_request_ms histogram" in text
+    assert 'winalyze_infer_request_ms_bucket{mode="batch",le="2.5"} 0' in text
+    assert 'winalyze_infer_request_ms_bucket{mode="batch",le="5"} 1' in text
+    assert 'winalyze_infer_request_ms_bucket{mode="batch",le="+Inf"} 1' in text
+    assert 'winalyze_infer_request_ms_count{mode="batch"} 1' in text
+    assert 'winalyze_infer_request_bytes_total{mode="batch"} 1024' in text
+    assert "winalyze_prediction_cache_hits 4" in text
+    assert "ignored" not in text and "broken" not in text
@@ -0,0 +1,128 @@
+import asyncio
+from unittest.mock import MagicMock
+
+import pytest
+
+from shared import model_cache
+from shared.artifacts import pack_artifact
+from shared.disk_cache import DiskCache, cached_blob_path_async
+from shared.model_cache import ModelRegistry
+from shared.model_store import VERSIONS_PREFIX, Pointer, artifact_digest, pointer_blob_name, version_blob_name
+
+
+class FakeContainer:
+    """In-memory stand-in for a blob container client with per-blob ETags; counts artifact downloads."""
+
+    def __init__(self):
+        self.blobs = {}
+        self.downloads = 0
+
+    def put(self, wine_type, model, scaler=None):
+        """Store a version and promote it."""
+        data = pack_artifact(model, scaler, {"wine_type": wine_type})
+        digest = artifact_digest(data)
+        self.blobs[version_blob_name(wine_type, digest)] = (data, f"etag-{digest}")
+        self.blobs[pointer_blob_name(wine_type)] = (Pointer(wine_type, digest).to_json(), f"etag-{len(self.blobs)}")
+
+    def get_blob_client(self, name):
+        data, etag = self.blobs[name]
+        client = MagicMock(container_name="models", blob_name=name)
+        client.get_blob_properties.return_value = MagicMock(etag=etag)
+
+        def download_blob(**kwargs):
+            if name.startswith(VERSIONS_PREFIX):
+                self.downloads += 1
+            downloader = MagicMock()
+            downloader.readinto.side_effect = lambda stream: stream.write(data)
+            downloader.readall.return_value = data
+            downloader.properties.etag = etag
+            return downloader
+
+        client.download_blob.side_effect = download_blob
+        return client
+
+
+def test_registry_reuses_entry_until_blob_changes():
+    container = FakeContainer()
+    container.put("red", {"model": 1})
+    registry = ModelRegistry(ttl=0, container_client=container)
+
+    first = registry.get("red")
+    second = registry.get("red")
+    assert second is first
+    assert container.downloads == 1
+
+    # Promote a new model: the next revalidation swaps in a new entry
+    container.put("red", {"model": 2})
+    third = registry.get("red")
+    assert third is not first
+    assert third.model == {"model": 2}
+    assert first.model == {"model": 1}
+
+
+def test_registry_skips_revalidation_within_ttl():
+    container = FakeContainer()
+    container.put("white", {"model": 1})
+    registry = ModelRegistry(ttl=3600, container_client=container)
+
+    entry = registry.get("white")
+    container.put("white", {"model": 2})
+    assert registry.get("white") is entry
+
+    registry.invalidate("white")
+    assert registry.get("white").model == {"model": 2}
+
+
+class FakeAsyncContainer:
+    """Async counterpart of FakeContainer; downloads are slowed down to overlap requests."""
+
+    def __init__(self, container):
+        self.container = container
+        self.property_calls = 0
+
+    def get_blob_client(self, name):
+        data, etag = self.container.blobs[name]
+        outer = self
+
+        class Client:
+            container_name = "models"
+            blob_name = name
+
+            async def get_blob_properties(self):
+                outer.property_calls += 1
+                return MagicMock(etag=etag)
+
+            async def download_blob(self, **kwargs):
+                if name.startswith(VERSIONS_PREFIX):
+                    outer.container.downloads += 1
+                await asyncio.sleep(0.05)
+
+                class Stream:
+                    properties = MagicMock(etag=etag)
+
+                    async def chunks(self):
+                        yield data
+
+                    async def readall(self):
+                        return data
+
+                return Stream()
+
+        return Client()
+
+
+@pytest.mark.asyncio
+async def test_get_async_single_flight_cold_load(tmp_path, monkeypatch):
+    monkeypatch.setattr(model_cache, "cached_blob_path_async",
+                        lambda blob_client, etag=None: cached_blob_path_async(blob_client, etag, DiskCache(str(tmp_path))))
+    container = FakeContainer()
+    container.put("red", {"model": 1})
+    async_container = FakeAsyncContainer(container)
+    registry = ModelRegistry(ttl=3600, async_container_client=async_container)
+
+    entries = await asyncio.gather(*(registry.get_async("red") for _ in range(20)))
+
+    assert all(entry is entries[0] for entry in entries)
+    assert entries[0].model == {"model": 1}
+    assert container.downloads == 1
+    assert async_container.property_calls == 1
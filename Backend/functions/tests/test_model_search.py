@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+
+from shared import model_search
+from shared.model_search import EXTRA_TREES, HIST_GRADIENT_BOOSTING, RANDOM_FOREST, candidates, search_model
+
+SPACE = {
+    RANDOM_FOREST: {"n_estimators": [5, 20], "max_depth": [2, None]},
+    EXTRA_TREES: {"n_estimators": [10]},
+    HIST_GRADIENT_BOOSTING: {"max_iter": [10]}
+}
+
+
+def make_data(rows=300):
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.normal(size=(rows, 3)), columns=["alcohol", "pH", "density"])
+    y = pd.Series(np.where(X["alcohol"] + 0.5 * X["pH"] > 0, 6, 5))
+    return X, y
+
+
+def test_candidates_expand_grid_and_sample_randomly():
+    grid = candidates(SPACE, "grid")
+    assert len(grid) == 6
+    assert {c.family for c in grid} == {RANDOM_FOREST, EXTRA_TREES, HIST_GRADIENT_BOOSTING}
+
+    sampled = candidates(SPACE, "random", samples=3)
+    assert len(sampled) == 3 and set(sampled) <= set(grid)
+
+
+def test_search_prunes_weak_candidates_and_scores_finalists(monkeypatch):
+    monkeypatch.setattr(model_search, "PRUNE_MARGIN", 0.05)
+    space = dict(SPACE, **{RANDOM_FOREST: {"n_estimators": [20], "max_depth": [1, None]}})
+    X, _ = make_data()
+    # Interaction a single split cannot capture
+    y = pd.Series(np.where(X["alcohol"] * X["pH"] > 0, 6, 5))
+
+    model, summary = search_model(X, y, mode="grid", n_folds=3, n_jobs=2, space=space)
+
+    assert (model.predict(X) == y).mean() > 0.9
+    best = summary[0]
+    assert best["objective"] is not None and best["latency_ms"] > 0 and best["size_bytes"] > 0
+    assert all(entry["folds"] == 3 for entry in summary if not entry["pruned"])
+    # A depth-1 forest is no match for the others and is dropped before the last fold
+    stump = next(e for e in summary if e["params"].get("max_depth") == 1)
+    assert stump["pruned"] and stump["objective"] is None
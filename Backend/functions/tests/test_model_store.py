@@ -0,0 +1,130 @@
+import itertools
+from unittest.mock import MagicMock
+
+import pytest
+from azure.core import MatchConditions
+from azure.core.exceptions import ResourceExistsError, ResourceModifiedError, ResourceNotFoundError
+
+from shared.artifacts import pack_artifact
+from shared.model_store import (CANDIDATE, PromotionConflict, artifact_digest, promote, prune_versions, put_version,
+                                read_pointer, rollback, version_blob_name, write_pointer)
+
+
+class FakeContainer:
+    """Async container client honoring overwrite and ETag conditions, as blob storage does."""
+
+    def __init__(self):
+        self.blobs = {}
+        self.uploads = 0
+        self._etags = itertools.count()
+
+    def get_blob_client(self, name):
+        outer = self
+
+        class Client:
+            async def upload_blob(self, data, overwrite=False, etag=None, match_condition=None):
+                current = outer.blobs.get(name)
+                if current is not None and not overwrite:
+                    raise ResourceExistsError("exists")
+                if match_condition == MatchConditions.IfNotModified and (current is None or current[1] != etag):
+                    raise ResourceModifiedError("modified")
+                outer.uploads += 1
+                outer.blobs[name] = (data, f"etag-{next(outer._etags)}")
+                return {"etag": outer.blobs[name][1]}
+
+            async def download_blob(self, **kwargs):
+                if name not in outer.blobs:
+                    raise ResourceNotFoundError("missing")
+                data, etag = outer.blobs[name]
+                stream = MagicMock(properties=MagicMock(etag=etag))
+
+                async def readall():
+                    return data
+
+                stream.readall = readall
+                return stream
+
+            async def delete_blob(self):
+                if outer.blobs.pop(name, None) is None:
+                    raise ResourceNotFoundError("missing")
+
+        return Client()
+
+    async def list_blobs(self, name_starts_with=""):
+        for name, (_, etag) in list(self.blobs.items()):
+            if name.startswith(name_starts_with):
+                # ETags are issued in write order, so they stand in for the modification time
+                item = MagicMock(last_modified=int(etag.split("-")[1]))
+                item.name = name
+                yield item
+
+
+@pytest.mark.asyncio
+async def test_versions_are_content_addressed_and_stored_once():
+    container = FakeContainer()
+    artifact = pack_artifact(None, None, {"metrics": {"accuracy": 0.8}, "created_at": "2026-01-01T00:00:00"})
+    digest = await put_version(container, "red", artifact)
+    assert digest == artifact_digest(artifact)
+    assert container.blobs[version_blob_name("red", digest)][0] == artifact
+
+    # Retraining the same model only changes the run fields of the manifest
+    retrained = pack_artifact(None, None, {"metrics": {"accuracy": 0.8}, "created_at": "2026-01-02T00:00:00",
+                                           "search": [{"latency_ms": 12.5}]})
+    assert retrained != artifact
+    assert await put_version(container, "red", retrained) == digest
+    assert container.uploads == 1
+
+    other = pack_artifact(None, None, {"metrics": {"accuracy": 0.9}, "created_at": "2026-01-01T00:00:00"})
+    assert await put_version(container, "red", other) != digest
+
+
+@pytest.mark.asyncio
+async def test_promote_is_conditional_on_the_pointer_read():
+    container = FakeContainer()
+    assert await read_pointer(container, "red") is None
+
+    first = await promote(container, "red", "d1")
+    assert (await read_pointer(container, "red")).digest == "d1"
+
+    # A concurrent promotion moved the pointer since it was read
+    await promote(container, "red", "d2", expected=first)
+    with pytest.raises(PromotionConflict):
+        await promote(container, "red", "d3", expected=first)
+    with pytest.raises(PromotionConflict):
+        await promote(container, "red", "d3")
+
+    # Stages are independent pointers
+    await write_pointer(container, "red", "d3", CANDIDATE)
+    assert (await read_pointer(container, "red")).digest == "d2"
+
+
+@pytest.mark.asyncio
+async def test_rollback_returns_to_the_replaced_version():
+    container = FakeContainer()
+    first = await promote(container, "white", "d1")
+    with pytest.raises(ValueError):
+        await rollback(container, "white")
+
+    await promote(container, "white", "d2", expected=first)
+    assert (await rollback(container, "white")).digest == "d1"
+    assert (await rollback(container, "white")).digest == "d2"
+
+
+@pytest.mark.asyncio
+async def test_prune_keeps_referenced_and_recent_versions():
+    container = FakeContainer()
+    digests = []
+    for accuracy in range(6):
+        digests.append(await put_version(container, "red", pack_artifact(None, None, {"metrics": {"a": accuracy}})))
+    await put_version(container, "white", pack_artifact(None, None, {"metrics": {}}))
+
+    first = await promote(container, "red", digests[0])
+    await promote(container, "red", digests[1], expected=first)
+    await write_pointer(container, "red", digests[2], CANDIDATE)
+
+    # The current, previous and candidate versions stay, plus the most recent unreferenced one
+    assert sorted(await prune_versions(container, "red", keep=1)) == sorted(digests[3:5])
+    remaining = [name for name in container.blobs if name.startswith("versions/red/")]
+    assert sorted(remaining) == sorted(version_blob_name("red", d) for d in digests[:3] + digests[5:])
+    assert await prune_versions(container, "red", keep=1) == []
+    assert any(name.startswith("versions/white/") for name in container.blobs)
@@ -0,0 +1,53 @@
+import io
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import StandardScaler
+
+from shared.dataset_stats import DatasetStats
+from shared.out_of_core import ColumnarBuffer, read_columnar, scale_in_place, split_weights
+
+
+def make_csv(seed, rows):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({"alcohol": rng.normal(10, 1, rows), "pH": rng.normal(3.3, 0.2, rows)})
+    df["quality"] = np.where(df["alcohol"] > 10, 6, 5)
+    return df
+
+
+def test_columnar_buffer_grows_in_place():
+    buffer = ColumnarBuffer(2, capacity=3)
+    for i in range(5):
+        buffer.append(np.full((2, 2), i, dtype=np.float32), np.full(2, i))
+    X, y = buffer.trim()
+    assert X.shape == (10, 2) and X.dtype == np.float32
+    np.testing.assert_array_equal(y, np.repeat(np.arange(5), 2))
+
+
+def test_read_columnar_matches_pandas_and_the_fitted_scaler():
+    first, second = make_csv(0, 300), make_csv(1, 200)
+    second.loc[3, "pH"] = np.nan
+    readers = [io.BytesIO(df.to_csv(sep=";", index=False).encode()) for df in (first, second)]
+
+    X, y, features, stats = read_columnar(readers, chunk_rows=64)
+
+    expected = pd.concat([first, second]).dropna()
+    assert features == ["alcohol", "pH"]
+    assert len(X) == len(expected) == 499
+    np.testing.assert_allclose(X, expected[features].to_numpy(dtype=np.float32))
+
+    scaler = DatasetStats(columns=stats, rows=len(y)).to_scaler(features)
+    fitted = StandardScaler().fit(expected[features])
+    np.testing.assert_allclose(scaler.mean_, fitted.mean_)
+    np.testing.assert_allclose(scaler.scale_, fitted.scale_)
+
+    scale_in_place(X, scaler, block_rows=100)
+    np.testing.assert_allclose(X, fitted.transform(expected[features]), rtol=1e-5, atol=1e-5)
+
+
+def test_split_weights_hold_out_a_stratified_test_set():
+    y = np.array([5] * 80 + [6] * 20)
+    weights, test_idx = split_weights(y)
+    assert len(test_idx) == 20
+    assert (weights[test_idx] == 0).all() and weights.sum() == 80
+    assert (y[test_idx] == 6).sum() == 4
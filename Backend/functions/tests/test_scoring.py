@@ -0,0 +1,102 @@
+import io
+import json
+from unittest.mock import MagicMock
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import StandardScaler
+
+from shared import scoring
+from shared.feature_schema import FeatureSchema
+from shared.model_cache import ModelEntry
+from shared.scoring_jobs import DONE, FAILED, SCORING, default_output_name, job_error, read_job_status
+
+
+def test_score_blob_streams_chunks_into_blocks(monkeypatch):
+    rng = np.random.default_rng(1)
+    X = pd.DataFrame(rng.normal(size=(250, 3)), columns=["a", "b", "c"])
+    y = (X["a"] > 0).astype(int)
+    scaler = StandardScaler().fit(X)
+    model = RandomForestClassifier(n_estimators=5, random_state=0).fit(scaler.transform(X), y)
+    entry = ModelEntry(model, scaler, {}, "v1", 0.0, schema=FeatureSchema.from_names(list(X.columns)))
+    monkeypatch.setattr(scoring, "get_model_entry", lambda wt: entry)
+    monkeypatch.setattr(scoring, "BLOCK_SIZE", 1024)
+
+    source_bytes = X.to_csv(sep=";", index=False).encode()
+    staged = {}
+    committed = []
+
+    source = MagicMock()
+    source.download_blob.return_value.chunks.return_value = iter(
+        [source_bytes[i:i + 500] for i in range(0, len(source_bytes), 500)]
+    )
+    target = MagicMock()
+    target.stage_block.side_effect = lambda block_id, data: staged.__setitem__(block_id, data)
+    target.commit_block_list.side_effect = lambda blocks, **kw: committed.extend(b.id for b in blocks)
+
+    blob_service = MagicMock()
+    blob_service.get_blob_client.side_effect = lambda container, blob: source if container == "raw" else target
+
+    result = scoring.score_blob("red", "raw", "big.csv", chunk_rows=40, blob_service=blob_service)
+
+    assert result["rows"] == 250
+    assert result["blocks"] == len(committed) > 1
+    output = pd.read_csv(io.BytesIO(b"".join(staged[i] for i in committed)), sep=";")
+    expected = model.predict(scaler.transform(X))
+    assert list(output["prediction"]) == list(expected)
+
+    # Another run of the job, e.g. re-enqueued, stages blocks of its own
+    first_run = set(committed)
+    source.download_blob.return_value.chunks.return_value = iter([source_bytes])
+    scoring.score_blob("red", "raw", "big.csv", chunk_rows=40, blob_service=blob_service)
+    assert not first_run & set(committed[len(first_run):])
+    assert len({len(block_id) for block_id in committed}) == 1
+
+
+def test_scoring_job_records_its_progress(monkeypatch):
+    documents = {}
+
+    def get_blob_client(container, blob):
+        client = MagicMock()
+        client.upload_blob.side_effect = lambda data, overwrite=False: documents.__setitem__(
+            f"{container}/{blob}", json.loads(data))
+        client.download_blob.return_value.readall.side_effect = lambda: json.dumps(documents[f"{container}/{blob}"])
+        return client
+
+    blob_service = MagicMock()
+    blob_service.get_blob_client.side_effect = get_blob_client
+    job = {"wine_type": "red", "container": "raw", "blob": "big.csv",
+           "dest_container": "predictions", "dest_blob": "scored_big.csv"}
+    statuses = []
+
+    def fake_score_blob(*args, **kwargs):
+        statuses.append(read_job_status(blob_service, "predictions", "scored_big.csv")["status"])
+        return {"rows": 3, "skipped": 0, "blocks": 1, "output": "predictions/scored_big.csv"}
+
+    monkeypatch.setattr(scoring, "score_blob", fake_score_blob)
+    scoring.run_scoring_job(job, blob_service=blob_service)
+
+    document = read_job_status(blob_service, "predictions", "scored_big.csv")
+    assert statuses == [SCORING]
+    assert document["status"] == DONE and document["result"]["rows"] == 3
+
+    # A failed job is recorded, then re-raised so the queue retries it
+    monkeypatch.setattr(scoring, "score_blob", MagicMock(side_effect=RuntimeError("no production model")))
+    with pytest.raises(RuntimeError):
+        scoring.run_scoring_job(job, blob_service=blob_service)
+    document = read_job_status(blob_service, "predictions", "scored_big.csv")
+    assert document["status"] == FAILED and document["error"] == "no production model"
+
+
+def test_scoring_jobs_only_reach_the_dataset_and_prediction_containers():
+    job = {"container": "raw", "blob": "partitions/red/new.csv",
+           "dest_container": "predictions", "dest_blob": default_output_name("partitions/red/new.csv")}
+    assert job["dest_blob"] == "scored_new.csv"
+    assert job_error(job) is None
+
+    assert job_error({**job, "container": "models"})
+    assert job_error({**job, "dest_container": "models"})
+    assert job_error({**job, "dest_blob": "pointers/red/current.json"})
+    assert job_error({**job, "dest_blob": "scored_new.csv.status.json"})
@@ -0,0 +1,76 @@
+import asyncio
+import json
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from shared import status_watch
+
+
+class FakeStatusBlob:
+    def __init__(self):
+        self.document = {"status": "training", "updated_at": "t1"}
+        self.etag = "e1"
+        self.downloads = 0
+
+    async def get_blob_properties(self):
+        return MagicMock(etag=self.etag)
+
+    async def download_blob(self):
+        self.downloads += 1
+        stream = MagicMock()
+        stream.readall = AsyncMock(return_value=json.dumps(self.document).encode())
+        return stream
+
+
+@pytest.mark.asyncio
+async def test_waiters_share_one_poller_and_wake_on_change(monkeypatch):
+    blob = FakeStatusBlob()
+    blob_service = MagicMock()
+    blob_service.get_blob_client.return_value = blob
+    monkeypatch.setattr(status_watch, "get_blob_service", lambda: blob_service)
+    watcher = status_watch.StatusWatcher(interval=0.01)
+
+    # Unknown version: answered immediately
+    assert (await watcher.wait_for_change("red", None, 1))["status"] == "training"
+
+    waiters = [asyncio.create_task(watcher.wait_for_change("red", "t1", 5)) for _ in range(20)]
+    await asyncio.sleep(0.05)
+    assert not any(w.done() for w in waiters)
+
+    blob.document = {"status": "ready", "updated_at": "t2"}
+    blob.etag = "e2"
+    results = await asyncio.wait_for(asyncio.gather(*waiters), 2)
+
+    assert all(r["status"] == "ready" for r in results)
+    # One download for the first read and one for the change, whatever the number of waiters
+    assert blob.downloads == 2
+
+
+@pytest.mark.asyncio
+async def test_wait_times_out_with_current_document(monkeypatch):
+    blob = FakeStatusBlob()
+    blob_service = MagicMock()
+    blob_service.get_blob_client.return_value = blob
+    monkeypatch.setattr(status_watch, "get_blob_service", lambda: blob_service)
+    watcher = status_watch.StatusWatcher(interval=0.01)
+
+    result = await watcher.wait_for_change("white", "t1", 0.05)
+    assert result["updated_at"] == "t1"
+
+
+@pytest.mark.asyncio
+async def test_documents_are_checked_again_once_the_poller_stopped(monkeypatch):
+    blob = FakeStatusBlob()
+    blob_service = MagicMock()
+    blob_service.get_blob_client.return_value = blob
+    monkeypatch.setattr(status_watch, "get_blob_service", lambda: blob_service)
+    watcher = status_watch.StatusWatcher(interval=0.01)
+
+    await watcher.wait_for_change("red", "t1", 0.02)
+    await asyncio.sleep(0.05)
+    assert not watcher._polling()
+
+    blob.document = {"status": "queued", "updated_at": "t2"}
+    blob.etag = "e2"
+    assert (await watcher.wait_for_change("red", None, 1))["status"] == "queued"
@@ -0,0 +1,49 @@
+import io
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from shared import storage
+
+# Local storage emulator account; no request reaches it
+CONNECTION_STRING = ("DefaultEndpointsProtocol=http;AccountName=devstoreaccount1;AccountKey="
+                     "Eby8vdM02xNOcqFlqUwJPLlmEtlCDXJ1OUzFT50uSRZ6IFsuFq2UVErCz4I6tq/K1SZFPTOtr/KBHBeksoGMGw==;"
+                     "BlobEndpoint=http://127.0.0.1:10000/devstoreaccount1;")
+
+
+def fake_send(self, request, **kwargs):
+    response = requests.Response()
+    response.status_code = 200
+    response.raw = io.BytesIO(b"")
+    response.request = request
+    return response
+
+
+def test_sync_requests_are_counted_by_the_session_adapter(monkeypatch):
+    monkeypatch.setenv("AzureWebJobsStorage", CONNECTION_STRING)
+    monkeypatch.setattr(storage, "_sync_client", None)
+    monkeypatch.setattr(storage, "_sync_session", None)
+    monkeypatch.setattr(HTTPAdapter, "send", fake_send)
+
+    storage.get_sync_blob_service()
+    before = storage.storage_stats()["sync_requests"]
+    storage._sync_session.get("http://127.0.0.1:10000/devstoreaccount1")
+    storage._sync_session.get("http://127.0.0.1:10000/devstoreaccount1")
+
+    stats = storage.storage_stats()
+    assert stats["sync_requests"] == before + 2
+    assert stats["sync_connections_created"] == 0
+
+
+def test_storage_stats_survive_unexpected_pool_internals(monkeypatch):
+    monkeypatch.setenv("AzureWebJobsStorage", CONNECTION_STRING)
+    monkeypatch.setattr(storage, "_sync_client", None)
+    monkeypatch.setattr(storage, "_sync_session", None)
+
+    storage.get_sync_blob_service()
+    for adapter in storage._sync_session.adapters.values():
+        monkeypatch.setattr(adapter, "poolmanager", None)
+
+    stats = storage.storage_stats()
+    assert stats["sync_connections_created"] == 0
+    assert "sync_requests" in stats and "async_requests" in stats
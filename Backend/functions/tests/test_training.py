@@ -0,0 +1,227 @@
+import io
+import json
+import os
+from unittest.mock import AsyncMock, MagicMock
+
+import pandas as pd
+import pytest
+from azure.core import MatchConditions
+from azure.core.exceptions import ResourceExistsError, ResourceModifiedError
+
+from shared import training
+from shared.artifacts import pack_artifact
+from shared.model_store import MODELS_CONTAINER, artifact_digest, pointer_blob_name, promote, version_blob_name
+
+
+class FakeBlob:
+    def __init__(self, data=None, etag="etag-1"):
+        self.data = data
+        self.etag = etag
+        self.uploads = 0
+
+    async def exists(self):
+        return self.data is not None
+
+    async def get_blob_properties(self):
+        return MagicMock(etag=self.etag, size=len(self.data or b""))
+
+    async def download_blob(self, **kwargs):
+        if self.data is None:
+            raise training.ResourceNotFoundError("missing")
+        stream = MagicMock(properties=MagicMock(etag=self.etag))
+        stream.readall = AsyncMock(return_value=self.data)
+        return stream
+
+    async def upload_blob(self, data, overwrite=False, etag=None, match_condition=None, **kwargs):
+        if self.data is not None and not overwrite:
+            raise ResourceExistsError("exists")
+        if match_condition == MatchConditions.IfNotModified and etag != self.etag:
+            raise ResourceModifiedError("modified")
+        self.data = data
+        self.uploads += 1
+        self.etag = f"{self.etag}+"
+        return {"etag": self.etag}
+
+    async def delete_blob(self):
+        if self.data is None:
+            raise training.ResourceNotFoundError("missing")
+        self.data = None
+
+
+class FakeBlobService:
+    def __init__(self, blobs):
+        self.blobs = blobs
+
+    def get_blob_client(self, container, blob):
+        return self.blobs.setdefault(f"{container}/{blob}", FakeBlob())
+
+    def get_container_client(self, container):
+        client = MagicMock()
+        client.get_blob_client.side_effect = lambda blob: self.get_blob_client(container, blob)
+
+        async def list_blobs(name_starts_with=""):
+            prefix = f"{container}/{name_starts_with}"
+            for key, blob in list(self.blobs.items()):
+                if key.startswith(prefix) and blob.data is not None:
+                    item = MagicMock(etag=blob.etag, size=len(blob.data), last_modified=blob.etag)
+                    item.name = key[len(container) + 1:]
+                    yield item
+
+        client.list_blobs = list_blobs
+        return client
+
+
+@pytest.mark.asyncio
+async def test_run_training_skips_unchanged_raw_data(monkeypatch):
+    raw = pd.DataFrame({"alcohol": [9.0, 10.0], "quality": [5, 6]}).to_csv(sep=";", index=False).encode()
+    blob_service = FakeBlobService({"raw/uploaded_red.csv": FakeBlob(raw, etag="v1")})
+
+    monkeypatch.setattr(training, "preprocess_data", lambda df, wt, stats=None: (df, b"scaler"))
+    artifact = pack_artifact(None, None, {"metrics": {"accuracy": 0.8}})
+    monkeypatch.setattr(training, "train_artifact", lambda df, scaler, wt, data_hash, training=None: artifact)
+    monkeypatch.setattr(training, "evaluate_model", AsyncMock(return_value={"passed": True, "metrics": {}}))
+    monkeypatch.setattr(training.asyncio, "sleep", AsyncMock())
+    monkeypatch.setattr(training, "run_cpu_bound", lambda fn, *args: training.asyncio.to_thread(fn, *args))
+
+    assert await training.run_training(blob_service, "red") is True
+    record = json.loads(blob_service.blobs["models-testing/source_red.json"].data)
+    assert record["etag"] == "v1"
+    status = json.loads(blob_service.blobs["models/status_red.json"].data)
+    assert status["status"] == "ready"
+    assert status["metrics"] == {"accuracy": 0.8}
+    assert [h["status"] for h in status["history"]] == ["preprocessing", "training", "validating", "ready"]
+    cleaned = pd.read_parquet(io.BytesIO(blob_service.blobs["cleaned/cleaned_red.parquet"].data))
+    assert list(cleaned["alcohol"]) == [9.0, 10.0]
+
+    version = blob_service.blobs[f"models/{version_blob_name('red', artifact_digest(artifact))}"]
+    candidate = blob_service.blobs[f"models/{pointer_blob_name('red', 'candidate')}"]
+    assert json.loads(candidate.data)["digest"] == artifact_digest(artifact)
+
+    # Same ETag: nothing is retrained
+    assert await training.run_training(blob_service, "red") is False
+    assert version.uploads == 1 and candidate.uploads == 1
+
+    # New upload: the pipeline runs again; an identical artifact is stored once
+    blob_service.blobs["raw/uploaded_red.csv"].etag = "v2"
+    assert await training.run_training(blob_service, "red") is True
+    assert version.uploads == 1 and candidate.uploads == 1
+    current = json.loads(blob_service.blobs[f"models/{pointer_blob_name('red')}"].data)
+    assert current["digest"] == artifact_digest(artifact)
+
+    # Appended partition: the pipeline runs again and records it
+    monkeypatch.setattr(training, "get_production_artifact", AsyncMock(return_value=None))
+    blob_service.blobs["raw/partitions/red/20260101T000000000000Z-abcd.csv"] = FakeBlob(raw, etag="p1")
+    assert await training.run_training(blob_service, "red") is True
+    record = json.loads(blob_service.blobs["models-testing/source_red.json"].data)
+    assert record["partitions"] == ["partitions/red/20260101T000000000000Z-abcd.csv"]
+    assert await training.run_training(blob_service, "red") is False
+
+
+@pytest.mark.asyncio
+async def test_run_training_resumes_from_checkpoints_after_a_failed_validation(monkeypatch):
+    raw = pd.DataFrame({"alcohol": [9.0, 10.0], "quality": [5, 6]}).to_csv(sep=";", index=False).encode()
+    blob_service = FakeBlobService({"raw/uploaded_white.csv": FakeBlob(raw, etag="v1")})
+
+    preprocess = MagicMock(side_effect=lambda df, wt, stats=None: (df, b"scaler"))
+    monkeypatch.setattr(training, "preprocess_data", preprocess)
+    artifact = pack_artifact(None, None, {"metrics": {"accuracy": 0.8}})
+    train = MagicMock(return_value=artifact)
+    monkeypatch.setattr(training, "train_artifact", train)
+    evaluate = AsyncMock(side_effect=[RuntimeError("test data unavailable")] + [{"passed": True, "metrics": {}}] * 2)
+    monkeypatch.setattr(training, "evaluate_model", evaluate)
+    monkeypatch.setattr(training, "run_cpu_bound", lambda fn, *args: training.asyncio.to_thread(fn, *args))
+
+    with pytest.raises(RuntimeError):
+        await training.run_training(blob_service, "white")
+    assert json.loads(blob_service.blobs["models/status_white.json"].data)["status"] == "failed"
+
+    # The next run validates the checkpointed model without preprocessing or training again
+    assert await training.run_training(blob_service, "white") is True
+    assert preprocess.call_count == 1 and train.call_count == 1 and evaluate.call_count == 2
+    assert json.loads(blob_service.blobs["models/status_white.json"].data)["status"] == "ready"
+    assert any(key.startswith("checkpoints/white/preprocess/") for key in blob_service.blobs)
+
+    # A forced run replays every stage
+    assert await training.run_training(blob_service, "white", force=True) is True
+    assert preprocess.call_count == 2 and train.call_count == 2 and evaluate.call_count == 3
+
+
+@pytest.mark.asyncio
+async def test_run_training_extends_the_production_model_with_new_partitions(monkeypatch):
+    raw = pd.DataFrame({"alcohol": [9.0, 10.0], "quality": [5, 6]}).to_csv(sep=";", index=False).encode()
+    partition = "partitions/red/20260101T000000000000Z-abcd.csv"
+    blob_service = FakeBlobService({
+        "raw/uploaded_red.csv": FakeBlob(raw, etag="v1"),
+        f"raw/{partition}": FakeBlob(raw, etag="p1")
+    })
+
+    # The production model was trained on the base dataset alone
+    production = ("production.wpk", {"training": training.training_record("v1", [], 2)}, "d0")
+    monkeypatch.setattr(training, "get_production_artifact", AsyncMock(return_value=production))
+    artifact = pack_artifact(None, None, {"metrics": {"accuracy": 0.8}})
+    extend = MagicMock(return_value=artifact)
+    monkeypatch.setattr(training, "extend_from_partitions", extend)
+    train = MagicMock(return_value=artifact)
+    monkeypatch.setattr(training, "train_artifact", train)
+    evaluate = AsyncMock(return_value={"passed": True, "metrics": {}})
+    monkeypatch.setattr(training, "evaluate_model", evaluate)
+    monkeypatch.setattr(training, "run_cpu_bound", lambda fn, *args: training.asyncio.to_thread(fn, *args))
+
+    assert await training.run_training(blob_service, "red") is True
+    assert extend.call_count == 1 and train.call_count == 0
+    assert extend.call_args.args[:2] == ("production.wpk", [raw])
+    # Extended forests are also compared to the production model
+    assert evaluate.call_args.args[3] is True
+
+    status = json.loads(blob_service.blobs["models/status_red.json"].data)
+    assert status["status"] == "ready" and status["mode"] == training.INCREMENTAL
+    assert status["outcome"] == training.PROMOTED
+    record = json.loads(blob_service.blobs["models-testing/source_red.json"].data)
+    assert record["partitions"] == [partition]
+    current = json.loads(blob_service.blobs[f"models/{pointer_blob_name('red')}"].data)
+    assert current["digest"] == artifact_digest(artifact)
+
+    # The recorded source skips the next run
+    assert await training.run_training(blob_service, "red") is False
+
+
+@pytest.mark.asyncio
+async def test_promotion_is_conditional_on_the_pointer_validation_was_based_on(monkeypatch):
+    raw = pd.DataFrame({"alcohol": [9.0, 10.0], "quality": [5, 6]}).to_csv(sep=";", index=False).encode()
+    blob_service = FakeBlobService({"raw/uploaded_red.csv": FakeBlob(raw, etag="v1")})
+
+    monkeypatch.setattr(training, "preprocess_data", lambda df, wt, stats=None: (df, b"scaler"))
+    artifact = pack_artifact(None, None, {"metrics": {"accuracy": 0.8}})
+    monkeypatch.setattr(training, "train_artifact", lambda df, scaler, wt, data_hash, training=None: artifact)
+    monkeypatch.setattr(training, "run_cpu_bound", lambda fn, *args: training.asyncio.to_thread(fn, *args))
+
+    async def evaluate_while_another_version_is_promoted(*args):
+        await promote(blob_service.get_container_client(MODELS_CONTAINER), "red", "other")
+        return {"passed": True, "metrics": {}}
+
+    monkeypatch.setattr(training, "evaluate_model", evaluate_while_another_version_is_promoted)
+
+    assert await training.run_training(blob_service, "red") is True
+    current = json.loads(blob_service.blobs[f"models/{pointer_blob_name('red')}"].data)
+    assert current["digest"] == "other"
+    # A validated model that loses the race is reported as such, not as a failed validation
+    status = json.loads(blob_service.blobs["models/status_red.json"].data)
+    assert status["status"] == "failed" and status["outcome"] == training.CONFLICT
+    assert "did not pass validation" not in status["error"]
+
+
+@pytest.mark.asyncio
+async def test_run_all_training_isolates_failures(monkeypatch):
+    async def fake_run_training(blob_service, wine_type):
+        if wine_type == "red":
+            raise RuntimeError("boom")
+        return True
+
+    monkeypatch.setattr(training, "run_training", fake_run_training)
+
+    assert await training.run_all_training(None) == {"red": False, "white": True}
+
+
+@pytest.mark.asyncio
+async def test_run_cpu_bound_uses_worker_process():
+    assert await training.run_cpu_bound(os.getpid) != os.getpid()
@@ -0,0 +1,19 @@
+import azure.functions as func
+import logging
+import json
+from shared.storage import get_blob_service
+from shared.training import run_training, merge_if_both_in_production
+
+async def main(msg: func.QueueMessage) -> None:
+    # Training job enqueued by upload_function right after a dataset upload
+    job = json.loads(msg.get_body().decode("utf-8"))
+    wine_type = job.get("wine_type")
+    if wine_type not in ["red", "white"]:
+        logging.error(f"Invalid training job: {job}")
+        return
+
+    logging.info(f"Train function triggered by upload of {wine_type} dataset (etag {job.get('etag')})")
+
+    blob_service = get_blob_service()
+    if await run_training(blob_service, wine_type):
+        await merge_if_both_in_production(blob_service)
@@ -1,13 +1,17 @@
+import asyncio
 import logging
 import azure.functions as func
-from azure.storage.blob.aio import BlobServiceClient
 from azure.storage.blob import ContentSettings
 from azure.core.exceptions import ResourceExistsError
-from model_status import check_model_status
-import os
-import asyncio
+from shared.dataset import delete_partitions, new_partition_name, raw_blob_name
+from shared.dataset_stats import stats_blob_name
+from shared.ingest import CsvStreamValidator, InvalidUpload, stream_upload
+from shared.metrics import count, span
+from shared.status import QUEUED, write_status
+from shared.storage import get_blob_service
+import json
 
-async def main(req: func.HttpRequest) -> func.HttpResponse:
+async def main(req: func.HttpRequest, trainQueue: func.Out[str]) -> func.HttpResponse:
     logging.info('Upload function triggered')
 
     try:
@@ -16,8 +20,6 @@ async def main(req: func.HttpRequest) -> func.HttpResponse:
         if not file:
             return func.HttpResponse("Missing file in request", status_code=400)
         
-        # Read file content asynchronously
-        file_content = await asyncio.to_thread(file.stream.read)
         original_filename = file.filename or ""
         original_filename = original_filename.lower().strip()
 
@@ -29,49 +31,78 @@ async def main(req: func.HttpRequest) -> func.HttpResponse:
         else:
             return func.HttpResponse("Filename must contain 'red' or 'white'", status_code=400)
         
-        # Generate blob name
-        blob_name = f"uploaded_{wine_type}.csv"
+        # Use the shared async blob service client
+        blob_service_client = get_blob_service()
 
-        # Initialize async blob service client
-        async with BlobServiceClient.from_connection_string(
-            os.environ["AzureWebJobsStorage"]
-        ) as blob_service_client:
-            # Get container client
-            container_client = blob_service_client.get_container_client("raw")
-            
-            # Get blob client
-            blob_client = container_client.get_blob_client(blob_name)
+        # Get container client
+        container_client = blob_service_client.get_container_client("raw")
 
-            try:
-                # Upload file asynchronously
-                await blob_client.upload_blob(
-                    file_content,
-                    overwrite=True,
+        # Generate blob name: appended files become a new partition of the existing dataset
+        blob_name = raw_blob_name(wine_type)
+        append = req.params.get("mode", "").lower() == "append"
+        if append and await container_client.get_blob_client(blob_name).exists():
+            blob_name = new_partition_name(wine_type)
+        else:
+            append = False
+        
+        # Get blob client
+        blob_client = container_client.get_blob_client(blob_name)
+
+        try:
+            # Stream the file in validated blocks, staged in parallel and committed at the end
+            validator = CsvStreamValidator()
+            with span("upload_phase", phase="stream", wine_type=wine_type):
+                upload_result = await stream_upload(
+                    blob_client,
+                    file.stream.read,
+                    validator=validator,
                     content_settings=ContentSettings(
                         content_type='text/csv',
                         content_encoding='utf-8'
                     )
                 )
-                
-                logging.info(f"File successfully uploaded as: {blob_name}")
-                return func.HttpResponse(
-                    f"File successfully uploaded as: {blob_name}",
-                    status_code=200
-                )
+            count("upload_bytes", upload_result["size"], wine_type=wine_type)
             
-            except ResourceExistsError:
-                return func.HttpResponse(
-                    f"A blob with name {blob_name} already exists",
-                    status_code=409
+            logging.info(f"File successfully uploaded as: {blob_name}")
+
+            # A new base dataset replaces the partitions appended to the previous one
+            if not append:
+                deleted = await delete_partitions(blob_service_client, wine_type)
+                if deleted:
+                    logging.info(f"Deleted {deleted} partitions of the previous {wine_type} dataset")
+
+            # Column statistics gathered while validating, so training can build its scaler without a pass
+            stats_client = container_client.get_blob_client(stats_blob_name(blob_name))
+            with span("upload_phase", phase="stats", wine_type=wine_type):
+                stats_document = await asyncio.to_thread(
+                    validator.stats.to_json, blob=f"raw/{blob_name}", etag=upload_result.get("etag")
                 )
-            
-        # After upload, trigger an asynchronous check to see if a model already exists for the given wine type
-        try:
-            logging.info(f"Triggering model status check for wine type: {wine_type}")
-            await check_model_status(wine_type)
-            logging.info(f"Model status check completed for wine type: {wine_type}")
-        except Exception as e:
-            logging.error(f"Error during model status check for wine type {wine_type}: {str(e)}")
+                await stats_client.upload_blob(stats_document, overwrite=True)
+
+            # Enqueue a training job for this dataset instead of waiting for the timer
+            trainQueue.set(json.dumps({
+                "wine_type": wine_type,
+                "blob": f"raw/{blob_name}",
+                "etag": upload_result.get("etag")
+            }))
+
+            # Report the new dataset as queued so status polls do not show the previous model as ready
+            await write_status(blob_service_client, wine_type, QUEUED, source_etag=upload_result.get("etag"))
+
+            return func.HttpResponse(
+                f"File successfully uploaded as: {blob_name}",
+                status_code=200
+            )
+        
+        except InvalidUpload as e:
+            logging.warning(f"Rejected upload {original_filename}: {e}")
+            return func.HttpResponse(f"Invalid CSV: {str(e)}", status_code=400)
+
+        except ResourceExistsError:
+            return func.HttpResponse(
+                f"A blob with name {blob_name} already exists",
+                status_code=409
+            )
     
     except Exception as e:
         logging.error(f"Upload process failed: {e}")